@@ -9,6 +9,7 @@ import chemprop.constants
 import chemprop.hyperparameter_optimization
 import chemprop.interpret
 import chemprop.nn_utils
+import chemprop.preprocess
 import chemprop.utils
 import chemprop.sklearn_predict
 import chemprop.sklearn_train
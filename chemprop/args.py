@@ -8,8 +8,9 @@ from typing_extensions import Literal
 import torch
 from tap import Tap  # pip install typed-argument-parser (https://github.com/swansonk14/typed-argument-parser)
 
-from chemprop.data import set_cache_mol
-from chemprop.features import get_available_features_generators
+from chemprop.data import DiskGraphCache, set_cache_graph_size, set_cache_mol, set_cache_mol_binary, \
+    set_cache_mol_size, set_disk_graph_cache
+from chemprop.features import get_available_features_generators, set_graph_featurization
 
 
 Metric = Literal['auc', 'prc-auc', 'rmse', 'mae', 'mse', 'r2', 'accuracy', 'cross_entropy', 'binary_cross_entropy']
@@ -87,8 +88,24 @@ class CommonArgs(Tap):
     """Maximum number of data points to load."""
     num_workers: int = 8 
     """Number of workers for the parallel data loading (0 means sequential)."""
+    prefetch_batches: int = 0
+    """
+    Number of batches to collate ahead in a background thread when data loading is sequential (no workers),
+    which overlaps featurization with training and prediction. 0 disables prefetching.
+    """
     batch_size: int = 50
     """Batch size."""
+    bfloat16: bool = False
+    """
+    Whether to run the model on CPUs in mixed precision with bfloat16 using :code:`torch.autocast`,
+    which speeds up linear layers and message passing on CPUs with bfloat16 support and halves their
+    activation memory. Losses, the readout sums and the predictions stay in float32. Requires PyTorch 1.10 or later.
+    """
+    max_batch_atoms: int = None
+    """
+    Maximum total number of atoms in a batch. If provided, batches are filled with molecules up to this budget
+    instead of containing :code:`batch_size` molecules, which bounds the memory of each step.
+    """
     atom_descriptors: Literal['feature', 'descriptor'] = None
     """
     Custom extra atom descriptors.
@@ -101,6 +118,37 @@ class CommonArgs(Tap):
     """
     Whether to not cache the RDKit molecule for each SMILES string to reduce memory usage (cached by default).
     """
+    cache_mol_binary: bool = False
+    """
+    Whether to cache RDKit molecules as binary pickles, which use a fraction of the memory of molecules
+    and are rebuilt much faster than parsing SMILES.
+    """
+    columnar_data: bool = False
+    """
+    Whether to store datasets as columns of NumPy arrays instead of a list of datapoints,
+    which reduces memory and makes scaling and batching vectorized. Compiled data files are always columnar.
+    """
+    cache_mol_size: float = 1024
+    """Approximate memory budget in MB of the cached RDKit molecules. The least recently used molecules are evicted."""
+    cache_graph_size: float = 4096
+    """Memory budget in MB of the cached molecular graphs. The least recently used graphs are evicted."""
+    graph_featurization: Literal['dense', 'factorized', 'categorical'] = 'dense'
+    """
+    Layout of the atom and bond features in featurized molecular graphs.
+    :code:`dense`: each bond stores the concatenated features of its source atom and the bond.
+    :code:`factorized`: each bond stores only the bond features and the input layer projects atom features
+    once per atom, which greatly reduces the memory of cached graphs.
+    :code:`categorical`: like :code:`factorized`, but each atom stores the indices of its one-hot features
+    and the input layer sums the matching weight columns instead of multiplying by one-hot vectors.
+    Models are interchangeable between layouts.
+    """
+    graph_cache_dir: str = None
+    """
+    Directory of a persistent cache of featurized molecular graphs shared across runs.
+    Graphs are stored by SMILES and featurization, so repeated runs on overlapping molecules skip featurization.
+    """
+    graph_cache_size: float = 1024
+    """Maximum size in MB of the graphs stored in :code:`graph_cache_dir`. The least recently used graphs are evicted."""
 
     def __init__(self, *args, **kwargs):
         super(CommonArgs, self).__init__(*args, **kwargs)
@@ -182,7 +230,16 @@ class CommonArgs(Tap):
             raise NotImplementedError('Atom descriptors are currently only supported with one molecule '
                                       'per input (i.e., number_of_molecules = 1).')
 
+        if self.bfloat16 and not hasattr(torch, 'autocast'):
+            raise ValueError('bfloat16 requires torch.autocast, which is available in PyTorch 1.10 or later.')
+
         set_cache_mol(not self.no_cache_mol)
+        set_cache_mol_binary(self.cache_mol_binary)
+        set_cache_mol_size(self.cache_mol_size)
+        set_cache_graph_size(self.cache_graph_size)
+        set_graph_featurization(self.graph_featurization)
+        set_disk_graph_cache(DiskGraphCache(self.graph_cache_dir, max_size=self.graph_cache_size)
+                             if self.graph_cache_dir is not None else None)
 
 
 class TrainArgs(CommonArgs):
@@ -253,7 +310,13 @@ class TrainArgs(CommonArgs):
     Maximum number of molecules in dataset to allow caching.
     Below this number, caching is used and data loading is sequential.
     Above this number, caching is not used and data loading is parallel.
-    Use "inf" to always cache.
+    Use "inf" to always cache. The memory of the cache is bounded by :code:`cache_graph_size`.
+    """
+    featurization_processes: int = None
+    """
+    Number of processes used to featurize all molecules once before training when caching is not used.
+    The featurized graphs are reused across epochs, ensemble models and folds.
+    Defaults to the number of CPUs. Use 0 to featurize molecules in the data loader workers every epoch instead.
     """
     save_preds: bool = False
     """Whether to save test split predictions during training."""
@@ -276,6 +339,18 @@ class TrainArgs(CommonArgs):
     """Centers messages on atoms instead of on bonds."""
     undirected: bool = False
     """Undirected edges (always sum the two relevant bond vectors)."""
+    message_aggregation: Literal['padded', 'scatter'] = 'padded'
+    """
+    How the incoming messages of each atom are summed during message passing.
+    :code:`padded`: gathers a :code:`num_atoms x max_num_bonds x hidden_size` tensor using the padded :code:`a2b` map.
+    :code:`scatter`: adds each bond's message to the atom it points to with :code:`index_add_`,
+    so memory scales with the number of bonds rather than with the highest atom degree in the batch.
+    """
+    checkpoint_depth: bool = False
+    """
+    Whether to recompute the messages of each message passing step during the backward pass instead of
+    keeping them in memory, which lowers training memory at the cost of running message passing twice.
+    """
     ffn_hidden_size: int = None
     """Hidden dim for higher-capacity FFN (defaults to hidden_size)."""
     ffn_num_layers: int = 2
@@ -316,6 +391,21 @@ class TrainArgs(CommonArgs):
     """Maximum magnitude of gradient during training."""
     class_balance: bool = False
     """Trains with an equal number of positives and negatives in each batch."""
+    cache_eval_batches: bool = False
+    """
+    Whether to collate the validation and test sets once and reuse the batches for every evaluation
+    and the final test predictions instead of collating them again every epoch.
+    """
+    shared_workers: bool = False
+    """
+    Whether data loading workers are started once and shared by all data loaders, epochs, models, and folds
+    of the run instead of being started again for every epoch, which also keeps their caches warm.
+    """
+    num_buckets: int = 0
+    """
+    Number of buckets of molecules with similar numbers of atoms to draw each training batch from,
+    which reduces padding and evens out the cost of training steps. 0 disables bucketing.
+    """
 
     def __init__(self, *args, **kwargs) -> None:
         super(TrainArgs, self).__init__(*args, **kwargs)
@@ -427,6 +517,9 @@ class TrainArgs(CommonArgs):
         if self.class_balance and self.dataset_type != 'classification':
             raise ValueError('Class balance can only be applied if the dataset type is classification.')
 
+        if self.num_buckets < 0:
+            raise ValueError('The number of buckets must be non-negative.')
+
         # Validate features
         if self.features_only and not (self.features_generator or self.features_path):
             raise ValueError('When using features_only, a features_generator or features_path must be provided.')
@@ -468,6 +561,17 @@ class PredictArgs(CommonArgs):
     """Path to CSV file containing testing data for which predictions will be made."""
     preds_path: str
     """Path to CSV file where predictions will be saved."""
+    quantize: Literal['dynamic'] = None
+    """
+    Quantization applied to the models after loading them.
+    :code:`dynamic`: stores the weights of the linear layers in int8 and quantizes their inputs on the fly,
+    which lowers the memory and time of prediction on CPUs at a small cost in accuracy.
+    """
+    quantization_report: bool = False
+    """
+    Whether to also predict with the float models when using :code:`--quantize` and print the maximum and mean
+    absolute difference between the quantized and float predictions of each task. This doubles the prediction time.
+    """
 
     @property
     def ensemble_size(self) -> int:
@@ -481,6 +585,37 @@ class PredictArgs(CommonArgs):
             raise ValueError('Found no checkpoints. Must specify --checkpoint_path <path> or '
                              '--checkpoint_dir <dir> containing at least one checkpoint.')
 
+        if self.quantize is not None and self.cuda:
+            raise ValueError('Quantized models only run on CPUs. Must specify --no_cuda when using --quantize.')
+
+        if self.quantization_report and self.quantize is None:
+            raise ValueError('The quantization report compares quantized models to float models. '
+                             'Must specify --quantize when using --quantization_report.')
+
+
+class PreprocessArgs(CommonArgs):
+    """:class:`PreprocessArgs` includes :class:`CommonArgs` along with additional arguments used for compiling a data file."""
+
+    data_path: str
+    """Path to data CSV file."""
+    save_path: str
+    """Path where the compiled data file will be saved."""
+    target_columns: List[str] = None
+    """
+    Name of the columns containing target values.
+    By default, uses all columns except the SMILES column and the :code:`ignore_columns`.
+    """
+    ignore_columns: List[str] = None
+    """Name of the columns to ignore when :code:`target_columns` is not provided."""
+    featurization_processes: int = None
+    """Number of processes used to featurize the molecules. Defaults to the number of CPUs."""
+
+    def process_args(self) -> None:
+        super(PreprocessArgs, self).process_args()
+
+        if self.atom_descriptors is not None:
+            raise NotImplementedError('Atom descriptors are not supported with compiled data files.')
+
 
 class InterpretArgs(CommonArgs):
     """:class:`InterpretArgs` includes :class:`CommonArgs` along with additional arguments used for interpreting a trained Chemprop model."""
@@ -1,16 +1,34 @@
 from .data import (
+    BucketBatchSampler,
     cache_graph,
+    cache_info,
     cache_mol,
+    cache_mol_binary,
+    close_worker_pool,
+    ColumnarMoleculeDataset,
+    disk_graph_cache,
+    make_mol,
+    MoleculeBatch,
     MoleculeDatapoint,
     MoleculeDataset,
     MoleculeDataLoader,
     MoleculeSampler,
+    packed_graphs,
     set_cache_graph,
-    set_cache_mol
+    set_cache_graph_size,
+    set_cache_mol,
+    set_cache_mol_binary,
+    set_cache_mol_size,
+    set_disk_graph_cache,
+    set_packed_graphs,
+    shared_worker_pool
 )
+from .disk_cache import DiskGraphCache
+from .lru_cache import LRUCache
 from .scaffold import generate_scaffold, log_scaffold_stats, scaffold_split, scaffold_to_smiles
 from .scaler import StandardScaler
 from .utils import (
+    featurize_graphs,
     filter_invalid_smiles,
     get_class_sizes,
     get_data,
@@ -22,21 +40,41 @@ from .utils import (
     validate_data,
     validate_dataset_type
 )
+from .worker_pool import WorkerPool
 
 __all__ = [
+    'BucketBatchSampler',
     'cache_graph',
+    'cache_info',
     'cache_mol',
+    'cache_mol_binary',
+    'close_worker_pool',
+    'ColumnarMoleculeDataset',
+    'disk_graph_cache',
+    'DiskGraphCache',
+    'LRUCache',
+    'make_mol',
+    'MoleculeBatch',
     'MoleculeDatapoint',
     'MoleculeDataset',
     'MoleculeDataLoader',
     'MoleculeSampler',
+    'packed_graphs',
     'set_cache_graph',
+    'set_cache_graph_size',
     'set_cache_mol',
+    'set_cache_mol_binary',
+    'set_cache_mol_size',
+    'set_disk_graph_cache',
+    'set_packed_graphs',
+    'shared_worker_pool',
+    'WorkerPool',
     'generate_scaffold',
     'log_scaffold_stats',
     'scaffold_split',
     'scaffold_to_smiles',
     'StandardScaler',
+    'featurize_graphs',
     'filter_invalid_smiles',
     'get_class_sizes',
     'get_data',
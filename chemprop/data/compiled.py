@@ -0,0 +1,209 @@
+import json
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from .data import ColumnarMoleculeDataset, MoleculeDataset
+from chemprop.features import PackedMolGraphs
+
+
+# A compiled data file starts with COMPILED_DATA_MAGIC and the length of a JSON header as a little-endian uint64.
+# The header describes the arrays, which follow it uncompressed at aligned offsets so they can be memory-mapped.
+COMPILED_DATA_MAGIC = b'CHEMPROP'
+COMPILED_DATA_VERSION = 2
+COMPILED_DATA_ALIGNMENT = 64
+GRAPH_ARRAYS = ['f_atoms', 'atom_categories', 'f_bonds', 'b2a', 'b2revb', 'atom_offsets', 'bond_offsets']
+
+
+def is_compiled_data(path: str) -> bool:
+    """
+    Checks whether a data file is a compiled data file (rather than a CSV file).
+
+    :param path: Path to a data file.
+    :return: Whether the file starts with :code:`COMPILED_DATA_MAGIC`.
+    """
+    with open(path, 'rb') as f:
+        return f.read(len(COMPILED_DATA_MAGIC)) == COMPILED_DATA_MAGIC
+
+
+def align(offset: int) -> int:
+    """Rounds an offset up to a multiple of :code:`COMPILED_DATA_ALIGNMENT`."""
+    return -(-offset // COMPILED_DATA_ALIGNMENT) * COMPILED_DATA_ALIGNMENT
+
+
+def save_arrays(path: str, header: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> None:
+    """
+    Saves a JSON header and a set of arrays to a compiled data file.
+
+    :param path: Path where the file will be saved.
+    :param header: A JSON-serializable dictionary of metadata.
+    :param arrays: A dictionary mapping names to numpy arrays.
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+    offset, layout = 0, {}
+    for name, array in arrays.items():
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = align(offset + array.nbytes)
+
+    header_bytes = json.dumps({**header, 'arrays': layout}).encode()
+    data_start = align(len(COMPILED_DATA_MAGIC) + 8 + len(header_bytes))
+
+    with open(path, 'wb') as f:
+        f.write(COMPILED_DATA_MAGIC)
+        f.write(np.uint64(len(header_bytes)).astype('<u8').tobytes())
+        f.write(header_bytes)
+
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(array.tobytes())
+
+
+def load_arrays(path: str) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Loads the header of a compiled data file and memory-maps its arrays.
+
+    :param path: Path to a compiled data file.
+    :return: A tuple containing the header and a dictionary mapping names to read-only numpy arrays.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(COMPILED_DATA_MAGIC)) != COMPILED_DATA_MAGIC:
+            raise ValueError(f'"{path}" is not a compiled data file.')
+
+        header_size = int(np.frombuffer(f.read(8), dtype='<u8')[0])
+        header = json.loads(f.read(header_size).decode())
+
+    if header['version'] != COMPILED_DATA_VERSION:
+        raise ValueError(f'Compiled data file version {header["version"]} is not supported '
+                         f'(expected {COMPILED_DATA_VERSION}). Please run chemprop_preprocess again.')
+
+    data_start = align(len(COMPILED_DATA_MAGIC) + 8 + header_size)
+    arrays = {}
+    for name, layout in header['arrays'].items():
+        dtype, shape = np.dtype(layout['dtype']), tuple(layout['shape'])
+
+        # Empty arrays cannot be memory-mapped
+        if np.prod(shape) == 0:
+            arrays[name] = np.zeros(shape, dtype=dtype)
+        else:
+            arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=data_start + layout['offset'], shape=shape)
+
+    return header, arrays
+
+
+def save_compiled_data(path: str,
+                       data: MoleculeDataset,
+                       graphs: PackedMolGraphs,
+                       smiles_columns: List[str],
+                       task_names: List[str],
+                       features_generator: List[str] = None) -> None:
+    """
+    Compiles a :class:`~chemprop.data.MoleculeDataset` and the graphs of its molecules into a single binary file.
+
+    The file contains the packed graph arrays with their offsets, the SMILES of the packed molecules, the index
+    of each molecule of each datapoint in the packed graphs, the features, and the targets with a mask of
+    which targets are known. The features and targets are stored as float32, as they are used in batches.
+
+    :param path: Path where the compiled data file will be saved.
+    :param data: A :class:`~chemprop.data.MoleculeDataset` containing the datapoints.
+    :param graphs: A :class:`~chemprop.features.PackedMolGraphs` containing all molecules in :code:`data`.
+    :param smiles_columns: The names of the columns containing SMILES.
+    :param task_names: The names of the targets.
+    :param features_generator: The features generators used to compute the features (for reference).
+    """
+    targets = data.targets()
+    arrays = {
+        'smiles': np.frombuffer('\n'.join(graphs.smiles).encode(), dtype=np.uint8),
+        'mol_indices': np.array([[graphs.smiles_to_index[s] for s in smiles] for smiles in data.smiles()],
+                                dtype=np.int64).reshape(len(data), len(smiles_columns)),
+        'targets': np.array([[t if t is not None else np.nan for t in row] for row in targets],
+                            dtype=np.float32).reshape(len(data), len(task_names)),
+        'mask': np.array([[t is not None for t in row] for row in targets],
+                         dtype=bool).reshape(len(data), len(task_names))
+    }
+
+    if data.features() is not None:
+        arrays['features'] = np.array(data.features(), dtype=np.float32)
+
+    for name in GRAPH_ARRAYS:
+        if getattr(graphs, name) is not None:
+            arrays[f'graphs.{name}'] = getattr(graphs, name)
+
+    header = {
+        'version': COMPILED_DATA_VERSION,
+        'smiles_columns': smiles_columns,
+        'task_names': task_names,
+        'graph_featurization': graphs.featurization,
+        'features_generator': features_generator
+    }
+
+    save_arrays(path, header, arrays)
+
+
+def load_compiled_data(path: str,
+                       target_columns: List[str] = None,
+                       ignore_columns: List[str] = None,
+                       use_features: bool = False,
+                       max_data_size: int = None,
+                       store_row: bool = False,
+                       skip_none_targets: bool = False) -> ColumnarMoleculeDataset:
+    """
+    Loads a :class:`~chemprop.data.ColumnarMoleculeDataset` from a compiled data file.
+
+    The graph arrays and features are memory-mapped and the dataset refers to its molecules
+    in the packed graphs, so no RDKit work is needed to featurize the molecules.
+
+    :param path: Path to a compiled data file.
+    :param target_columns: Name of the targets to load. By default, loads all targets except the :code:`ignore_columns`.
+    :param ignore_columns: Name of the targets to ignore when :code:`target_columns` is not provided.
+    :param use_features: Whether to load the features stored in the file.
+    :param max_data_size: The maximum number of data points to load.
+    :param store_row: Whether to store the SMILES of each datapoint as its row.
+    :param skip_none_targets: Whether to skip datapoints whose loaded targets are all unknown.
+    :return: A :class:`~chemprop.data.ColumnarMoleculeDataset` containing the compiled data.
+    """
+    header, arrays = load_arrays(path)
+    smiles_columns, task_names = header['smiles_columns'], header['task_names']
+
+    if target_columns is None:
+        ignore_columns = set(ignore_columns if ignore_columns is not None else [])
+        target_columns = [name for name in task_names if name not in ignore_columns]
+
+    missing_columns = set(target_columns) - set(task_names)
+    if len(missing_columns) > 0:
+        raise ValueError(f'Targets {sorted(missing_columns)} are not in compiled data file "{path}".')
+
+    if use_features and 'features' not in arrays:
+        raise ValueError(f'Compiled data file "{path}" does not contain features. '
+                         f'Please run chemprop_preprocess with --features_generator or --features_path.')
+
+    # Indexing a memory-mapped array with an index array copies it into memory, so the arrays are only
+    # indexed that way when tasks or rows are dropped. Otherwise slices keep them memory-mapped.
+    task_indices = [task_names.index(name) for name in target_columns]
+    targets, mask = arrays['targets'], arrays['mask']
+    if task_indices != list(range(len(task_names))):
+        targets, mask = targets[:, task_indices], mask[:, task_indices]
+
+    if skip_none_targets:
+        rows = np.flatnonzero(mask.any(axis=1))[:max_data_size]
+    else:
+        rows = slice(max_data_size)
+
+    graphs = PackedMolGraphs(
+        smiles=bytes(arrays['smiles']).decode().split('\n'),
+        featurization=header['graph_featurization'],
+        **{name: arrays.get(f'graphs.{name}') for name in GRAPH_ARRAYS}
+    )
+    packed_indices = arrays['mol_indices'][rows]
+    smiles = np.array(graphs.smiles, dtype=object)[packed_indices]
+
+    return ColumnarMoleculeDataset(
+        smiles=smiles,
+        targets=targets[rows],
+        mask=mask[rows],
+        features=arrays['features'][rows] if use_features else None,
+        rows=[OrderedDict(zip(smiles_columns, row_smiles)) for row_smiles in smiles.tolist()] if store_row else None,
+        packed_graphs=graphs,
+        packed_indices=packed_indices
+    )
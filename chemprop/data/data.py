@@ -1,20 +1,30 @@
+import atexit
 import threading
 from collections import OrderedDict
+from functools import partial
+from queue import Empty, Full, Queue
 from random import Random
-from typing import Dict, Iterator, List, Optional, Union
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
-from torch.utils.data import DataLoader, Dataset, Sampler
+import torch
+from torch.utils.data import BatchSampler, DataLoader, Dataset, Sampler
 from rdkit import Chem
 
+from .disk_cache import DiskGraphCache
+from .lru_cache import LRUCache
 from .scaler import StandardScaler
+from .worker_pool import WorkerPool
 from chemprop.features import get_features_generator
-from chemprop.features import BatchMolGraph, MolGraph
+from chemprop.features import BatchMolGraph, get_atom_fdim, graph_featurization, MolGraph, PackedMolGraphs, \
+    set_extra_atom_fdim, set_graph_featurization
+from chemprop.features.featurization import ATOM_FDIM
 
 
-# Cache of graph featurizations
+# Cache of graph featurizations, bounded by the memory of the graph arrays
 CACHE_GRAPH = True
-SMILES_TO_GRAPH: Dict[str, MolGraph] = {}
+CACHE_GRAPH_SIZE = 4096  # MB
+SMILES_TO_GRAPH = LRUCache(max_size=CACHE_GRAPH_SIZE, sizeof=lambda mol_graph: mol_graph.nbytes)
 
 
 def cache_graph() -> bool:
@@ -28,9 +38,68 @@ def set_cache_graph(cache_graph: bool) -> None:
     CACHE_GRAPH = cache_graph
 
 
-# Cache of RDKit molecules
+def set_cache_graph_size(size: float) -> None:
+    r"""Sets the maximum memory in MB of the cached :class:`~chemprop.features.MolGraph`\ s."""
+    SMILES_TO_GRAPH.set_max_size(size)
+
+
+# Graph featurizations computed once for a whole dataset
+PACKED_GRAPHS: Optional[PackedMolGraphs] = None
+
+
+def packed_graphs() -> Optional[PackedMolGraphs]:
+    r"""Returns the :class:`~chemprop.features.PackedMolGraphs` consulted before featurizing a molecule."""
+    return PACKED_GRAPHS
+
+
+def set_packed_graphs(graphs: Optional[PackedMolGraphs]) -> None:
+    r"""Sets the :class:`~chemprop.features.PackedMolGraphs` consulted before featurizing a molecule."""
+    global PACKED_GRAPHS
+    PACKED_GRAPHS = graphs
+
+
+# Persistent cache of graph featurizations shared across runs
+DISK_GRAPH_CACHE: Optional[DiskGraphCache] = None
+
+
+def disk_graph_cache() -> Optional[DiskGraphCache]:
+    r"""Returns the :class:`~chemprop.data.disk_cache.DiskGraphCache` consulted before featurizing a molecule."""
+    return DISK_GRAPH_CACHE
+
+
+def set_disk_graph_cache(cache: Optional[DiskGraphCache]) -> None:
+    r"""Sets the :class:`~chemprop.data.disk_cache.DiskGraphCache` consulted before featurizing a molecule."""
+    global DISK_GRAPH_CACHE
+    DISK_GRAPH_CACHE = cache
+
+
+# Approximate memory of an RDKit molecule
+MOL_BASE_BYTES = 1024
+MOL_ATOM_BYTES = 512
+MOL_BOND_BYTES = 256
+
+
+def mol_nbytes(mol: Optional[Union[Chem.Mol, bytes]]) -> int:
+    """
+    Estimates the memory used by an RDKit molecule.
+
+    :param mol: An RDKit molecule, its binary pickle from :code:`Chem.Mol.ToBinary`, or None.
+    :return: The approximate number of bytes used by the molecule.
+    """
+    if mol is None:
+        return MOL_BASE_BYTES
+
+    if isinstance(mol, bytes):
+        return len(mol)
+
+    return MOL_BASE_BYTES + MOL_ATOM_BYTES * mol.GetNumAtoms() + MOL_BOND_BYTES * mol.GetNumBonds()
+
+
+# Cache of RDKit molecules, bounded by their approximate memory
 CACHE_MOL = True
-SMILES_TO_MOL: Dict[str, Chem.Mol] = {}
+CACHE_MOL_BINARY = False
+CACHE_MOL_SIZE = 1024  # MB
+SMILES_TO_MOL = LRUCache(max_size=CACHE_MOL_SIZE, sizeof=mol_nbytes)
 
 
 def cache_mol() -> bool:
@@ -44,6 +113,82 @@ def set_cache_mol(cache_mol: bool) -> None:
     CACHE_MOL = cache_mol
 
 
+def cache_mol_binary() -> bool:
+    r"""Returns whether RDKit molecules are cached as compact binary pickles rather than as molecules."""
+    return CACHE_MOL_BINARY
+
+
+def set_cache_mol_binary(cache_mol_binary: bool) -> None:
+    r"""
+    Sets whether RDKit molecules are cached as compact binary pickles rather than as molecules.
+
+    Binary pickles from :code:`Chem.Mol.ToBinary` use a fraction of the memory of a molecule and are
+    rebuilt much faster than parsing the SMILES again.
+
+    :param cache_mol_binary: Whether to cache binary pickles.
+    """
+    global CACHE_MOL_BINARY
+    CACHE_MOL_BINARY = cache_mol_binary
+
+
+def set_cache_mol_size(size: float) -> None:
+    r"""Sets the maximum approximate memory in MB of the cached RDKit molecules."""
+    SMILES_TO_MOL.set_max_size(size)
+
+
+def cache_info() -> Dict[str, Dict[str, int]]:
+    """
+    Returns the statistics of the in-memory molecule and graph caches of this process.
+
+    :return: A dictionary with the :meth:`~chemprop.data.lru_cache.LRUCache.info` of the :code:`mol`
+             and :code:`graph` caches.
+    """
+    return {'mol': SMILES_TO_MOL.info(), 'graph': SMILES_TO_GRAPH.info()}
+
+
+def make_mol(smiles: str) -> Optional[Chem.Mol]:
+    """
+    Gets the RDKit molecule of a SMILES from the molecule cache, parsing the SMILES only on a cache miss.
+
+    :param smiles: A SMILES string.
+    :return: The RDKit molecule, or None if the SMILES is invalid.
+    """
+    try:
+        mol = SMILES_TO_MOL[smiles]
+        if isinstance(mol, bytes):
+            mol = Chem.Mol(mol)
+    except KeyError:
+        mol = Chem.MolFromSmiles(smiles)
+        if cache_mol():
+            SMILES_TO_MOL[smiles] = mol.ToBinary() if cache_mol_binary() and mol is not None else mol
+
+    return mol
+
+
+def generate_features(mols: List[Chem.Mol], features_generator: List[str]) -> np.ndarray:
+    """
+    Generates the additional features of the molecules of a datapoint.
+
+    :param mols: The RDKit molecules of the datapoint.
+    :param features_generator: A list of features generators to use.
+    :return: A 1D numpy array with the features of every generator for every valid molecule, which are zeros
+             for molecules without heavy atoms.
+    """
+    features = []
+
+    for fg in features_generator:
+        generator = get_features_generator(fg)
+        for m in mols:
+            if m is not None and m.GetNumHeavyAtoms() > 0:
+                features.extend(generator(m))
+            # for H2
+            elif m is not None and m.GetNumHeavyAtoms() == 0:
+                # not all features are equally long, so use methane as dummy molecule to determine length
+                features.extend(np.zeros(len(generator(Chem.MolFromSmiles('C')))))
+
+    return np.array(features)
+
+
 class MoleculeDatapoint:
     """A :class:`MoleculeDatapoint` contains a single molecule and its associated features and targets."""
 
@@ -54,13 +199,17 @@ class MoleculeDatapoint:
                  features: np.ndarray = None,
                  features_generator: List[str] = None,
                  atom_features: np.ndarray = None,
-                 atom_descriptors: np.ndarray = None):
+                 atom_descriptors: np.ndarray = None,
+                 packed_graphs: PackedMolGraphs = None,
+                 packed_indices: List[int] = None):
         """
         :param smiles: A list of the SMILES strings for the molecules.
         :param targets: A list of targets for the molecule (contains None for unknown target values).
         :param row: The raw CSV row containing the information for this molecule.
         :param features: A numpy array containing additional features (e.g., Morgan fingerprint).
         :param features_generator: A list of features generators to use.
+        :param packed_graphs: Already featurized graphs which contain the molecules (e.g., from a compiled data file).
+        :param packed_indices: The index of each molecule in :code:`packed_graphs`.
         """
         if features is not None and features_generator is not None:
             raise ValueError('Cannot provide both loaded features and a features generator.')
@@ -72,22 +221,12 @@ class MoleculeDatapoint:
         self.features_generator = features_generator
         self.atom_descriptors = atom_descriptors
         self.atom_features = atom_features
+        self.packed_graphs = packed_graphs
+        self.packed_indices = packed_indices
 
         # Generate additional features if given a generator
         if self.features_generator is not None:
-            self.features = []
-
-            for fg in self.features_generator:
-                features_generator = get_features_generator(fg)
-                for m in self.mol:
-                    if m is not None and m.GetNumHeavyAtoms() > 0:
-                        self.features.extend(features_generator(m))
-                    # for H2
-                    elif m is not None and m.GetNumHeavyAtoms() == 0:
-                        # not all features are equally long, so use methane as dummy molecule to determine length
-                        self.features.extend(np.zeros(len(features_generator(Chem.MolFromSmiles('C')))))
-
-            self.features = np.array(self.features)
+            self.features = generate_features(self.mol, self.features_generator)
 
         # Fix nans in features
         replace_token = 0
@@ -108,13 +247,7 @@ class MoleculeDatapoint:
     @property
     def mol(self) -> List[Chem.Mol]:
         """Gets the corresponding list of RDKit molecules for the corresponding SMILES list."""
-        mol = [SMILES_TO_MOL.get(s, Chem.MolFromSmiles(s)) for s in self.smiles]
-        
-        if cache_mol():
-            for s, m in zip(self.smiles, mol):
-                SMILES_TO_MOL[s] = m
-
-        return mol
+        return [make_mol(s) for s in self.smiles]
 
     @property
     def number_of_molecules(self) -> int:
@@ -172,6 +305,7 @@ class MoleculeDataset(Dataset):
         self._data = data
         self._scaler = None
         self._batch_graph = None
+        self._target_tensors = None
         self._random = Random()
 
     def smiles(self, flatten: bool = False) -> Union[List[str], List[List[str]]]:
@@ -223,27 +357,98 @@ class MoleculeDataset(Dataset):
         if self._batch_graph is None:
             self._batch_graph = []
 
-            mol_graphs = []
-            for d in self._data:
+            rows = list(self.graph_rows())
+            mol_graphs, missing = [], []
+            for j, (smiles, atom_features, packed, packed_indices) in enumerate(rows):
                 mol_graphs_list = []
-                for s, m in zip(d.smiles, d.mol):
-                    if s in SMILES_TO_GRAPH:
-                        mol_graph = SMILES_TO_GRAPH[s]
+                for i, s in enumerate(smiles):
+                    if packed is not None and packed.featurization == graph_featurization():
+                        mol_graph = packed.graph(packed_indices[i])
                     else:
-                        if len(d.smiles) > 1 and d.atom_features is not None:
-                            raise NotImplementedError('Atom descriptors are currently only supported with one molecule '
-                                                      'per input (i.e., number_of_molecules = 1).')
+                        mol_graph = SMILES_TO_GRAPH.get(s)
+                        if mol_graph is not None and mol_graph.featurization != graph_featurization():
+                            mol_graph = None
+
+                        if mol_graph is None and PACKED_GRAPHS is not None and s in PACKED_GRAPHS \
+                                and PACKED_GRAPHS.featurization == graph_featurization():
+                            mol_graph = PACKED_GRAPHS[s]
 
-                        mol_graph = MolGraph(m, d.atom_features)
-                        if cache_graph():
-                            SMILES_TO_GRAPH[s] = mol_graph
+                        if mol_graph is None:
+                            missing.append((j, i))  # featurized below
                     mol_graphs_list.append(mol_graph)
                 mol_graphs.append(mol_graphs_list)
 
+            # Look up the remaining molecules on disk all at once and featurize the rest
+            disk_graphs = {}
+            if DISK_GRAPH_CACHE is not None and len(missing) > 0:
+                disk_graphs = DISK_GRAPH_CACHE.get_many(rows[j][0][i] for j, i in missing if rows[j][1] is None)
+
+            new_graphs = {}
+            for j, i in missing:
+                smiles, atom_features = rows[j][0], rows[j][1]
+                s = smiles[i]
+                if s in disk_graphs and atom_features is None:
+                    mol_graph = disk_graphs[s]
+                else:
+                    if len(smiles) > 1 and atom_features is not None:
+                        raise NotImplementedError('Atom descriptors are currently only supported with one molecule '
+                                                  'per input (i.e., number_of_molecules = 1).')
+
+                    mol_graph = MolGraph(make_mol(s), atom_features)
+                    if atom_features is None:
+                        new_graphs[s] = mol_graph
+                if cache_graph():
+                    SMILES_TO_GRAPH[s] = mol_graph
+                mol_graphs[j][i] = mol_graph
+
+            if DISK_GRAPH_CACHE is not None:
+                DISK_GRAPH_CACHE.put_many(new_graphs)
+
             self._batch_graph = [BatchMolGraph([g[i] for g in mol_graphs]) for i in range(len(mol_graphs[0]))]
 
         return self._batch_graph
 
+    def graph_rows(self) -> Iterator[Tuple[List[str], Optional[np.ndarray], Optional[PackedMolGraphs],
+                                            Optional[List[int]]]]:
+        """
+        Iterates over what is needed to featurize the molecules of each datapoint.
+
+        :return: An iterator of tuples with the SMILES, the atom features (or None), the packed graphs containing
+                 the molecules (or None), and the indices of the molecules in the packed graphs (or None).
+        """
+        for d in self._data:
+            yield d.smiles, d.atom_features, d.packed_graphs, d.packed_indices
+
+    def num_atoms(self) -> np.ndarray:
+        """
+        Counts the atoms of the molecules in each datapoint without featurizing them.
+
+        The counts come from the packed graphs or the graph cache when possible and otherwise from RDKit.
+
+        :return: A 1D array with the total number of atoms in the molecules of each datapoint.
+        """
+        num_atoms = np.zeros(len(self), dtype=np.int64)
+        for j, (smiles, _, packed, packed_indices) in enumerate(self.graph_rows()):
+            for i, s in enumerate(smiles):
+                if packed is not None:
+                    num_atoms[j] += packed.atom_offsets[packed_indices[i] + 1] - packed.atom_offsets[packed_indices[i]]
+                elif s in SMILES_TO_GRAPH:
+                    num_atoms[j] += SMILES_TO_GRAPH.get(s).n_atoms
+                else:
+                    mol = make_mol(s)
+                    num_atoms[j] += mol.GetNumAtoms() if mol is not None else 0
+
+        return num_atoms
+
+    def subset(self, indices: Sequence[int]) -> 'MoleculeDataset':
+        r"""
+        Selects datapoints by index.
+
+        :param indices: The indices of the datapoints to select, in order.
+        :return: A :class:`MoleculeDataset` containing the selected :class:`MoleculeDatapoint`\ s.
+        """
+        return MoleculeDataset([self._data[i] for i in indices])
+
     def features(self) -> List[np.ndarray]:
         """
         Returns the features associated with each molecule (if they exist).
@@ -275,6 +480,29 @@ class MoleculeDataset(Dataset):
         """
         return [d.targets for d in self._data]
 
+    def target_tensors(self) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Returns the targets and the mask of known targets as float32 tensors ready for computing the loss.
+
+        .. note::
+           The tensors are cached after the first time they are computed, like :meth:`batch_graph`,
+           and are recomputed only after the targets are set, normalized, or reset.
+
+        :return: A tuple with a :code:`(num_data, num_tasks)` tensor of targets (0 where unknown)
+                 and a tensor of the same shape which is 1 where the target is known and 0 otherwise,
+                 or a tuple of None if the molecules have no targets (e.g., when predicting on SMILES).
+        """
+        if self._target_tensors is None:
+            targets = self.targets()
+            if any(row is None for row in targets):
+                return None, None
+
+            mask = torch.tensor([[t is not None for t in row] for row in targets], dtype=torch.float32)
+            targets = torch.tensor([[t if t is not None else 0 for t in row] for row in targets], dtype=torch.float32)
+            self._target_tensors = (targets, mask)
+
+        return self._target_tensors
+
     def num_tasks(self) -> int:
         """
         Returns the number of prediction tasks.
@@ -372,11 +600,13 @@ class MoleculeDataset(Dataset):
         assert len(self._data) == len(targets)
         for i in range(len(self._data)):
             self._data[i].set_targets(targets[i])
+        self._target_tensors = None
 
     def reset_features_and_targets(self) -> None:
         """Resets the features and targets to their raw values."""
         for d in self._data:
             d.reset_features_and_targets()
+        self._target_tensors = None
 
     def __len__(self) -> int:
         """
@@ -397,6 +627,337 @@ class MoleculeDataset(Dataset):
         return self._data[item]
 
 
+class ColumnarMoleculeDataset(MoleculeDataset):
+    r"""
+    A :class:`ColumnarMoleculeDataset` is a :class:`MoleculeDataset` stored as columns of NumPy arrays.
+
+    The SMILES are a :code:`(num_data, number_of_molecules)` array, the features are a float32
+    :code:`(num_data, features_size)` matrix, and the targets are a float32 :code:`(num_data, num_tasks)` matrix
+    with a boolean mask of which targets are known. Scaling transforms whole matrices at once, and selecting
+    datapoints with a list of indices (as the :class:`MoleculeDataLoader` does for each batch) slices the columns.
+
+    Indexing with an int or a slice builds :class:`MoleculeDatapoint`\ s from the columns, so changes made
+    to those datapoints are not stored in the dataset.
+    """
+
+    def __init__(self,
+                 smiles: np.ndarray,
+                 targets: np.ndarray,
+                 mask: np.ndarray,
+                 features: np.ndarray = None,
+                 atom_features: List[np.ndarray] = None,
+                 atom_descriptors: List[np.ndarray] = None,
+                 rows: List[OrderedDict] = None,
+                 packed_graphs: PackedMolGraphs = None,
+                 packed_indices: np.ndarray = None):
+        """
+        :param smiles: A :code:`(num_data, number_of_molecules)` array of SMILES.
+        :param targets: A :code:`(num_data, num_tasks)` float32 array of targets (any value where unknown).
+        :param mask: A :code:`(num_data, num_tasks)` boolean array of which targets are known.
+        :param features: A :code:`(num_data, features_size)` float32 array of additional features, or None.
+        :param atom_features: A list with the atom features of each datapoint, or None.
+        :param atom_descriptors: A list with the atom descriptors of each datapoint, or None.
+        :param rows: A list with the raw CSV row of each datapoint, or None.
+        :param packed_graphs: Already featurized graphs which contain all the molecules, or None.
+        :param packed_indices: A :code:`(num_data, number_of_molecules)` array with the index of each molecule
+                               in :code:`packed_graphs`, or None.
+        """
+        super(ColumnarMoleculeDataset, self).__init__([])
+        self._smiles = smiles
+        self._raw_targets = self._targets = targets
+        self._mask = mask
+        self._raw_features = self._features = features
+        self._atom_features = atom_features
+        self._atom_descriptors = atom_descriptors
+        self._rows = rows
+        self._packed_graphs = packed_graphs
+        self._packed_indices = packed_indices
+
+    @classmethod
+    def from_datapoints(cls, data: List[MoleculeDatapoint]) -> 'ColumnarMoleculeDataset':
+        r"""
+        Builds a :class:`ColumnarMoleculeDataset` from the raw features and targets of :class:`MoleculeDatapoint`\ s.
+
+        Packed graphs are kept only if all datapoints share the same :class:`~chemprop.features.PackedMolGraphs`.
+
+        :param data: A non-empty list of :class:`MoleculeDatapoint`\ s.
+        :return: A :class:`ColumnarMoleculeDataset` containing the datapoints.
+        """
+        targets = [d.raw_targets for d in data]
+        packed_graphs = data[0].packed_graphs
+        if packed_graphs is not None and any(d.packed_graphs is not packed_graphs for d in data):
+            packed_graphs = None
+
+        return cls(
+            smiles=np.array([d.smiles for d in data], dtype=object).reshape(len(data), -1),
+            targets=np.array([[t if t is not None else np.nan for t in row] for row in targets],
+                             dtype=np.float32).reshape(len(data), -1),
+            mask=np.array([[t is not None for t in row] for row in targets], dtype=bool).reshape(len(data), -1),
+            features=np.array([d.raw_features for d in data], dtype=np.float32)
+            if data[0].raw_features is not None else None,
+            atom_features=[d.atom_features for d in data] if data[0].atom_features is not None else None,
+            atom_descriptors=[d.atom_descriptors for d in data] if data[0].atom_descriptors is not None else None,
+            rows=[d.row for d in data] if data[0].row is not None else None,
+            packed_graphs=packed_graphs,
+            packed_indices=np.array([d.packed_indices for d in data], dtype=np.int64)
+            if packed_graphs is not None else None
+        )
+
+    def smiles(self, flatten: bool = False) -> Union[List[str], List[List[str]]]:
+        """
+        Returns a list containing the SMILES list associated with each datapoint.
+
+        :param flatten: Whether to flatten the returned SMILES to a list instead of a list of lists.
+        :return: A list of SMILES or a list of lists of SMILES, depending on :code:`flatten`.
+        """
+        return self._smiles.ravel().tolist() if flatten else self._smiles.tolist()
+
+    def mols(self, flatten: bool = False) -> Union[List[Chem.Mol], List[List[Chem.Mol]]]:
+        """
+        Returns a list of the RDKit molecules associated with each datapoint.
+
+        :param flatten: Whether to flatten the returned RDKit molecules to a list instead of a list of lists.
+        :return: A list of SMILES or a list of lists of RDKit molecules, depending on :code:`flatten`.
+        """
+        if flatten:
+            return [make_mol(s) for s in self._smiles.ravel()]
+
+        return [[make_mol(s) for s in smiles] for smiles in self._smiles]
+
+    @property
+    def number_of_molecules(self) -> int:
+        """
+        Gets the number of molecules in each datapoint.
+
+        :return: The number of molecules.
+        """
+        return self._smiles.shape[1] if len(self) > 0 else None
+
+    def graph_rows(self) -> Iterator[Tuple[List[str], Optional[np.ndarray], Optional[PackedMolGraphs],
+                                            Optional[List[int]]]]:
+        """Iterates over what is needed to featurize the molecules of each datapoint."""
+        for j, smiles in enumerate(self._smiles.tolist()):
+            yield (smiles,
+                   self._atom_features[j] if self._atom_features is not None else None,
+                   self._packed_graphs,
+                   self._packed_indices[j] if self._packed_indices is not None else None)
+
+    def subset(self, indices: Sequence[int]) -> 'ColumnarMoleculeDataset':
+        """
+        Selects datapoints by index by slicing the columns.
+
+        :param indices: The indices of the datapoints to select, in order.
+        :return: A :class:`ColumnarMoleculeDataset` containing the selected datapoints.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+
+        dataset = ColumnarMoleculeDataset(
+            smiles=self._smiles[indices],
+            targets=self._raw_targets[indices],
+            mask=self._mask[indices],
+            features=self._raw_features[indices] if self._raw_features is not None else None,
+            atom_features=[self._atom_features[i] for i in indices] if self._atom_features is not None else None,
+            atom_descriptors=[self._atom_descriptors[i] for i in indices]
+            if self._atom_descriptors is not None else None,
+            rows=[self._rows[i] for i in indices] if self._rows is not None else None,
+            packed_graphs=self._packed_graphs,
+            packed_indices=self._packed_indices[indices] if self._packed_indices is not None else None
+        )
+        dataset._targets = self._targets[indices]
+        dataset._features = self._features[indices] if self._features is not None else None
+        dataset._scaler = self._scaler
+
+        return dataset
+
+    def features(self) -> Optional[np.ndarray]:
+        """
+        Returns the features associated with each datapoint (if they exist).
+
+        :return: A :code:`(num_data, features_size)` float32 array of features or None if there are no features.
+        """
+        return self._features if len(self) > 0 else None
+
+    def atom_descriptors(self) -> Optional[List[np.ndarray]]:
+        """
+        Returns the atom descriptors associated with each datapoint (if they exist).
+
+        :return: A list of 2D numpy arrays containing the atom descriptors or None if there are no descriptors.
+        """
+        return self._atom_descriptors if len(self) > 0 else None
+
+    def targets(self) -> List[List[Optional[float]]]:
+        """
+        Returns the targets associated with each datapoint.
+
+        :return: A list of lists of floats (or None) containing the targets.
+        """
+        return np.where(self._mask, self._targets, None).tolist()
+
+    def mask(self) -> np.ndarray:
+        """
+        Returns which targets are known.
+
+        :return: A :code:`(num_data, num_tasks)` boolean array.
+        """
+        return self._mask
+
+    def target_tensors(self) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Returns the targets and the mask of known targets as float32 tensors ready for computing the loss.
+
+        See :meth:`MoleculeDataset.target_tensors`.
+
+        :return: A tuple with a :code:`(num_data, num_tasks)` tensor of targets (0 where unknown)
+                 and a tensor of the same shape which is 1 where the target is known and 0 otherwise.
+        """
+        if self._target_tensors is None:
+            self._target_tensors = (torch.from_numpy(np.where(self._mask, self._targets, np.float32(0))),
+                                    torch.from_numpy(self._mask.astype(np.float32)))
+
+        return self._target_tensors
+
+    def num_tasks(self) -> int:
+        """
+        Returns the number of prediction tasks.
+
+        :return: The number of tasks.
+        """
+        return self._targets.shape[1] if len(self) > 0 else None
+
+    def features_size(self) -> int:
+        """
+        Returns the size of the additional features vector associated with the molecules.
+
+        :return: The size of the additional features vector.
+        """
+        return self._features.shape[1] if len(self) > 0 and self._features is not None else None
+
+    def atom_descriptors_size(self) -> int:
+        """
+        Returns the size of custom additional atom descriptors vector associated with the molecules.
+
+        :return: The size of the additional atom descriptor vector.
+        """
+        return self._atom_descriptors[0].shape[1] \
+            if len(self) > 0 and self._atom_descriptors is not None else None
+
+    def atom_features_size(self) -> int:
+        """
+        Returns the size of custom additional atom features vector associated with the molecules.
+
+        :return: The size of the additional atom feature vector.
+        """
+        return self._atom_features[0].shape[1] if len(self) > 0 and self._atom_features is not None else None
+
+    def normalize_features(self, scaler: StandardScaler = None, replace_nan_token: int = 0) -> StandardScaler:
+        """
+        Normalizes the features of the dataset using a :class:`~chemprop.data.StandardScaler`.
+
+        The whole feature matrix is transformed at once. See :meth:`MoleculeDataset.normalize_features`.
+
+        :param scaler: A fitted :class:`~chemprop.data.StandardScaler`. If it is provided it is used,
+                       otherwise a new :class:`~chemprop.data.StandardScaler` is first fitted to this
+                       data and is then used.
+        :param replace_nan_token: A token to use to replace NaN entries in the features.
+        :return: A fitted :class:`~chemprop.data.StandardScaler`.
+        """
+        if len(self) == 0 or self._raw_features is None:
+            return None
+
+        if scaler is not None:
+            self._scaler = scaler
+
+        elif self._scaler is None:
+            self._scaler = StandardScaler(replace_nan_token=replace_nan_token)
+            self._scaler.fit(self._raw_features)
+
+        self._features = self._scaler.transform(self._raw_features).astype(np.float32)
+
+        return self._scaler
+
+    def normalize_targets(self) -> StandardScaler:
+        """
+        Normalizes the targets of the dataset using a :class:`~chemprop.data.StandardScaler`.
+
+        The means and standard deviations are computed one task at a time from the known targets, and the
+        float32 target matrix is transformed without converting it to float64. This should only be used for
+        regression datasets.
+
+        :return: A :class:`~chemprop.data.StandardScaler` fitted to the targets.
+        """
+        means, stds = np.zeros(self.num_tasks()), np.ones(self.num_tasks())
+        for task in range(self.num_tasks()):
+            known_targets = self._raw_targets[self._mask[:, task], task]
+            if len(known_targets) > 0:
+                means[task] = known_targets.mean(dtype=np.float64)
+                stds[task] = known_targets.std(dtype=np.float64) or 1  # as in StandardScaler.fit, a std of 0 becomes 1
+
+        targets = self._raw_targets - means.astype(np.float32)
+        targets /= stds.astype(np.float32)
+        self._targets = targets
+        self._target_tensors = None
+
+        return StandardScaler(means, stds)
+
+    def set_targets(self, targets: List[List[Optional[float]]]) -> None:
+        """
+        Sets the targets for each datapoint in the dataset. Assumes the targets are aligned with the datapoints.
+
+        :param targets: A list of lists of floats (or None) containing targets for each datapoint. This must be the
+                        same length as the underlying dataset.
+        """
+        assert len(self) == len(targets)
+        self._mask = np.array([[t is not None for t in row] for row in targets], dtype=bool).reshape(len(self), -1)
+        self._targets = np.array([[t if t is not None else np.nan for t in row] for row in targets],
+                                 dtype=np.float32).reshape(len(self), -1)
+        self._target_tensors = None
+
+    def reset_features_and_targets(self) -> None:
+        """Resets the features and targets to their raw values."""
+        self._features, self._targets = self._raw_features, self._raw_targets
+        self._target_tensors = None
+
+    def __len__(self) -> int:
+        """
+        Returns the length of the dataset (i.e., the number of datapoints).
+
+        :return: The length of the dataset.
+        """
+        return len(self._smiles)
+
+    def __getitem__(self, item) -> Union[MoleculeDatapoint, List[MoleculeDatapoint], 'ColumnarMoleculeDataset']:
+        r"""
+        Gets one or more datapoints via an index, a slice, or a list of indices.
+
+        :param item: An index (int), a slice object, or a list or array of indices.
+        :return: A :class:`MoleculeDatapoint` if an int is provided, a list of :class:`MoleculeDatapoint`\ s
+                 if a slice is provided, or a :class:`ColumnarMoleculeDataset` if a list of indices is provided.
+        """
+        if isinstance(item, slice):
+            return [self[i] for i in range(len(self))[item]]
+
+        if isinstance(item, (list, np.ndarray)):
+            return self.subset(item)
+
+        if not -len(self) <= item < len(self):
+            raise IndexError('ColumnarMoleculeDataset index out of range')
+
+        datapoint = MoleculeDatapoint(
+            smiles=self._smiles[item].tolist(),
+            targets=[float(t) if m else None for t, m in zip(self._raw_targets[item], self._mask[item])],
+            row=self._rows[item] if self._rows is not None else None,
+            features=self._raw_features[item] if self._raw_features is not None else None,
+            atom_features=self._atom_features[item] if self._atom_features is not None else None,
+            atom_descriptors=self._atom_descriptors[item] if self._atom_descriptors is not None else None,
+            packed_graphs=self._packed_graphs,
+            packed_indices=self._packed_indices[item].tolist() if self._packed_indices is not None else None
+        )
+        datapoint.features = self._features[item] if self._features is not None else None
+        datapoint.targets = [float(t) if m else None for t, m in zip(self._targets[item], self._mask[item])]
+
+        return datapoint
+
+
 class MoleculeSampler(Sampler):
     """A :class:`MoleculeSampler` samples data from a :class:`MoleculeDataset` for a :class:`MoleculeDataLoader`."""
 
@@ -422,7 +983,7 @@ class MoleculeSampler(Sampler):
 
         if self.class_balance:
             indices = np.arange(len(dataset))
-            has_active = np.array([any(target == 1 for target in datapoint.targets) for datapoint in dataset])
+            has_active = np.array([any(target == 1 for target in targets) for targets in dataset.targets()])
 
             self.positive_indices = indices[has_active].tolist()
             self.negative_indices = indices[~has_active].tolist()
@@ -454,22 +1015,410 @@ class MoleculeSampler(Sampler):
         return self.length
 
 
+class BucketBatchSampler(Sampler):
+    """
+    A :class:`BucketBatchSampler` groups the indices sampled by a :class:`MoleculeSampler` into batches
+    of molecules with similar numbers of atoms.
+
+    The datapoints are split into :code:`num_buckets` buckets by quantiles of their number of atoms. Each epoch,
+    the indices from the :class:`MoleculeSampler` (which may be shuffled and class balanced) are put in their
+    bucket in the order they are sampled, each bucket is cut into batches, and the batches of all the buckets
+    are shuffled together if the :class:`MoleculeSampler` shuffles. This reduces the padding of the batches
+    and makes the cost of training steps more even.
+
+    With :code:`max_atoms`, batches are cut when adding the next datapoint would exceed that total number
+    of atoms instead of after a fixed number of datapoints, so the memory of each step is bounded. A datapoint
+    with more atoms than :code:`max_atoms` forms a batch of its own. With a single bucket and a
+    :class:`MoleculeSampler` which does not shuffle, the batches follow the order of the dataset.
+    """
+
+    def __init__(self,
+                 sampler: MoleculeSampler,
+                 batch_size: int = None,
+                 num_buckets: int = 10,
+                 seed: int = 0,
+                 max_atoms: int = None):
+        """
+        :param sampler: The :class:`MoleculeSampler` whose indices are grouped into batches.
+        :param batch_size: The maximum number of datapoints in a batch, or None for no limit.
+        :param num_buckets: The number of buckets of datapoints with similar numbers of atoms.
+        :param seed: Random seed used to shuffle the batches.
+        :param max_atoms: The maximum total number of atoms in a batch, or None for no limit.
+        """
+        super(Sampler, self).__init__()
+
+        if batch_size is None and max_atoms is None:
+            raise ValueError('Either a batch size or a maximum number of atoms per batch is required.')
+
+        self.sampler = sampler
+        self.batch_size = batch_size
+        self.num_buckets = num_buckets
+        self.max_atoms = max_atoms
+
+        self.num_atoms = num_atoms = sampler.dataset.num_atoms()
+        boundaries = np.quantile(num_atoms, np.linspace(0, 1, num_buckets + 1)[1:-1]) if len(num_atoms) > 0 else []
+        self.buckets = np.searchsorted(boundaries, num_atoms, side='right')
+
+        self._random = Random(seed)
+        self._batches = None
+
+    def _make_batches(self) -> List[List[int]]:
+        """Groups the indices of one epoch of the :class:`MoleculeSampler` into batches."""
+        bucket_indices = [[] for _ in range(self.num_buckets)]
+        for index in self.sampler:
+            bucket_indices[self.buckets[index]].append(index)
+
+        batches = [batch for indices in bucket_indices for batch in self._split(indices)]
+
+        if self.sampler.shuffle:
+            self._random.shuffle(batches)
+
+        return batches
+
+    def _split(self, indices: List[int]) -> List[List[int]]:
+        """Cuts the indices of a bucket into consecutive batches within the batch size and the atom budget."""
+        if self.max_atoms is None:
+            return [indices[i:i + self.batch_size] for i in range(0, len(indices), self.batch_size)]
+
+        batches, batch, batch_atoms = [], [], 0
+        for index in indices:
+            if len(batch) > 0 and (len(batch) == self.batch_size
+                                   or batch_atoms + self.num_atoms[index] > self.max_atoms):
+                batches.append(batch)
+                batch, batch_atoms = [], 0
+
+            batch.append(index)
+            batch_atoms += self.num_atoms[index]
+
+        if len(batch) > 0:
+            batches.append(batch)
+
+        return batches
+
+    def __iter__(self) -> Iterator[List[int]]:
+        """Creates an iterator over batches of indices."""
+        batches = self._batches if self._batches is not None else self._make_batches()
+        self._batches = None
+
+        return iter(batches)
+
+    def __len__(self) -> int:
+        """Returns the number of batches of the next epoch."""
+        # The batches of the next epoch are planned now since the number of batches depends on the sampled indices
+        if self._batches is None:
+            self._batches = self._make_batches()
+
+        return len(self._batches)
+
+    def num_batches(self, num_epochs: int) -> int:
+        """
+        Returns the total number of batches of the next :code:`num_epochs` epochs.
+
+        With an atom budget or with class balance, the number of batches of an epoch depends on which datapoints
+        are sampled together, so it varies between epochs. The epochs are planned ahead and the random number
+        generators are then restored, so the count is exact as long as the epochs are sampled next.
+
+        :param num_epochs: The number of epochs.
+        :return: The total number of batches.
+        """
+        random_states = self.sampler._random.getstate(), self._random.getstate()
+        next_batches = self._batches
+
+        num_batches = 0
+        for _ in range(num_epochs):
+            num_batches += len(self)
+            self._batches = None
+
+        self._batches = next_batches
+        self.sampler._random.setstate(random_states[0])
+        self._random.setstate(random_states[1])
+
+        return num_batches
+
+
+def construct_columnar_batch(data: ColumnarMoleculeDataset) -> ColumnarMoleculeDataset:
+    """
+    Precomputes the :class:`~chemprop.features.BatchMolGraph` and the target tensors for a batch sliced from a
+    :class:`ColumnarMoleculeDataset`.
+
+    :param data: A :class:`ColumnarMoleculeDataset` containing the batch.
+    :return: The same :class:`ColumnarMoleculeDataset`.
+    """
+    data.batch_graph()  # Forces computation and caching of the BatchMolGraph for the molecules
+    data.target_tensors()  # Builds the target and mask tensors once instead of in every training step
+
+    # The packed graphs are no longer needed and would otherwise be sent back from data loader workers
+    data._packed_graphs = data._packed_indices = None
+
+    return data
+
+
 def construct_molecule_batch(data: List[MoleculeDatapoint]) -> MoleculeDataset:
     r"""
     Constructs a :class:`MoleculeDataset` from a list of :class:`MoleculeDatapoint`\ s.
 
-    Additionally, precomputes the :class:`~chemprop.features.BatchMolGraph` for the constructed
-    :class:`MoleculeDataset`.
+    Additionally, precomputes the :class:`~chemprop.features.BatchMolGraph` and the target tensors
+    for the constructed :class:`MoleculeDataset`.
 
     :param data: A list of :class:`MoleculeDatapoint`\ s.
     :return: A :class:`MoleculeDataset` containing all the :class:`MoleculeDatapoint`\ s.
     """
     data = MoleculeDataset(data)
     data.batch_graph()  # Forces computation and caching of the BatchMolGraph for the molecules
+    data.target_tensors()  # Builds the target and mask tensors once instead of in every training step
 
     return data
 
 
+class MoleculeBatch:
+    r"""
+    A :class:`MoleculeBatch` is a collated batch which contains only what a model step needs, as tensors.
+
+    :class:`MoleculeDataLoader` workers return :class:`MoleculeBatch`\ es instead of whole
+    :class:`MoleculeDataset`\ s so that the datapoints, their features, and their rows are not pickled back to
+    the main process for every batch. PyTorch sends the tensors of worker results through shared memory,
+    so the main process receives them without copying their data.
+
+    A :class:`MoleculeBatch` has the methods of a :class:`MoleculeDataset` used by training and prediction.
+    """
+
+    def __init__(self,
+                 batch_graph: List[BatchMolGraph],
+                 features: Optional[torch.Tensor],
+                 atom_descriptors: Optional[List[np.ndarray]],
+                 targets: Optional[torch.Tensor],
+                 mask: Optional[torch.Tensor]):
+        """
+        :param batch_graph: A list of :class:`~chemprop.features.BatchMolGraph` with one per molecule in a datapoint.
+        :param features: A :code:`(num_data, features_size)` float32 tensor of additional features, or None.
+        :param atom_descriptors: A list with the atom descriptors of each datapoint, or None.
+        :param targets: A :code:`(num_data, num_tasks)` float32 tensor of targets (0 where unknown), or None.
+        :param mask: A :code:`(num_data, num_tasks)` float32 tensor which is 1 where the target is known, or None.
+        """
+        self._batch_graph = batch_graph
+        self._features = features
+        self._atom_descriptors = atom_descriptors
+        self._targets = targets
+        self._mask = mask
+
+    @classmethod
+    def from_dataset(cls, data: MoleculeDataset) -> 'MoleculeBatch':
+        """
+        Builds a :class:`MoleculeBatch` from a collated :class:`MoleculeDataset`.
+
+        :param data: A :class:`MoleculeDataset` containing the batch.
+        :return: A :class:`MoleculeBatch` with the graphs, features, and targets of the batch.
+        """
+        features = data.features()
+
+        return cls(
+            batch_graph=data.batch_graph(),
+            features=torch.from_numpy(np.array(features, dtype=np.float32)) if features is not None else None,
+            atom_descriptors=data.atom_descriptors(),
+            targets=data.target_tensors()[0],
+            mask=data.target_tensors()[1]
+        )
+
+    def batch_graph(self) -> List[BatchMolGraph]:
+        """
+        Returns the graph featurization of the molecules.
+
+        :return: A list of :class:`~chemprop.features.BatchMolGraph` with one per molecule in a datapoint.
+        """
+        return self._batch_graph
+
+    def features(self) -> Optional[torch.Tensor]:
+        """
+        Returns the additional features of the datapoints.
+
+        :return: A :code:`(num_data, features_size)` float32 tensor or None if there are no features.
+        """
+        return self._features
+
+    def atom_descriptors(self) -> Optional[List[np.ndarray]]:
+        """
+        Returns the atom descriptors of the datapoints.
+
+        :return: A list of 2D numpy arrays or None if there are no atom descriptors.
+        """
+        return self._atom_descriptors
+
+    def target_tensors(self) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Returns the targets and the mask of known targets.
+
+        :return: A tuple with a :code:`(num_data, num_tasks)` float32 tensor of targets (0 where unknown)
+                 and a tensor of the same shape which is 1 where the target is known and 0 otherwise,
+                 or a tuple of None if the molecules have no targets.
+        """
+        return self._targets, self._mask
+
+    def __len__(self) -> int:
+        """
+        Returns the number of datapoints in the batch.
+
+        :return: The number of datapoints.
+        """
+        return len(self._batch_graph[0].a_scope)
+
+
+def construct_tensor_batch(data: Union[List[MoleculeDatapoint], ColumnarMoleculeDataset],
+                           construct_batch: Callable[..., MoleculeDataset]) -> MoleculeBatch:
+    """
+    Collates a batch in a :class:`MoleculeDataLoader` worker and keeps only its tensors.
+
+    :param data: The datapoints of the batch, as passed to :code:`construct_batch`.
+    :param construct_batch: The function collating the datapoints into a :class:`MoleculeDataset`.
+    :return: A :class:`MoleculeBatch` containing the batch.
+    """
+    return MoleculeBatch.from_dataset(construct_batch(data))
+
+
+def iterate_in_background(iterable: Iterable, queue_size: int) -> Iterator[Any]:
+    """
+    Iterates over an iterable in a background thread, which keeps up to :code:`queue_size` items ready.
+
+    This overlaps the work of producing the items (e.g., collating batches) with the work done on each item.
+    Exceptions raised by the iterable are raised again in the consuming thread. When the returned iterator is
+    exhausted, closed, or garbage collected, the background thread is stopped and joined.
+
+    :param iterable: The iterable to iterate over. It is only used by the background thread.
+    :param queue_size: The maximum number of items produced ahead of the consumer.
+    :return: An iterator over the items of the iterable.
+    """
+    queue, stop = Queue(maxsize=queue_size), threading.Event()
+
+    def put(item: Tuple[bool, Any]) -> bool:
+        """Puts an item in the queue, waiting for space unless the consumer stopped. Returns whether it was put."""
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+
+        return False
+
+    def produce() -> None:
+        """Puts the items in the queue as :code:`(True, item)` followed by :code:`(False, exception or None)`."""
+        try:
+            for item in iterable:
+                if not put((True, item)):
+                    return
+        except Exception as error:
+            put((False, error))
+        else:
+            put((False, None))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            try:
+                is_item, item = queue.get(timeout=0.1)
+            except Empty:
+                if not thread.is_alive() and queue.empty():
+                    return
+                continue
+
+            if not is_item:
+                if item is not None:
+                    raise item
+                return
+
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+# Worker processes shared by all the data loaders which use them
+WORKER_POOL: Optional[WorkerPool] = None
+# In a worker, the packed graphs of the datasets whose batches it collates
+WORKER_DATASET_PACKED_GRAPHS: Optional[PackedMolGraphs] = None
+
+
+def worker_state(dataset_packed_graphs: Optional[PackedMolGraphs]) -> Tuple:
+    """
+    Gets the settings of this process which workers need to collate batches like it would.
+
+    :param dataset_packed_graphs: The packed graphs of the dataset whose batches are collated, or None.
+    :return: A tuple with the cache settings, the featurization, the packed graphs, and the graph cache.
+    """
+    return (CACHE_GRAPH, SMILES_TO_GRAPH.max_size / 2 ** 20,
+            CACHE_MOL, CACHE_MOL_BINARY, SMILES_TO_MOL.max_size / 2 ** 20,
+            graph_featurization(), get_atom_fdim(), PACKED_GRAPHS, DISK_GRAPH_CACHE, dataset_packed_graphs)
+
+
+def initialize_worker(state: Tuple) -> None:
+    """
+    Applies the settings from :func:`worker_state` in a worker process.
+
+    :param state: The settings of the main process.
+    """
+    global WORKER_DATASET_PACKED_GRAPHS
+    (cache_graph, cache_graph_size, cache_mol, cache_mol_binary, cache_mol_size,
+     featurization, atom_fdim, graphs, disk_cache, WORKER_DATASET_PACKED_GRAPHS) = state
+
+    set_cache_graph(cache_graph)
+    set_cache_graph_size(cache_graph_size)
+    set_cache_mol(cache_mol)
+    set_cache_mol_binary(cache_mol_binary)
+    set_cache_mol_size(cache_mol_size)
+    set_graph_featurization(featurization)
+    set_extra_atom_fdim(atom_fdim - ATOM_FDIM)
+    set_packed_graphs(graphs)
+    set_disk_graph_cache(disk_cache)
+
+
+def shared_worker_pool(num_workers: int, dataset_packed_graphs: Optional[PackedMolGraphs] = None) -> WorkerPool:
+    """
+    Gets the shared :class:`~chemprop.data.worker_pool.WorkerPool`, which is started the first time it is needed.
+
+    The pool is started again only if the number of workers or the settings from :func:`worker_state` changed,
+    so the workers (and their caches) are reused across epochs, data loaders, models, and folds.
+
+    :param num_workers: The number of worker processes.
+    :param dataset_packed_graphs: The packed graphs of the dataset whose batches are collated, or None.
+    :return: The shared :class:`~chemprop.data.worker_pool.WorkerPool`.
+    """
+    global WORKER_POOL
+    state = worker_state(dataset_packed_graphs)
+
+    if WORKER_POOL is None or WORKER_POOL.num_workers != num_workers or WORKER_POOL.state != state:
+        close_worker_pool()
+        is_main_thread = threading.current_thread() is threading.main_thread()
+        WORKER_POOL = WorkerPool(num_workers, initializer=initialize_worker, state=state,
+                                 context=None if is_main_thread else 'forkserver')
+
+    return WORKER_POOL
+
+
+@atexit.register
+def close_worker_pool() -> None:
+    """Stops the shared :class:`~chemprop.data.worker_pool.WorkerPool` if it was started."""
+    global WORKER_POOL
+    if WORKER_POOL is not None:
+        WORKER_POOL.close()
+        WORKER_POOL = None
+
+
+def construct_batch_in_worker(data: Union[List[MoleculeDatapoint], ColumnarMoleculeDataset],
+                              construct_batch: Callable[..., MoleculeDataset]) -> MoleculeBatch:
+    """
+    Collates a batch in a shared worker, restoring the packed graphs which were not sent with the batch.
+
+    :param data: The datapoints of the batch, as passed to :code:`construct_batch`.
+    :param construct_batch: The function collating the datapoints into a :class:`MoleculeDataset`.
+    :return: A :class:`MoleculeBatch` containing the batch.
+    """
+    if isinstance(data, ColumnarMoleculeDataset) and data._packed_indices is not None:
+        data._packed_graphs = WORKER_DATASET_PACKED_GRAPHS
+
+    return construct_tensor_batch(data, construct_batch=construct_batch)
+
+
 class MoleculeDataLoader(DataLoader):
     """A :class:`MoleculeDataLoader` is a PyTorch :class:`DataLoader` for loading a :class:`MoleculeDataset`."""
 
@@ -479,8 +1428,13 @@ class MoleculeDataLoader(DataLoader):
                  num_workers: int = 8,
                  class_balance: bool = False,
                  shuffle: bool = False,
-                 seed: int = 0):
-        """
+                 seed: int = 0,
+                 num_buckets: int = 0,
+                 max_batch_atoms: int = None,
+                 prefetch_batches: int = 0,
+                 shared_workers: bool = False,
+                 cache_batches: bool = False):
+        r"""
         :param dataset: The :class:`MoleculeDataset` containing the molecules to load.
         :param batch_size: Batch size.
         :param num_workers: Number of workers used to build batches.
@@ -490,6 +1444,19 @@ class MoleculeDataLoader(DataLoader):
                               subset of the larger class.
         :param shuffle: Whether to shuffle the data.
         :param seed: Random seed. Only needed if shuffle is True.
+        :param num_buckets: If positive, batches are made of molecules with similar numbers of atoms
+                            using a :class:`BucketBatchSampler` with this many buckets. This changes
+                            the order of the data, so it is meant for training.
+        :param max_batch_atoms: If provided, batches are filled with molecules until this total number of atoms
+                                is reached instead of containing :code:`batch_size` molecules.
+        :param prefetch_batches: If positive and there are no workers, up to this many batches are collated
+                                 ahead in a background thread while the current batch is used.
+        :param shared_workers: Whether to collate batches in the shared, persistent worker processes
+                               (see :func:`shared_worker_pool`) instead of starting workers for every epoch.
+        :param cache_batches: Whether to keep the collated batches of the first full iteration as
+                              :class:`MoleculeBatch`\ es and return them again in later iterations instead of
+                              collating them again. This requires the order of the data to be fixed, and the
+                              batches do not reflect changes made to the dataset after they are cached.
         """
         self._dataset = dataset
         self._batch_size = batch_size
@@ -497,6 +1464,16 @@ class MoleculeDataLoader(DataLoader):
         self._class_balance = class_balance
         self._shuffle = shuffle
         self._seed = seed
+        self._num_buckets = num_buckets
+        self._max_batch_atoms = max_batch_atoms
+        self._prefetch_batches = prefetch_batches
+        self._shared_workers = shared_workers and num_workers > 0
+        self._cache_batches = cache_batches
+        self._cached_batches = None
+
+        if self._cache_batches and (self._class_balance or self._shuffle):
+            raise ValueError('Cannot cache batches when class balance or shuffle are enabled.')
+
         self._context = None
         self._timeout = 0
         is_main_thread = threading.current_thread() is threading.main_thread()
@@ -511,14 +1488,36 @@ class MoleculeDataLoader(DataLoader):
             seed=self._seed
         )
 
+        if self._max_batch_atoms is not None:
+            self._batch_sampler = BucketBatchSampler(self._sampler, num_buckets=max(self._num_buckets, 1),
+                                                     seed=self._seed, max_atoms=self._max_batch_atoms)
+        elif self._num_buckets > 0:
+            self._batch_sampler = BucketBatchSampler(self._sampler, batch_size=self._batch_size,
+                                                     num_buckets=self._num_buckets, seed=self._seed)
+        else:
+            self._batch_sampler = BatchSampler(self._sampler, batch_size=self._batch_size, drop_last=False)
+
+        # Columnar datasets are indexed with the indices of a whole batch at once, which slices their columns
+        if isinstance(self._dataset, ColumnarMoleculeDataset):
+            batch_options = dict(batch_size=None,
+                                 sampler=self._batch_sampler,
+                                 collate_fn=construct_columnar_batch)
+        else:
+            batch_options = dict(batch_sampler=self._batch_sampler,
+                                 collate_fn=construct_molecule_batch)
+
+        # Workers send back only the tensors of each batch
+        self._construct_batch = batch_options['collate_fn']
+        if self._num_workers > 0:
+            batch_options['collate_fn'] = partial(construct_tensor_batch, construct_batch=batch_options['collate_fn'])
+
+        # Shared workers are used in __iter__ instead of the workers of the DataLoader
         super(MoleculeDataLoader, self).__init__(
             dataset=self._dataset,
-            batch_size=self._batch_size,
-            sampler=self._sampler,
-            num_workers=self._num_workers,
-            collate_fn=construct_molecule_batch,
-            multiprocessing_context=self._context,
-            timeout=self._timeout
+            num_workers=self._num_workers if not self._shared_workers else 0,
+            multiprocessing_context=self._context if not self._shared_workers else None,
+            timeout=self._timeout if not self._shared_workers else 0,
+            **batch_options
         )
 
     @property
@@ -531,13 +1530,80 @@ class MoleculeDataLoader(DataLoader):
         if self._class_balance or self._shuffle:
             raise ValueError('Cannot safely extract targets when class balance or shuffle are enabled.')
 
-        return [self._dataset[index].targets for index in self._sampler]
+        targets = self._dataset.targets()
+
+        return [targets[index] for batch in self._batch_sampler for index in batch]
+
+    def num_batches(self, num_epochs: int) -> int:
+        """
+        Returns the total number of batches of the next :code:`num_epochs` passes through the data loader.
+
+        Unlike :code:`num_epochs * len(data_loader)`, this is exact when the number of batches varies between epochs.
+
+        :param num_epochs: The number of passes through the data.
+        :return: The total number of batches.
+        """
+        if isinstance(self._batch_sampler, BucketBatchSampler):
+            return self._batch_sampler.num_batches(num_epochs)
+
+        return num_epochs * len(self._batch_sampler)
 
     @property
     def iter_size(self) -> int:
         """Returns the number of data points included in each full iteration through the :class:`MoleculeDataLoader`."""
         return len(self._sampler)
 
-    def __iter__(self) -> Iterator[MoleculeDataset]:
-        r"""Creates an iterator which returns :class:`MoleculeDataset`\ s"""
-        return super(MoleculeDataLoader, self).__iter__()
+    def __iter__(self) -> Iterator[Union[MoleculeDataset, MoleculeBatch]]:
+        r"""
+        Creates an iterator which returns :class:`MoleculeDataset`\ s, or :class:`MoleculeBatch`\ es
+        if there are workers.
+        """
+        if self._cached_batches is not None:
+            return iter(self._cached_batches)
+
+        if self._shared_workers:
+            batches = self._iter_shared_workers()
+        else:
+            batches = super(MoleculeDataLoader, self).__iter__()
+
+            # Workers already collate batches ahead, so only collation on the main thread is moved to the background
+            if self._prefetch_batches > 0 and self._num_workers == 0:
+                batches = iterate_in_background(batches, queue_size=self._prefetch_batches)
+
+        if self._cache_batches:
+            return self._iter_and_cache(batches)
+
+        return batches
+
+    def _iter_and_cache(self, batches: Iterator[Union[MoleculeDataset, MoleculeBatch]]) -> Iterator[MoleculeBatch]:
+        r"""Yields batches as :class:`MoleculeBatch`\ es and caches them once the iteration is complete."""
+        cached_batches = []
+        for batch in batches:
+            if not isinstance(batch, MoleculeBatch):
+                batch = MoleculeBatch.from_dataset(batch)
+
+            cached_batches.append(batch)
+            yield batch
+
+        self._cached_batches = cached_batches
+
+    def _iter_shared_workers(self) -> Iterator[MoleculeBatch]:
+        r"""Creates an iterator which returns :class:`MoleculeBatch`\ es collated by the shared workers."""
+        if isinstance(self._dataset, ColumnarMoleculeDataset):
+            packed_graphs = self._dataset._packed_graphs
+
+            def batches() -> Iterator[ColumnarMoleculeDataset]:
+                for indices in self._batch_sampler:
+                    batch = self._dataset.subset(indices)
+                    batch._packed_graphs = None  # the workers already have the packed graphs
+                    yield batch
+        else:
+            packed_graphs = None
+
+            def batches() -> Iterator[List[MoleculeDatapoint]]:
+                for indices in self._batch_sampler:
+                    yield [self._dataset[index] for index in indices]
+
+        pool = shared_worker_pool(self._num_workers, dataset_packed_graphs=packed_graphs)
+
+        return pool.imap(partial(construct_batch_in_worker, construct_batch=self._construct_batch), batches())
@@ -0,0 +1,266 @@
+import hashlib
+from io import BytesIO
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Set
+
+import numpy as np
+
+from chemprop.features import graph_featurization, MolGraph
+from chemprop.features.featurization import ATOM_FEATURES, BOND_FDIM
+
+
+# Bump when the way graphs are stored changes so that old entries are no longer matched
+DISK_CACHE_VERSION = 1
+DISK_CACHE_FILE_NAME = 'graphs.sqlite'
+# Number of SMILES per query, below SQLite's limit on the number of query parameters
+DISK_CACHE_QUERY_SIZE = 500
+
+
+def featurization_hash() -> str:
+    """
+    Hashes the configuration which determines the arrays of a featurized :class:`~chemprop.features.MolGraph`.
+
+    :return: A hex digest of the graph featurization, the atom feature choices and the bond feature size.
+    """
+    config = {
+        'version': DISK_CACHE_VERSION,
+        'graph_featurization': graph_featurization(),
+        'atom_features': {name: [str(choice) for choice in choices] for name, choices in ATOM_FEATURES.items()},
+        'bond_fdim': BOND_FDIM
+    }
+
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+def serialize_graph(mol_graph: MolGraph) -> bytes:
+    """
+    Serializes the arrays of a :class:`~chemprop.features.MolGraph` without pickling.
+
+    :param mol_graph: A :class:`~chemprop.features.MolGraph`.
+    :return: The arrays saved one after the other in the :code:`.npy` format.
+    """
+    buffer = BytesIO()
+    for array in (mol_graph.f_atoms, mol_graph.f_bonds, mol_graph.b2a, mol_graph.b2revb, mol_graph.atom_categories):
+        if array is not None:
+            np.save(buffer, np.ascontiguousarray(array), allow_pickle=False)
+
+    return buffer.getvalue()
+
+
+def deserialize_graph(data: bytes, featurization: str) -> MolGraph:
+    """
+    Loads a :class:`~chemprop.features.MolGraph` saved by :func:`serialize_graph`.
+
+    :param data: The serialized arrays.
+    :param featurization: The graph featurization the arrays were computed with.
+    :return: A :class:`~chemprop.features.MolGraph`.
+    """
+    buffer = BytesIO(data)
+    f_atoms, f_bonds, b2a, b2revb = [np.load(buffer, allow_pickle=False) for _ in range(4)]
+    atom_categories = np.load(buffer, allow_pickle=False) if buffer.tell() < len(data) else None
+
+    return MolGraph.from_arrays(
+        featurization=featurization,
+        f_atoms=f_atoms,
+        atom_categories=atom_categories,
+        f_bonds=f_bonds,
+        b2a=b2a,
+        b2revb=b2revb
+    )
+
+
+def num_heavy_atoms(mol_graph: MolGraph) -> int:
+    """
+    Counts the atoms of a :class:`~chemprop.features.MolGraph` which are not hydrogen.
+
+    :param mol_graph: A :class:`~chemprop.features.MolGraph`.
+    :return: The number of atoms whose atomic number one-hot feature is not hydrogen.
+    """
+    if mol_graph.atom_categories is not None:
+        return int(np.count_nonzero(mol_graph.atom_categories[:, 0] != 0))
+
+    return int(np.count_nonzero(mol_graph.f_atoms[:, 0] != 1))
+
+
+class DiskGraphCache:
+    r"""
+    A :class:`DiskGraphCache` stores featurized :class:`~chemprop.features.MolGraph`\ s in an SQLite database
+    so that they can be shared across runs, processes and threads.
+
+    Graphs are keyed by SMILES and the :func:`featurization_hash` of the featurization they were computed with,
+    so changing the featurization never returns stale graphs. When the stored graphs exceed :code:`max_size`,
+    the least recently used graphs (of any featurization) are evicted. Graphs with custom atom features are
+    not cached since their arrays depend on more than the SMILES.
+
+    The total size of the stored graphs is kept in the :code:`graphs_size` table by triggers, so it is updated
+    in the same transaction as the graphs and checking it does not scan the stored graphs.
+
+    The hit and miss statistics count the lookups made by the current process.
+    """
+
+    def __init__(self, cache_dir: str, max_size: float = 1024):
+        """
+        :param cache_dir: The directory containing the database, which is created if necessary.
+        :param max_size: The maximum size of the stored graphs in MB.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, DISK_CACHE_FILE_NAME)
+        self.max_size = int(max_size * 2 ** 20)
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+        self._local = threading.local()
+
+        with self.connection as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS graphs ('
+                               'smiles TEXT NOT NULL, config TEXT NOT NULL, data BLOB NOT NULL, '
+                               'size INTEGER NOT NULL, num_heavy_atoms INTEGER NOT NULL, last_used REAL NOT NULL, '
+                               'PRIMARY KEY (smiles, config))')
+            connection.execute('CREATE INDEX IF NOT EXISTS graphs_last_used ON graphs (last_used)')
+
+            connection.execute('CREATE TABLE IF NOT EXISTS graphs_size (size INTEGER NOT NULL)')
+            connection.execute('CREATE TRIGGER IF NOT EXISTS graphs_insert AFTER INSERT ON graphs BEGIN '
+                               'UPDATE graphs_size SET size = size + NEW.size; END')
+            connection.execute('CREATE TRIGGER IF NOT EXISTS graphs_delete AFTER DELETE ON graphs BEGIN '
+                               'UPDATE graphs_size SET size = size - OLD.size; END')
+            connection.execute('CREATE TRIGGER IF NOT EXISTS graphs_update AFTER UPDATE OF size ON graphs BEGIN '
+                               'UPDATE graphs_size SET size = size + NEW.size - OLD.size; END')
+            # Seeded once from the graphs stored before the triggers existed
+            connection.execute('INSERT INTO graphs_size SELECT COALESCE(SUM(size), 0) FROM graphs '
+                               'WHERE NOT EXISTS (SELECT 1 FROM graphs_size)')
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        The connection to the database, opened again in each process and thread since connections cannot be shared.
+        """
+        local = self._local
+        if getattr(local, 'connection', None) is None or local.pid != os.getpid():
+            local.connection = sqlite3.connect(self.path, timeout=600)
+            local.connection.execute('PRAGMA journal_mode=WAL')
+            local.pid = os.getpid()
+
+        return local.connection
+
+    def __getstate__(self) -> Dict:
+        """Drops the connections when the cache is sent to another process."""
+        return {key: value for key, value in self.__dict__.items() if key != '_local'}
+
+    def __setstate__(self, state: Dict) -> None:
+        """Restores a cache sent from another process, which opens its own connections."""
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _query(self, query: str, smiles: List[str], config: str) -> List[tuple]:
+        """Runs a query with a :code:`config` parameter and an :code:`IN` list of SMILES in chunks."""
+        rows = []
+        for i in range(0, len(smiles), DISK_CACHE_QUERY_SIZE):
+            chunk = smiles[i:i + DISK_CACHE_QUERY_SIZE]
+            rows += self.connection.execute(query.format(', '.join('?' * len(chunk))), [config] + chunk).fetchall()
+
+        return rows
+
+    def get_many(self, smiles: Iterable[str]) -> Dict[str, MolGraph]:
+        r"""
+        Loads the stored graphs of SMILES with the current featurization.
+
+        :param smiles: The SMILES to look up.
+        :return: A dictionary mapping each SMILES which was found to its :class:`~chemprop.features.MolGraph`.
+        """
+        smiles = list(dict.fromkeys(smiles))
+        featurization, config = graph_featurization(), featurization_hash()
+
+        rows = self._query('SELECT smiles, data FROM graphs WHERE config = ? AND smiles IN ({})', smiles, config)
+        graphs = {s: deserialize_graph(data, featurization) for s, data in rows}
+
+        self.stats['hits'] += len(graphs)
+        self.stats['misses'] += len(smiles) - len(graphs)
+
+        if len(graphs) > 0:
+            with self.connection as connection:
+                connection.executemany('UPDATE graphs SET last_used = ? WHERE smiles = ? AND config = ?',
+                                       [(time.time(), s, config) for s in graphs])
+
+        return graphs
+
+    def put_many(self, graphs: Dict[str, MolGraph]) -> None:
+        r"""
+        Stores graphs computed with the current featurization and evicts old graphs if the cache is full.
+
+        :param graphs: A dictionary mapping SMILES to their :class:`~chemprop.features.MolGraph`.
+        """
+        if len(graphs) == 0:
+            return
+
+        config, now = featurization_hash(), time.time()
+        rows = []
+        for s, mol_graph in graphs.items():
+            data = serialize_graph(mol_graph)
+            rows.append((s, config, data, len(data), num_heavy_atoms(mol_graph), now))
+
+        # An upsert rather than INSERT OR REPLACE, whose implicit deletes would not run the graphs_delete trigger
+        with self.connection as connection:
+            connection.executemany('INSERT INTO graphs VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (smiles, config) '
+                                   'DO UPDATE SET data = excluded.data, size = excluded.size, '
+                                   'num_heavy_atoms = excluded.num_heavy_atoms, last_used = excluded.last_used', rows)
+        self.stats['writes'] += len(rows)
+
+        self.evict()
+
+    def evict(self) -> None:
+        """Deletes the least recently used graphs until the stored graphs fit in :code:`max_size`."""
+        excess = self.size() - self.max_size
+        if excess <= 0:
+            return
+
+        evicted = []
+        for s, config, size in self.connection.execute('SELECT smiles, config, size FROM graphs ORDER BY last_used'):
+            evicted.append((s, config))
+            excess -= size
+            if excess <= 0:
+                break
+
+        with self.connection as connection:
+            connection.executemany('DELETE FROM graphs WHERE smiles = ? AND config = ?', evicted)
+        self.stats['evictions'] += len(evicted)
+
+    def valid_smiles(self, smiles: Iterable[str]) -> Set[str]:
+        """
+        Finds SMILES whose graphs are stored with the current featurization and which have heavy atoms.
+
+        Only molecules which RDKit could parse are ever featurized, so these SMILES do not need to be validated again.
+
+        :param smiles: The SMILES to look up.
+        :return: The set of SMILES which are known to be valid.
+        """
+        rows = self._query('SELECT smiles FROM graphs WHERE config = ? AND num_heavy_atoms > 0 AND smiles IN ({})',
+                           list(dict.fromkeys(smiles)), featurization_hash())
+
+        return {s for s, in rows}
+
+    def size(self) -> int:
+        """Returns the total size of the stored graphs in bytes."""
+        return self.connection.execute('SELECT size FROM graphs_size').fetchone()[0]
+
+    def __len__(self) -> int:
+        """Returns the number of stored graphs of any featurization."""
+        return self.connection.execute('SELECT COUNT(*) FROM graphs').fetchone()[0]
+
+    def info(self) -> Dict[str, int]:
+        """
+        Returns the statistics of the cache.
+
+        :return: A dictionary with the number of hits, misses, writes and evictions in this process
+                 and the number and total size in bytes of the stored graphs.
+        """
+        return {**self.stats, 'graphs': len(self), 'size': self.size()}
+
+    def clear(self) -> None:
+        """Deletes all stored graphs and resets the statistics."""
+        with self.connection as connection:
+            connection.execute('DELETE FROM graphs')
+
+        for stat in self.stats:
+            self.stats[stat] = 0
@@ -0,0 +1,127 @@
+from collections import OrderedDict
+from functools import partial
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable
+import weakref
+
+
+# Returned by get on a miss so that cached values of None can be told apart from misses
+_MISSING = object()
+
+
+def _reset_lock(cache_ref: weakref.ref) -> None:
+    """Gives a cache a new lock in a forked process, where a lock held by another thread would never be released."""
+    cache = cache_ref()
+    if cache is not None:
+        cache._lock = threading.RLock()
+
+
+class LRUCache:
+    """
+    A :class:`LRUCache` is a dictionary-like cache bounded by the approximate memory of its values.
+
+    When adding a value makes the cache exceed :code:`max_size` bytes, the least recently used values are evicted.
+    Lookups with :meth:`get` or indexing count as hits or misses, while :code:`in` does not change the statistics.
+
+    The cache can be used from several threads (e.g., the main thread and a thread prefetching batches).
+    """
+
+    def __init__(self, max_size: float, sizeof: Callable[[Any], int]):
+        """
+        :param max_size: The maximum total size of the cached values in MB.
+        :param sizeof: A function which returns the approximate size of a value in bytes.
+        """
+        self.max_size = int(max_size * 2 ** 20)
+        self.sizeof = sizeof
+        self.size = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._items: OrderedDict = OrderedDict()  # maps key to (value, size), least recently used first
+        self._lock = threading.RLock()  # guards the items, the size and the statistics
+        os.register_at_fork(after_in_child=partial(_reset_lock, weakref.ref(self)))
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Gets a cached value and marks it as most recently used.
+
+        :param key: The key of the value.
+        :param default: The value returned if the key is not cached.
+        :return: The cached value, or :code:`default` on a miss.
+        """
+        with self._lock:
+            item = self._items.get(key)
+
+            if item is None:
+                self.stats['misses'] += 1
+                return default
+
+            self.stats['hits'] += 1
+            self._items.move_to_end(key)
+
+        return item[0]
+
+    def __getitem__(self, key: Hashable) -> Any:
+        """Gets a cached value and marks it as most recently used, raising a :code:`KeyError` on a miss."""
+        value = self.get(key, _MISSING)
+
+        if value is _MISSING:
+            raise KeyError(key)
+
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        """Caches a value as the most recently used one and evicts the least recently used values if needed."""
+        size = self.sizeof(value)
+
+        with self._lock:
+            if key in self._items:
+                self.size -= self._items.pop(key)[1]
+
+            self._items[key] = (value, size)
+            self.size += size
+
+            self.evict()
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Returns whether a key is cached."""
+        return key in self._items
+
+    def __len__(self) -> int:
+        """Returns the number of cached values."""
+        return len(self._items)
+
+    def evict(self) -> None:
+        """Removes the least recently used values until the cache fits in :code:`max_size`."""
+        with self._lock:
+            while self.size > self.max_size and len(self._items) > 0:
+                _, (_, size) = self._items.popitem(last=False)
+                self.size -= size
+                self.stats['evictions'] += 1
+
+    def set_max_size(self, max_size: float) -> None:
+        """
+        Sets the maximum total size of the cached values, evicting values if needed.
+
+        :param max_size: The maximum total size of the cached values in MB.
+        """
+        with self._lock:
+            self.max_size = int(max_size * 2 ** 20)
+            self.evict()
+
+    def info(self) -> Dict[str, int]:
+        """
+        Returns the statistics of the cache.
+
+        :return: A dictionary with the number of hits, misses and evictions and the number and total size
+                 in bytes of the cached values.
+        """
+        with self._lock:
+            return {**self.stats, 'items': len(self._items), 'size': self.size}
+
+    def clear(self) -> None:
+        """Removes all cached values and resets the statistics."""
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+            for stat in self.stats:
+                self.stats[stat] = 0
@@ -120,11 +120,7 @@ def scaffold_split(data: MoleculeDataset,
         log_scaffold_stats(data, index_sets, logger=logger)
 
     # Map from indices to data
-    train = [data[i] for i in train]
-    val = [data[i] for i in val]
-    test = [data[i] for i in test]
-
-    return MoleculeDataset(train), MoleculeDataset(val), MoleculeDataset(test)
+    return data.subset(train), data.subset(val), data.subset(test)
 
 
 def log_scaffold_stats(data: MoleculeDataset,
@@ -1,19 +1,24 @@
+from array import array
 from collections import OrderedDict
 import csv
 from logging import Logger
+from multiprocessing import Pool
 import pickle
 from random import Random
-from typing import List, Optional, Set, Tuple, Union
+from typing import Callable, List, Optional, Set, Tuple, Union
 import os
 
 from rdkit import Chem
 import numpy as np
 from tqdm import tqdm
 
-from .data import MoleculeDatapoint, MoleculeDataset
+from .compiled import is_compiled_data, load_arrays, load_compiled_data
+from .data import ColumnarMoleculeDataset, disk_graph_cache, generate_features, make_mol, MoleculeDatapoint, \
+    MoleculeDataset
 from .scaffold import log_scaffold_stats, scaffold_split
 from chemprop.args import PredictArgs, TrainArgs
-from chemprop.features import load_features, load_valid_atom_features
+from chemprop.features import graph_featurization, load_features, load_valid_atom_features, MolGraph, \
+    PackedMolGraphs, set_graph_featurization
 
 
 def preprocess_smiles_columns(smiles_columns: Optional[Union[str, List[Optional[str]]]]) -> List[Optional[str]]:
@@ -71,9 +76,15 @@ def get_header(path: str) -> List[str]:
     """
     Returns the header of a data CSV file.
 
+    For a compiled data file, returns the SMILES columns followed by the task names.
+
     :param path: Path to a CSV file.
     :return: A list of strings containing the strings in the comma-separated header.
     """
+    if is_compiled_data(path):
+        header, _ = load_arrays(path)
+        return header['smiles_columns'] + header['task_names']
+
     with open(path) as f:
         header = next(csv.reader(f))
 
@@ -100,16 +111,19 @@ def get_smiles(path: str,
 
     smiles_columns = preprocess_smiles_columns(smiles_columns)
 
-    with open(path) as f:
-        if header:
-            reader = csv.DictReader(f)
-            if None in smiles_columns:
-                smiles_columns = reader.fieldnames[:len(smiles_columns)]
-        else:
-            reader = csv.reader(f)
-            smiles_columns = 0
+    if is_compiled_data(path):
+        smiles = load_compiled_data(path, target_columns=[]).smiles()
+    else:
+        with open(path) as f:
+            if header:
+                reader = csv.DictReader(f)
+                if None in smiles_columns:
+                    smiles_columns = reader.fieldnames[:len(smiles_columns)]
+            else:
+                reader = csv.reader(f)
+                smiles_columns = 0
 
-        smiles = [[row[c] for c in smiles_columns] for row in reader]
+            smiles = [[row[c] for c in smiles_columns] for row in reader]
 
     if flatten:
         smiles = [smile for smiles_list in smiles for smile in smiles_list]
@@ -121,12 +135,38 @@ def filter_invalid_smiles(data: MoleculeDataset) -> MoleculeDataset:
     """
     Filters out invalid SMILES.
 
+    SMILES whose graphs are stored in the :func:`~chemprop.data.disk_graph_cache` are known to be valid
+    and are not parsed again.
+
     :param data: A :class:`~chemprop.data.MoleculeDataset`.
     :return: A :class:`~chemprop.data.MoleculeDataset` with only the valid molecules.
     """
-    return MoleculeDataset([datapoint for datapoint in tqdm(data)
-                            if all(s != '' for s in datapoint.smiles) and all(m is not None for m in datapoint.mol)
-                            and all(m.GetNumHeavyAtoms() > 0 for m in datapoint.mol)])
+    return data.subset(get_valid_indices(data.smiles()))
+
+
+def get_valid_indices(smiles: List[List[str]]) -> List[int]:
+    """
+    Finds the datapoints whose SMILES are all valid molecules with heavy atoms.
+
+    SMILES whose graphs are stored in the :func:`~chemprop.data.disk_graph_cache` are known to be valid
+    and are not parsed again.
+
+    :param smiles: A list with the SMILES of each datapoint.
+    :return: The indices of the datapoints with only valid SMILES.
+    """
+    valid_smiles = disk_graph_cache().valid_smiles(s for row_smiles in smiles for s in row_smiles) \
+        if disk_graph_cache() is not None else set()
+
+    valid_indices = []
+    for i, row_smiles in enumerate(tqdm(smiles)):
+        if all(s in valid_smiles for s in row_smiles):
+            valid_indices.append(i)
+        elif all(s != '' for s in row_smiles):
+            mols = [make_mol(s) for s in row_smiles]
+            if all(m is not None and m.GetNumHeavyAtoms() > 0 for m in mols):
+                valid_indices.append(i)
+
+    return valid_indices
 
 
 def get_data(path: str,
@@ -141,11 +181,16 @@ def get_data(path: str,
              max_data_size: int = None,
              store_row: bool = False,
              logger: Logger = None,
-             skip_none_targets: bool = False) -> MoleculeDataset:
+             skip_none_targets: bool = False,
+             columnar: bool = None) -> MoleculeDataset:
     """
     Gets SMILES and target values from a CSV file.
 
-    :param path: Path to a CSV file.
+    The path may also point to a data file compiled by :code:`chemprop_preprocess`, in which case the stored
+    features and featurized graphs are memory-mapped and used instead of recomputing them, and the data is
+    always returned as a :class:`~chemprop.data.ColumnarMoleculeDataset`.
+
+    :param path: Path to a CSV file or a compiled data file.
     :param smiles_columns: The names of the columns containing SMILES.
                            By default, uses the first :code:`number_of_molecules` columns.
     :param target_columns: Name of the columns containing target values. By default, uses all columns
@@ -163,6 +208,8 @@ def get_data(path: str,
     :param store_row: Whether to store the raw CSV row in each :class:`~chemprop.data.data.MoleculeDatapoint`.
     :param skip_none_targets: Whether to skip targets that are all 'None'. This is mostly relevant when --target_columns
                               are passed in, so only a subset of tasks are examined.
+    :param columnar: Whether to return a :class:`~chemprop.data.ColumnarMoleculeDataset`. If provided, it is used
+                     in place of :code:`args.columnar_data`.
     :return: A :class:`~chemprop.data.MoleculeDataset` containing SMILES and target values along
              with other info such as additional features when desired.
     """
@@ -178,9 +225,32 @@ def get_data(path: str,
         atom_descriptors_path = atom_descriptors_path if atom_descriptors_path is not None \
             else args.atom_descriptors_path
         max_data_size = max_data_size if max_data_size is not None else args.max_data_size
+        columnar = columnar if columnar is not None else args.columnar_data
 
     smiles_columns = preprocess_smiles_columns(smiles_columns)
 
+    # Compiled data files already contain validated SMILES, features, and featurized graphs
+    if is_compiled_data(path):
+        if atom_descriptors_path is not None:
+            raise NotImplementedError('Atom descriptors are not supported with compiled data files.')
+
+        data = load_compiled_data(
+            path=path,
+            target_columns=target_columns,
+            ignore_columns=ignore_columns,
+            use_features=features_path is not None or features_generator is not None,
+            max_data_size=max_data_size,
+            store_row=store_row,
+            skip_none_targets=skip_none_targets
+        )
+
+        if len(data) > 0 and data[0].packed_graphs.featurization != graph_featurization():
+            debug(f'Warning: the graphs in "{path}" use the {data[0].packed_graphs.featurization} graph '
+                  f'featurization, so molecules will be featurized again with the '
+                  f'{graph_featurization()} graph featurization.')
+
+        return data
+
     max_data_size = max_data_size or float('inf')
 
     # Load features
@@ -192,6 +262,23 @@ def get_data(path: str,
     else:
         features_data = None
 
+    if columnar:
+        return get_columnar_data(
+            path=path,
+            smiles_columns=smiles_columns,
+            target_columns=target_columns,
+            ignore_columns=ignore_columns,
+            skip_invalid_smiles=skip_invalid_smiles,
+            features_data=features_data,
+            features_generator=features_generator,
+            atom_descriptors=args.atom_descriptors if args is not None else None,
+            atom_descriptors_path=atom_descriptors_path,
+            max_data_size=max_data_size,
+            store_row=store_row,
+            skip_none_targets=skip_none_targets,
+            debug=debug
+        )
+
     skip_smiles = [set() for _ in range(len(smiles_columns))]
 
     # Load data
@@ -270,6 +357,112 @@ def get_data(path: str,
     return data
 
 
+def get_columnar_data(path: str,
+                      smiles_columns: List[Optional[str]],
+                      target_columns: Optional[List[str]],
+                      ignore_columns: Optional[List[str]],
+                      skip_invalid_smiles: bool,
+                      features_data: Optional[np.ndarray],
+                      features_generator: Optional[List[str]],
+                      atom_descriptors: Optional[str],
+                      atom_descriptors_path: Optional[str],
+                      max_data_size: float,
+                      store_row: bool,
+                      skip_none_targets: bool,
+                      debug: Callable[[str], None]) -> MoleculeDataset:
+    """
+    Reads a CSV file into a :class:`~chemprop.data.ColumnarMoleculeDataset` for :func:`get_data`.
+
+    The SMILES, targets and mask are appended to flat columns as the rows are read, and the features are
+    written into a preallocated float32 matrix, so no :class:`~chemprop.data.MoleculeDatapoint` is ever created.
+    See :func:`get_data` for the parameters.
+
+    :param atom_descriptors: The type of the custom atom descriptors (:code:`feature` or :code:`descriptor`), or None.
+    :param debug: A function used to print warnings.
+    :return: A :class:`~chemprop.data.ColumnarMoleculeDataset`, or an empty
+             :class:`~chemprop.data.MoleculeDataset` if no datapoints are left.
+    """
+    if features_data is not None and features_generator is not None:
+        raise ValueError('Cannot provide both loaded features and a features generator.')
+
+    if None in smiles_columns:
+        smiles_columns = get_header(path)[:len(smiles_columns)]
+    target_columns = get_task_names(path, smiles_columns, target_columns, ignore_columns)
+
+    all_smiles, all_targets, all_mask, csv_indices, all_rows = [], array('f'), array('b'), [], []
+    with open(path) as f:
+        for i, row in tqdm(enumerate(csv.DictReader(f))):
+            targets = [row[column] for column in target_columns]
+
+            # Check whether all targets are None and skip if so
+            if skip_none_targets and all(t == '' for t in targets):
+                continue
+
+            all_smiles.extend(row[c] for c in smiles_columns)
+            all_targets.extend(float(t) if t != '' else np.nan for t in targets)
+            all_mask.extend(t != '' for t in targets)
+            csv_indices.append(i)
+
+            if store_row:
+                all_rows.append(row)
+
+            if len(csv_indices) >= max_data_size:
+                break
+
+    num_data = len(csv_indices)
+    smiles = np.array(all_smiles, dtype=object).reshape(num_data, len(smiles_columns))
+    targets = np.frombuffer(all_targets, dtype=np.float32).reshape(num_data, len(target_columns))
+    mask = np.frombuffer(all_mask, dtype=np.int8).astype(bool).reshape(num_data, len(target_columns))
+
+    descriptors = None
+    if atom_descriptors is not None:
+        try:
+            descriptors = load_valid_atom_features(atom_descriptors_path, smiles[:, 0].tolist())
+        except Exception as e:
+            raise ValueError(f'Failed to load or valid custom atomic descriptors: {e}')
+
+        descriptors = [np.where(np.isnan(d), 0, d) for d in descriptors]
+
+    # Filter out invalid SMILES
+    if skip_invalid_smiles:
+        valid_indices = get_valid_indices(smiles.tolist())
+
+        if len(valid_indices) < num_data:
+            debug(f'Warning: {num_data - len(valid_indices)} SMILES are invalid.')
+
+            smiles, targets, mask = smiles[valid_indices], targets[valid_indices], mask[valid_indices]
+            csv_indices = [csv_indices[i] for i in valid_indices]
+            all_rows = [all_rows[i] for i in valid_indices] if store_row else all_rows
+            descriptors = [descriptors[i] for i in valid_indices] if descriptors is not None else None
+
+    if len(smiles) == 0:
+        return MoleculeDataset([])
+
+    features = None
+    if features_data is not None:
+        features = features_data[csv_indices].astype(np.float32)
+    elif features_generator is not None:
+        for j, row_smiles in enumerate(tqdm(smiles.tolist())):
+            row_features = generate_features([make_mol(s) for s in row_smiles], features_generator)
+            if features is None:
+                features = np.empty((len(smiles), len(row_features)), dtype=np.float32)
+            features[j] = row_features
+
+    # Fix nans in features
+    if features is not None:
+        features[np.isnan(features)] = 0
+
+    return ColumnarMoleculeDataset(
+        smiles=smiles,
+        targets=targets,
+        mask=mask,
+        features=features,
+        atom_features=descriptors if atom_descriptors == 'feature' else None,
+        atom_descriptors=descriptors if atom_descriptors == 'descriptor' else None,
+        rows=all_rows if store_row else None
+    )
+
+
 def get_data_from_smiles(smiles: List[List[str]],
                          skip_invalid_smiles: bool = True,
                          logger: Logger = None,
@@ -345,9 +538,9 @@ def split_data(data: MoleculeDataset,
             for index in index_set[split]:
                 with open(os.path.join(args.crossval_index_dir, f'{index}.pkl'), 'rb') as rf:
                     split_indices.extend(pickle.load(rf))
-            data_split.append([data[i] for i in split_indices])
+            data_split.append(split_indices)
         train, val, test = tuple(data_split)
-        return MoleculeDataset(train), MoleculeDataset(val), MoleculeDataset(test)
+        return data.subset(train), data.subset(val), data.subset(test)
 
     elif split_type == 'cv':
         if num_folds <= 1 or num_folds > len(data):
@@ -361,15 +554,15 @@ def split_data(data: MoleculeDataset,
         val_index = (seed + 1) % num_folds
 
         train, val, test = [], [], []
-        for d, index in zip(data, indices):
+        for i, index in enumerate(indices):
             if index == test_index:
-                test.append(d)
+                test.append(i)
             elif index == val_index:
-                val.append(d)
+                val.append(i)
             else:
-                train.append(d)
+                train.append(i)
 
-        return MoleculeDataset(train), MoleculeDataset(val), MoleculeDataset(test)
+        return data.subset(train), data.subset(val), data.subset(test)
 
     elif split_type == 'index_predetermined':
         split_indices = args.crossval_index_sets[args.seed]
@@ -377,11 +570,8 @@ def split_data(data: MoleculeDataset,
         if len(split_indices) != 3:
             raise ValueError('Split indices must have three splits: train, validation, and test')
 
-        data_split = []
-        for split in range(3):
-            data_split.append([data[i] for i in split_indices[split]])
-        train, val, test = tuple(data_split)
-        return MoleculeDataset(train), MoleculeDataset(val), MoleculeDataset(test)
+        train, val, test = tuple(split_indices)
+        return data.subset(train), data.subset(val), data.subset(test)
 
     elif split_type == 'predetermined':
         if not val_fold_index and sizes[2] != 0:
@@ -400,7 +590,7 @@ def split_data(data: MoleculeDataset,
 
         log_scaffold_stats(data, all_fold_indices, logger=logger)
 
-        folds = [[data[i] for i in fold_indices] for fold_indices in all_fold_indices]
+        folds = [list(fold_indices) for fold_indices in all_fold_indices]
 
         test = folds[test_fold_index]
         if val_fold_index is not None:
@@ -419,7 +609,7 @@ def split_data(data: MoleculeDataset,
             train = train_val[:train_size]
             val = train_val[train_size:]
 
-        return MoleculeDataset(train), MoleculeDataset(val), MoleculeDataset(test)
+        return data.subset(train), data.subset(val), data.subset(test)
     
     elif split_type == 'scaffold_balanced':
         return scaffold_split(data, sizes=sizes, balanced=True, seed=seed, logger=logger)
@@ -431,11 +621,11 @@ def split_data(data: MoleculeDataset,
         train_size = int(sizes[0] * len(data))
         train_val_size = int((sizes[0] + sizes[1]) * len(data))
 
-        train = [data[i] for i in indices[:train_size]]
-        val = [data[i] for i in indices[train_size:train_val_size]]
-        test = [data[i] for i in indices[train_val_size:]]
+        train = indices[:train_size]
+        val = indices[train_size:train_val_size]
+        test = indices[train_val_size:]
 
-        return MoleculeDataset(train), MoleculeDataset(val), MoleculeDataset(test)
+        return data.subset(train), data.subset(val), data.subset(test)
 
     else:
         raise ValueError(f'split_type "{split_type}" not supported.')
@@ -549,3 +739,97 @@ def validate_data(data_path: str) -> Set[str]:
             errors.add('Found a target which is not a number.')
 
     return errors
+
+
+def featurize_chunk(chunk: List[Tuple[str, Optional[np.ndarray]]]) -> PackedMolGraphs:
+    """
+    Featurizes a chunk of molecules into packed graph arrays.
+
+    :param chunk: A list of tuples containing a SMILES string and its atom features (or None).
+    :return: A :class:`~chemprop.features.PackedMolGraphs` containing the graphs of the molecules.
+    """
+    return PackedMolGraphs.pack(
+        smiles=[smiles for smiles, _ in chunk],
+        mol_graphs=[MolGraph(Chem.MolFromSmiles(smiles), atom_features) for smiles, atom_features in chunk]
+    )
+
+
+def featurize_graphs(datasets: List[MoleculeDataset],
+                     num_processes: int = None,
+                     chunk_size: int = 1000,
+                     graphs: PackedMolGraphs = None,
+                     progress_bar: bool = True) -> Optional[PackedMolGraphs]:
+    r"""
+    Featurizes the molecules in datasets into packed graph arrays using a pool of processes.
+
+    Molecules which are already in :code:`graphs` (with the current graph featurization) are not featurized again.
+    Molecules stored in the :func:`~chemprop.data.disk_graph_cache` are loaded from it, and newly featurized
+    molecules are added to it.
+
+    :param datasets: A list of :class:`MoleculeDataset`\ s containing the molecules to featurize.
+    :param num_processes: The number of processes to use. Defaults to the number of CPUs.
+    :param chunk_size: The number of molecules featurized by a process at a time.
+    :param graphs: Previously featurized graphs to reuse and extend.
+    :param progress_bar: Whether to show a progress bar.
+    :return: A :class:`~chemprop.features.PackedMolGraphs` containing the graphs of all molecules,
+             or None if there are no molecules.
+    """
+    if graphs is not None and graphs.featurization != graph_featurization():
+        graphs = None
+
+    # Collect each SMILES once along with its atom features
+    molecules = OrderedDict()
+    for dataset in datasets:
+        for smiles_list, atom_features, packed, _ in dataset.graph_rows():
+            if len(smiles_list) > 1 and atom_features is not None:
+                raise NotImplementedError('Atom descriptors are currently only supported with one molecule '
+                                          'per input (i.e., number_of_molecules = 1).')
+
+            if packed is not None and packed.featurization == graph_featurization():
+                continue
+
+            for smiles in smiles_list:
+                if smiles not in molecules and (graphs is None or smiles not in graphs):
+                    molecules[smiles] = atom_features
+
+    packs = [] if graphs is None else [graphs]
+
+    # Load the molecules stored on disk, except those with custom atom features
+    cache = disk_graph_cache()
+    if cache is not None:
+        disk_graphs = cache.get_many(smiles for smiles, atom_features in molecules.items() if atom_features is None)
+        if len(disk_graphs) > 0:
+            packs.append(PackedMolGraphs.pack(smiles=list(disk_graphs.keys()), mol_graphs=list(disk_graphs.values())))
+            for smiles in disk_graphs:
+                del molecules[smiles]
+
+    molecules = list(molecules.items())
+
+    if len(molecules) == 0:
+        if len(packs) <= 1:
+            return packs[0] if len(packs) == 1 else None
+
+        return PackedMolGraphs.concatenate(packs)
+
+    chunks = [molecules[i:i + chunk_size] for i in range(0, len(molecules), chunk_size)]
+    num_processes = min(num_processes or os.cpu_count(), len(chunks))
+
+    with tqdm(total=len(molecules), disable=not progress_bar, leave=False) as progress:
+        if num_processes > 1:
+            with Pool(num_processes, initializer=set_graph_featurization, initargs=(graph_featurization(),)) as pool:
+                new_packs = []
+                for pack in pool.imap(featurize_chunk, chunks):
+                    new_packs.append(pack)
+                    progress.update(len(pack))
+        else:
+            new_packs = []
+            for chunk in chunks:
+                new_packs.append(featurize_chunk(chunk))
+                progress.update(len(chunk))
+
+    if cache is not None:
+        for pack, chunk in zip(new_packs, chunks):
+            cache.put_many({smiles: pack.graph(i) for i, (smiles, atom_features) in enumerate(chunk)
+                            if atom_features is None})
+
+    return PackedMolGraphs.concatenate(packs + new_packs)
@@ -0,0 +1,69 @@
+from collections import deque
+from typing import Any, Callable, Iterable, Iterator, Tuple
+
+from torch import multiprocessing
+
+
+class WorkerPool:
+    """
+    A :class:`WorkerPool` is a pool of processes which outlives the data loaders using it.
+
+    Unlike the workers of a PyTorch :class:`~torch.utils.data.DataLoader`, which are started again for every
+    epoch and every data loader, the processes of a :class:`WorkerPool` are started once, so anything they
+    cache stays warm. The :code:`state` passed to the :code:`initializer` of the workers is kept so that
+    callers can check whether the pool still matches the state of the main process.
+
+    Tensors returned by the workers are sent through shared memory by PyTorch's multiprocessing reductions.
+    """
+
+    def __init__(self,
+                 num_workers: int,
+                 initializer: Callable[[Tuple], None],
+                 state: Tuple,
+                 context: str = None):
+        """
+        :param num_workers: The number of worker processes.
+        :param initializer: A function called with :code:`state` in each worker process when it starts.
+        :param state: The state of the main process which the workers need.
+        :param context: The multiprocessing start method, or None for the default.
+        """
+        self.num_workers = num_workers
+        self.state = state
+        self._pool = multiprocessing.get_context(context).Pool(num_workers, initializer=initializer, initargs=(state,))
+
+    def imap(self, func: Callable, iterable: Iterable, max_pending: int = None) -> Iterator[Any]:
+        """
+        Applies a function to the items of an iterable in the workers and yields the results in order.
+
+        Unlike :code:`multiprocessing.Pool.imap`, the iterable is consumed lazily, so at most :code:`max_pending`
+        items are submitted ahead of the results which have been yielded. If the consumer stops early (e.g., after
+        an exception or a :code:`break`), the iterator waits for the submitted items when it is closed and drops
+        their results, so the workers are idle when the pool is used again.
+
+        :param func: The function to apply. It must be picklable.
+        :param iterable: The items to apply the function to.
+        :param max_pending: The maximum number of items being processed at once. Defaults to twice
+                            the number of workers.
+        :return: An iterator over the results.
+        """
+        max_pending = max_pending or 2 * self.num_workers
+        pending = deque()
+
+        try:
+            for item in iterable:
+                pending.append(self._pool.apply_async(func, (item,)))
+
+                if len(pending) >= max_pending:
+                    yield pending.popleft().get()
+
+            while len(pending) > 0:
+                yield pending.popleft().get()
+        finally:
+            # Tasks already sent to the workers cannot be cancelled
+            for result in pending:
+                result.wait()
+
+    def close(self) -> None:
+        """Stops the worker processes."""
+        self._pool.terminate()
+        self._pool.join()
@@ -1,8 +1,9 @@
 from .features_generators import get_available_features_generators, get_features_generator, \
     morgan_binary_features_generator, morgan_counts_features_generator, rdkit_2d_features_generator, \
     rdkit_2d_normalized_features_generator, register_features_generator
-from .featurization import atom_features, bond_features, BatchMolGraph, get_atom_fdim, get_bond_fdim, mol2graph, \
-    MolGraph, onek_encoding_unk, set_extra_atom_fdim
+from .featurization import atom_features, bond_features, BatchMolGraph, clear_feature_cache, feature_cache_info, \
+    get_atom_fdim, get_bond_fdim, graph_featurization, mol2graph, MolGraph, onek_encoding_unk, PackedMolGraphs, \
+    set_extra_atom_fdim, set_feature_cache_size, set_graph_featurization
 from .utils import load_features, save_features, load_valid_atom_features
 
 __all__ = [
@@ -15,11 +16,17 @@ __all__ = [
     'atom_features',
     'bond_features',
     'BatchMolGraph',
+    'feature_cache_info',
+    'clear_feature_cache',
+    'set_feature_cache_size',
     'get_atom_fdim',
     'set_extra_atom_fdim',
     'get_bond_fdim',
+    'graph_featurization',
+    'set_graph_featurization',
     'mol2graph',
     'MolGraph',
+    'PackedMolGraphs',
     'onek_encoding_unk',
     'load_features',
     'save_features',
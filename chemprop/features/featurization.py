@@ -1,4 +1,4 @@
-from typing import List, Tuple, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 from rdkit import Chem
 import torch
@@ -28,10 +28,21 @@ THREE_D_DISTANCE_STEP = 1
 THREE_D_DISTANCE_BINS = list(range(0, THREE_D_DISTANCE_MAX + 1, THREE_D_DISTANCE_STEP))
 
 # len(choices) + 1 to include room for uncommon values; + 2 at end for IsAromatic and mass
-ATOM_FDIM = sum(len(choices) + 1 for choices in ATOM_FEATURES.values()) + 2
+ATOM_ONEHOT_FDIM = sum(len(choices) + 1 for choices in ATOM_FEATURES.values())
+ATOM_FDIM = ATOM_ONEHOT_FDIM + 2
 EXTRA_ATOM_FDIM = 0
 BOND_FDIM = 14
 
+# Layout of the bond features stored in MolGraphs and BatchMolGraphs
+GRAPH_FEATURIZATION = 'dense'
+GRAPH_FEATURIZATIONS = ['dense', 'factorized', 'categorical']
+
+# Memoized feature rows keyed by atom and bond invariants, with lookup statistics
+FEATURE_CACHE_SIZE = 65536
+ATOM_FEATURE_CACHE = {}
+BOND_FEATURE_CACHE = {}
+FEATURE_CACHE_STATS = {'atom_hits': 0, 'atom_misses': 0, 'bond_hits': 0, 'bond_misses': 0}
+
 
 def get_atom_fdim() -> int:
     """Gets the dimensionality of the atom feature vector."""
@@ -44,6 +55,30 @@ def set_extra_atom_fdim(extra) -> int:
     EXTRA_ATOM_FDIM = extra
 
 
+def graph_featurization() -> str:
+    r"""Returns the layout of the atom and bond features stored in :class:`MolGraph`\ s."""
+    return GRAPH_FEATURIZATION
+
+
+def set_graph_featurization(featurization: str) -> None:
+    r"""
+    Sets the layout of the atom and bond features stored in :class:`MolGraph`\ s.
+
+    * :code:`dense`: each bond row holds the concatenated features of the bond and the atom it comes from.
+    * :code:`factorized`: each bond row holds only the bond features. The atom half of the input
+      projection is applied once per atom and gathered onto the bonds in the :class:`~chemprop.models.mpn.MPNEncoder`.
+    * :code:`categorical`: like :code:`factorized`, but each atom is stored as the indices of its one-hot
+      features (see :func:`atom_feature_indices`) plus its remaining scalar features.
+
+    :param featurization: The name of the feature layout.
+    """
+    if featurization not in GRAPH_FEATURIZATIONS:
+        raise ValueError(f'Graph featurization "{featurization}" not supported.')
+
+    global GRAPH_FEATURIZATION
+    GRAPH_FEATURIZATION = featurization
+
+
 def get_bond_fdim(atom_messages: bool = False) -> int:
     """
     Gets the dimensionality of the bond feature vector.
@@ -72,6 +107,17 @@ def onek_encoding_unk(value: int, choices: List[int]) -> List[int]:
     return encoding
 
 
+def onek_index_unk(value: int, choices: List[int]) -> int:
+    """
+    Gets the index of the one in the one-hot encoding built by :func:`onek_encoding_unk`.
+
+    :param value: The value for which the encoding should be one.
+    :param choices: A list of possible values.
+    :return: The index of :code:`value` in :code:`choices`, or :code:`len(choices)` for uncommon values.
+    """
+    return choices.index(value) if value in choices else len(choices)
+
+
 def atom_features(atom: Chem.rdchem.Atom, functional_groups: List[int] = None) -> List[Union[bool, int, float]]:
     """
     Builds a feature vector for an atom.
@@ -93,6 +139,33 @@ def atom_features(atom: Chem.rdchem.Atom, functional_groups: List[int] = None) -
     return features
 
 
+def atom_feature_indices(atom: Chem.rdchem.Atom) -> List[int]:
+    """
+    Gets the positions of the ones in the one-hot part of an atom's feature vector.
+
+    Multiplying a weight matrix by the one-hot part of :func:`atom_features` is the same as summing the
+    weight columns at these positions.
+
+    :param atom: An RDKit atom.
+    :return: A list with one index into the atom feature vector for each categorical atom feature.
+    """
+    values = [
+        atom.GetAtomicNum() - 1,
+        atom.GetTotalDegree(),
+        atom.GetFormalCharge(),
+        int(atom.GetChiralTag()),
+        int(atom.GetTotalNumHs()),
+        int(atom.GetHybridization())
+    ]
+
+    indices, offset = [], 0
+    for value, choices in zip(values, ATOM_FEATURES.values()):
+        indices.append(offset + onek_index_unk(value, choices))
+        offset += len(choices) + 1
+
+    return indices
+
+
 def bond_features(bond: Chem.rdchem.Bond) -> List[Union[bool, int, float]]:
     """
     Builds a feature vector for a bond.
@@ -117,6 +190,132 @@ def bond_features(bond: Chem.rdchem.Bond) -> List[Union[bool, int, float]]:
     return fbond
 
 
+def atom_invariants(atom: Chem.rdchem.Atom) -> Tuple:
+    """
+    Gets the atom properties which determine the output of :func:`atom_features`.
+
+    :param atom: An RDKit atom.
+    :return: A hashable tuple of atom properties.
+    """
+    return (atom.GetAtomicNum(), atom.GetTotalDegree(), atom.GetFormalCharge(), int(atom.GetChiralTag()),
+            int(atom.GetTotalNumHs()), int(atom.GetHybridization()), atom.GetIsAromatic(), atom.GetMass())
+
+
+def bond_invariants(bond: Chem.rdchem.Bond) -> Tuple:
+    """
+    Gets the bond properties which determine the output of :func:`bond_features`.
+
+    :param bond: An RDKit bond.
+    :return: A hashable tuple of bond properties.
+    """
+    return int(bond.GetBondType()), bond.GetIsConjugated(), bond.IsInRing(), int(bond.GetStereo())
+
+
+def atom_feature_rows(atom: Chem.rdchem.Atom) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Looks up the features of an atom in a memo table keyed by :func:`atom_invariants`.
+
+    The returned arrays are shared between all atoms with the same invariants and are read-only.
+
+    :param atom: An RDKit atom.
+    :return: A tuple containing the float32 :func:`atom_features` and the int16 :func:`atom_feature_indices`.
+    """
+    key = atom_invariants(atom)
+    rows = ATOM_FEATURE_CACHE.get(key)
+
+    if rows is None:
+        FEATURE_CACHE_STATS['atom_misses'] += 1
+        rows = (np.array(atom_features(atom), dtype=np.float32), np.array(atom_feature_indices(atom), dtype=np.int16))
+        for row in rows:
+            row.setflags(write=False)
+
+        if len(ATOM_FEATURE_CACHE) < FEATURE_CACHE_SIZE:
+            ATOM_FEATURE_CACHE[key] = rows
+    else:
+        FEATURE_CACHE_STATS['atom_hits'] += 1
+
+    return rows
+
+
+def bond_feature_row(bond: Chem.rdchem.Bond) -> np.ndarray:
+    """
+    Looks up the features of a bond in a memo table keyed by :func:`bond_invariants`.
+
+    The returned array is shared between all bonds with the same invariants and is read-only.
+
+    :param bond: An RDKit bond.
+    :return: A float32 array containing the :func:`bond_features`.
+    """
+    key = bond_invariants(bond)
+    row = BOND_FEATURE_CACHE.get(key)
+
+    if row is None:
+        FEATURE_CACHE_STATS['bond_misses'] += 1
+        row = np.array(bond_features(bond), dtype=np.float32)
+        row.setflags(write=False)
+
+        if len(BOND_FEATURE_CACHE) < FEATURE_CACHE_SIZE:
+            BOND_FEATURE_CACHE[key] = row
+    else:
+        FEATURE_CACHE_STATS['bond_hits'] += 1
+
+    return row
+
+
+def feature_cache_info() -> Dict[str, int]:
+    """
+    Returns the statistics of the atom and bond feature memo tables.
+
+    :return: A dictionary with the number of atom and bond hits and misses and the number of memoized atom
+             and bond invariants.
+    """
+    return {**FEATURE_CACHE_STATS, 'atom_size': len(ATOM_FEATURE_CACHE), 'bond_size': len(BOND_FEATURE_CACHE)}
+
+
+def clear_feature_cache() -> None:
+    """Empties the atom and bond feature memo tables and resets their statistics."""
+    ATOM_FEATURE_CACHE.clear()
+    BOND_FEATURE_CACHE.clear()
+    for stat in FEATURE_CACHE_STATS:
+        FEATURE_CACHE_STATS[stat] = 0
+
+
+def set_feature_cache_size(size: int) -> None:
+    """
+    Sets the maximum number of distinct atom (and bond) invariants memoized by the feature memo tables.
+
+    Once a table is full, features of new invariants are still computed but no longer stored.
+
+    :param size: The maximum number of entries in each memo table.
+    """
+    global FEATURE_CACHE_SIZE
+    FEATURE_CACHE_SIZE = size
+
+
+def incoming_bonds(b2a: np.ndarray, b2revb: np.ndarray, n_atoms: int, padding: int) -> np.ndarray:
+    """
+    Builds the padded mapping from each atom to the indices of its incoming bonds.
+
+    Bond :code:`b` points to the atom that its reverse bond comes from, so grouping bonds by
+    :code:`b2a[b2revb]` with a stable sort lists the incoming bonds of each atom in increasing order.
+
+    :param b2a: A mapping from bond index to the index of the atom the bond is coming from.
+    :param b2revb: A mapping from bond index to the index of the reverse bond.
+    :param n_atoms: The number of atoms.
+    :param padding: The value used to pad atoms with fewer than the maximum number of incoming bonds.
+    :return: An array of shape :code:`(n_atoms, max_num_bonds)` with the same dtype as :code:`b2a`.
+    """
+    b2dst = b2a[b2revb]
+    in_bonds = np.argsort(b2dst, kind='stable').astype(b2a.dtype)
+    degrees = np.bincount(b2dst, minlength=n_atoms)
+    slots = np.arange(len(b2dst)) - np.repeat(np.cumsum(degrees) - degrees, degrees)
+
+    a2b = np.full((n_atoms, degrees.max(initial=0)), padding, dtype=b2a.dtype)
+    a2b[b2dst[in_bonds], slots] = in_bonds
+
+    return a2b
+
+
 class MolGraph:
     """
     A :class:`MolGraph` represents the graph structure and featurization of a single molecule.
@@ -125,62 +324,254 @@ class MolGraph:
 
     * :code:`n_atoms`: The number of atoms in the molecule.
     * :code:`n_bonds`: The number of bonds in the molecule.
-    * :code:`f_atoms`: A mapping from an atom index to a list of atom features.
-    * :code:`f_bonds`: A mapping from a bond index to a list of bond features.
-    * :code:`a2b`: A mapping from an atom index to a list of incoming bond indices.
-    * :code:`b2a`: A mapping from a bond index to the index of the atom the bond originates from.
-    * :code:`b2revb`: A mapping from a bond index to the index of the reverse bond.
+    * :code:`f_atoms`: A :code:`(n_atoms, atom_fdim)` float32 array of atom features. If the graph featurization
+      is :code:`categorical`, these are only the features following the one-hot features (plus any atom descriptors).
+    * :code:`atom_categories`: A :code:`(n_atoms, len(ATOM_FEATURES))` int16 array with the positions of the ones
+      in the one-hot atom features if the graph featurization is :code:`categorical`, otherwise None.
+    * :code:`f_bonds`: A :code:`(n_bonds, bond_fdim)` float32 array of bond features. These are the concatenated
+      atom and bond features if the graph featurization is :code:`dense`, otherwise only the bond features.
+    * :code:`a2b`: A :code:`(n_atoms, max_num_bonds)` int32 array of incoming bond indices for each atom,
+      padded with -1.
+    * :code:`b2a`: An int32 array mapping each bond index to the index of the atom the bond originates from.
+    * :code:`b2revb`: An int32 array mapping each bond index to the index of the reverse bond.
     """
 
     def __init__(self, mol: Union[str, Chem.Mol], atom_descriptors: np.ndarray = None):
         """
         :param mol: A SMILES or an RDKit molecule.
+        :param atom_descriptors: A 2D numpy array containing additional atom descriptors to featurize the molecule.
         """
+        self.featurization = graph_featurization()
+
         # Convert SMILES to RDKit molecule if necessary
         if type(mol) == str:
             mol = Chem.MolFromSmiles(mol)
 
-        self.n_atoms = 0  # number of atoms
-        self.n_bonds = 0  # number of bonds
-        self.f_atoms = []  # mapping from atom index to atom features
-        self.f_bonds = []  # mapping from bond index to concat(in_atom, bond) features
-        self.a2b = []  # mapping from atom index to incoming bond indices
-        self.b2a = []  # mapping from bond index to the index of the atom the bond is coming from
-        self.b2revb = []  # mapping from bond index to the index of the reverse bond
-
         # Get atom features
-        self.f_atoms = [atom_features(atom) for atom in mol.GetAtoms()]
+        atom_rows = [atom_feature_rows(atom) for atom in mol.GetAtoms()]
+        if self.featurization == 'categorical':
+            self.atom_categories = np.array([categories for _, categories in atom_rows],
+                                            dtype=np.int16).reshape(-1, len(ATOM_FEATURES))  # mapping from atom index to one-hot positions
+            self.f_atoms = np.array([features[ATOM_ONEHOT_FDIM:] for features, _ in atom_rows],
+                                    dtype=np.float32).reshape(-1, ATOM_FDIM - ATOM_ONEHOT_FDIM)  # mapping from atom index to scalar atom features
+        else:
+            self.atom_categories = None
+            self.f_atoms = np.array([features for features, _ in atom_rows],
+                                    dtype=np.float32).reshape(-1, ATOM_FDIM)  # mapping from atom index to atom features
         if atom_descriptors is not None:
-            self.f_atoms = [f_atoms + descs.tolist() for f_atoms, descs in zip(self.f_atoms, atom_descriptors)]
+            self.f_atoms = np.concatenate((self.f_atoms, np.asarray(atom_descriptors, dtype=np.float32)), axis=1)
 
-        self.n_atoms = len(self.f_atoms)
+        self.n_atoms = len(self.f_atoms)  # number of atoms
 
-        # Initialize atom to bond mapping for each atom
-        for _ in range(self.n_atoms):
-            self.a2b.append([])
+        # Visit each bond once, ordered by its (lower, higher) atom indices
+        bonds = sorted((min(bond.GetBeginAtomIdx(), bond.GetEndAtomIdx()),
+                        max(bond.GetBeginAtomIdx(), bond.GetEndAtomIdx()),
+                        bond) for bond in mol.GetBonds())
+
+        self.n_bonds = 2 * len(bonds)  # number of bonds
+
+        # Bond 2i goes a1 --> a2 and bond 2i + 1 goes a2 --> a1
+        self.b2a = np.empty(self.n_bonds, dtype=np.int32)  # mapping from bond index to the index of the atom the bond is coming from
+        self.b2a[0::2] = [a1 for a1, _, _ in bonds]
+        self.b2a[1::2] = [a2 for _, a2, _ in bonds]
+        self.b2revb = np.arange(self.n_bonds, dtype=np.int32) ^ 1  # mapping from bond index to the index of the reverse bond
 
         # Get bond features
-        for a1 in range(self.n_atoms):
-            for a2 in range(a1 + 1, self.n_atoms):
-                bond = mol.GetBondBetweenAtoms(a1, a2)
+        f_bond = np.array([bond_feature_row(bond) for _, _, bond in bonds], dtype=np.float32).reshape(-1, BOND_FDIM)
+        if self.featurization == 'dense':
+            self.f_bonds = np.concatenate((self.f_atoms[self.b2a], np.repeat(f_bond, 2, axis=0)),
+                                          axis=1)  # mapping from bond index to concat(in_atom, bond) features
+        else:
+            self.f_bonds = np.repeat(f_bond, 2, axis=0)  # mapping from bond index to bond features
+
+        self.a2b = incoming_bonds(self.b2a, self.b2revb, self.n_atoms, padding=-1)  # mapping from atom index to incoming bond indices
+
+    @classmethod
+    def from_arrays(cls,
+                    featurization: str,
+                    f_atoms: np.ndarray,
+                    atom_categories: Optional[np.ndarray],
+                    f_bonds: np.ndarray,
+                    b2a: np.ndarray,
+                    b2revb: np.ndarray) -> 'MolGraph':
+        """
+        Builds a :class:`MolGraph` from already featurized arrays without copying them.
+
+        :param featurization: The graph featurization the arrays were computed with.
+        :param f_atoms: The atom features.
+        :param atom_categories: The one-hot positions of the atom features, or None.
+        :param f_bonds: The bond features.
+        :param b2a: The mapping from bond index to the index of the atom the bond is coming from.
+        :param b2revb: The mapping from bond index to the index of the reverse bond.
+        :return: A :class:`MolGraph` whose arrays are the given arrays.
+        """
+        mol_graph = cls.__new__(cls)
+        mol_graph.featurization = featurization
+        mol_graph.f_atoms = f_atoms
+        mol_graph.atom_categories = atom_categories
+        mol_graph.f_bonds = f_bonds
+        mol_graph.b2a = b2a
+        mol_graph.b2revb = b2revb
+        mol_graph.n_atoms = len(f_atoms)
+        mol_graph.n_bonds = len(f_bonds)
+        mol_graph.a2b = incoming_bonds(b2a, b2revb, mol_graph.n_atoms, padding=-1)
+
+        return mol_graph
+
+    @property
+    def nbytes(self) -> int:
+        """The number of bytes used by the feature and index arrays of the :class:`MolGraph`."""
+        return sum(array.nbytes for array in (self.f_atoms, self.atom_categories, self.f_bonds,
+                                              self.a2b, self.b2a, self.b2revb) if array is not None)
+
+
+class PackedMolGraphs:
+    r"""
+    A :class:`PackedMolGraphs` stores the :class:`MolGraph`\ s of many molecules in a few contiguous arrays.
+
+    The arrays of molecule :code:`i` are the rows between :code:`atom_offsets[i]` and :code:`atom_offsets[i + 1]`
+    (atoms) and :code:`bond_offsets[i]` and :code:`bond_offsets[i + 1]` (bonds), with the same layout as in a
+    :class:`MolGraph`. Looking up a molecule returns a :class:`MolGraph` whose arrays are views of these rows,
+    so the arrays may also be memory-mapped from a file.
+    """
 
-                if bond is None:
-                    continue
+    def __init__(self,
+                 smiles: List[str],
+                 featurization: str,
+                 f_atoms: np.ndarray,
+                 atom_categories: Optional[np.ndarray],
+                 f_bonds: np.ndarray,
+                 b2a: np.ndarray,
+                 b2revb: np.ndarray,
+                 atom_offsets: np.ndarray,
+                 bond_offsets: np.ndarray):
+        """
+        :param smiles: The SMILES of the packed molecules, in order.
+        :param featurization: The graph featurization the arrays were computed with.
+        :param f_atoms: The atom features of all molecules.
+        :param atom_categories: The one-hot positions of the atom features of all molecules, or None.
+        :param f_bonds: The bond features of all molecules.
+        :param b2a: The per-molecule mappings from bond index to source atom index of all molecules.
+        :param b2revb: The per-molecule mappings from bond index to reverse bond index of all molecules.
+        :param atom_offsets: The index of the first atom of each molecule, followed by the total number of atoms.
+        :param bond_offsets: The index of the first bond of each molecule, followed by the total number of bonds.
+        """
+        self.smiles = smiles
+        self._smiles_to_index = None
+        self.featurization = featurization
+        self.f_atoms = f_atoms
+        self.atom_categories = atom_categories
+        self.f_bonds = f_bonds
+        self.b2a = b2a
+        self.b2revb = b2revb
+        self.atom_offsets = atom_offsets
+        self.bond_offsets = bond_offsets
+
+    @classmethod
+    def pack(cls, smiles: List[str], mol_graphs: List[MolGraph]) -> 'PackedMolGraphs':
+        r"""
+        Packs the arrays of a non-empty list of :class:`MolGraph`\ s.
 
-                f_bond = bond_features(bond)
-                self.f_bonds.append(self.f_atoms[a1] + f_bond)
-                self.f_bonds.append(self.f_atoms[a2] + f_bond)
+        :param smiles: The SMILES of the molecules.
+        :param mol_graphs: The :class:`MolGraph` of each molecule, all with the same featurization.
+        :return: A :class:`PackedMolGraphs` containing the molecules.
+        """
+        atom_categories = None
+        if mol_graphs[0].atom_categories is not None:
+            atom_categories = np.concatenate([mol_graph.atom_categories for mol_graph in mol_graphs])
+
+        return cls(
+            smiles=list(smiles),
+            featurization=mol_graphs[0].featurization,
+            f_atoms=np.concatenate([mol_graph.f_atoms for mol_graph in mol_graphs]),
+            atom_categories=atom_categories,
+            f_bonds=np.concatenate([mol_graph.f_bonds for mol_graph in mol_graphs]),
+            b2a=np.concatenate([mol_graph.b2a for mol_graph in mol_graphs]),
+            b2revb=np.concatenate([mol_graph.b2revb for mol_graph in mol_graphs]),
+            atom_offsets=np.cumsum([0] + [mol_graph.n_atoms for mol_graph in mol_graphs], dtype=np.int64),
+            bond_offsets=np.cumsum([0] + [mol_graph.n_bonds for mol_graph in mol_graphs], dtype=np.int64)
+        )
+
+    @classmethod
+    def concatenate(cls, packs: List['PackedMolGraphs']) -> 'PackedMolGraphs':
+        r"""
+        Concatenates a non-empty list of :class:`PackedMolGraphs` with the same featurization.
 
-                # Update index mappings
-                b1 = self.n_bonds
-                b2 = b1 + 1
-                self.a2b[a2].append(b1)  # b1 = a1 --> a2
-                self.b2a.append(a1)
-                self.a2b[a1].append(b2)  # b2 = a2 --> a1
-                self.b2a.append(a2)
-                self.b2revb.append(b2)
-                self.b2revb.append(b1)
-                self.n_bonds += 2
+        :param packs: The :class:`PackedMolGraphs` to concatenate.
+        :return: A :class:`PackedMolGraphs` containing the molecules of all :code:`packs` in order.
+        """
+        atom_categories = None
+        if packs[0].atom_categories is not None:
+            atom_categories = np.concatenate([pack.atom_categories for pack in packs])
+
+        # Shift each pack's offsets by the number of atoms and bonds in the packs before it
+        atom_starts = np.cumsum([0] + [pack.atom_offsets[-1] for pack in packs[:-1]])
+        bond_starts = np.cumsum([0] + [pack.bond_offsets[-1] for pack in packs[:-1]])
+
+        return cls(
+            smiles=[s for pack in packs for s in pack.smiles],
+            featurization=packs[0].featurization,
+            f_atoms=np.concatenate([pack.f_atoms for pack in packs]),
+            atom_categories=atom_categories,
+            f_bonds=np.concatenate([pack.f_bonds for pack in packs]),
+            b2a=np.concatenate([pack.b2a for pack in packs]),
+            b2revb=np.concatenate([pack.b2revb for pack in packs]),
+            atom_offsets=np.concatenate([np.zeros(1, dtype=np.int64)] +
+                                        [pack.atom_offsets[1:] + start for pack, start in zip(packs, atom_starts)]),
+            bond_offsets=np.concatenate([np.zeros(1, dtype=np.int64)] +
+                                        [pack.bond_offsets[1:] + start for pack, start in zip(packs, bond_starts)])
+        )
+
+    @property
+    def smiles_to_index(self) -> Dict[str, int]:
+        """A mapping from each SMILES to the index of its molecule, built on first use."""
+        if self._smiles_to_index is None:
+            self._smiles_to_index = {s: i for i, s in enumerate(self.smiles)}
+
+        return self._smiles_to_index
+
+    def __len__(self) -> int:
+        """Returns the number of molecules."""
+        return len(self.smiles)
+
+    def __contains__(self, smiles: str) -> bool:
+        """Returns whether the graph of a SMILES is stored."""
+        return smiles in self.smiles_to_index
+
+    def __getitem__(self, smiles: str) -> MolGraph:
+        """
+        Gets the :class:`MolGraph` of a stored SMILES.
+
+        :param smiles: A SMILES string.
+        :return: A :class:`MolGraph` whose arrays are views of the packed arrays.
+        """
+        return self.graph(self.smiles_to_index[smiles])
+
+    def graph(self, i: int) -> MolGraph:
+        """
+        Gets the :class:`MolGraph` of the molecule at an index.
+
+        :param i: The index of the molecule.
+        :return: A :class:`MolGraph` whose arrays are views of the packed arrays.
+        """
+        atoms = slice(self.atom_offsets[i], self.atom_offsets[i + 1])
+        bonds = slice(self.bond_offsets[i], self.bond_offsets[i + 1])
+
+        return MolGraph.from_arrays(
+            featurization=self.featurization,
+            f_atoms=self.f_atoms[atoms],
+            atom_categories=self.atom_categories[atoms] if self.atom_categories is not None else None,
+            f_bonds=self.f_bonds[bonds],
+            b2a=self.b2a[bonds],
+            b2revb=self.b2revb[bonds]
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """The number of bytes used by the packed arrays."""
+        return sum(array.nbytes for array in (self.f_atoms, self.atom_categories, self.f_bonds, self.b2a,
+                                              self.b2revb, self.atom_offsets, self.bond_offsets)
+                   if array is not None)
 
 
 class BatchMolGraph:
@@ -189,11 +580,18 @@ class BatchMolGraph:
 
     A BatchMolGraph contains the attributes of a :class:`MolGraph` plus:
 
-    * :code:`atom_fdim`: The dimensionality of the atom feature vector.
-    * :code:`bond_fdim`: The dimensionality of the bond feature vector (technically the combined atom/bond features).
+    * :code:`atom_fdim`: The dimensionality of the stored atom feature vector (excluding the one-hot features
+      if :code:`featurization` is :code:`categorical`).
+    * :code:`bond_fdim`: The dimensionality of the stored bond feature vector (the combined atom/bond features
+      only if :code:`featurization` is :code:`dense`).
+    * :code:`featurization`: The layout of the atom and bond features (see :meth:`set_graph_featurization`).
     * :code:`a_scope`: A list of tuples indicating the start and end atom indices for each molecule.
     * :code:`b_scope`: A list of tuples indicating the start and end bond indices for each molecule.
     * :code:`max_num_bonds`: The maximum number of bonds neighboring an atom in this batch.
+    * :code:`b2dst`: A mapping from a bond index to the index of the atom the bond points to. Together with
+      :code:`b2a`, this is the edge index used to aggregate messages by scattering rather than padding.
+    * :code:`a2mol`: A mapping from an atom index to the index of the molecule it belongs to. The padding atom
+      is mapped to an extra trailing index :code:`len(a_scope)` so it can be dropped after reduction.
     * :code:`b2b`: (Optional) A mapping from a bond index to incoming bond indices.
     * :code:`a2a`: (Optional): A mapping from an atom index to neighboring atom indices.
     """
@@ -202,44 +600,53 @@ class BatchMolGraph:
         r"""
         :param mol_graphs: A list of :class:`MolGraph`\ s from which to construct the :class:`BatchMolGraph`.
         """
-        self.atom_fdim = get_atom_fdim()
-        self.bond_fdim = get_bond_fdim()
+        self.featurization = graph_featurization()
+        self.atom_fdim = get_atom_fdim() - (ATOM_ONEHOT_FDIM if self.featurization == 'categorical' else 0)
+        self.bond_fdim = get_bond_fdim() if self.featurization == 'dense' else BOND_FDIM
 
         # Start n_atoms and n_bonds at 1 b/c zero padding
-        self.n_atoms = 1  # number of atoms (start at 1 b/c need index 0 as padding)
-        self.n_bonds = 1  # number of bonds (start at 1 b/c need index 0 as padding)
-        self.a_scope = []  # list of tuples indicating (start_atom_index, num_atoms) for each molecule
-        self.b_scope = []  # list of tuples indicating (start_bond_index, num_bonds) for each molecule
+        mol_n_atoms = np.array([mol_graph.n_atoms for mol_graph in mol_graphs], dtype=np.int64)
+        mol_n_bonds = np.array([mol_graph.n_bonds for mol_graph in mol_graphs], dtype=np.int64)
+        atom_starts = 1 + np.cumsum(mol_n_atoms) - mol_n_atoms  # index of the first atom of each molecule
+        bond_starts = 1 + np.cumsum(mol_n_bonds) - mol_n_bonds  # index of the first bond of each molecule
+
+        self.n_atoms = 1 + int(mol_n_atoms.sum())  # number of atoms (start at 1 b/c need index 0 as padding)
+        self.n_bonds = 1 + int(mol_n_bonds.sum())  # number of bonds (start at 1 b/c need index 0 as padding)
+        self.a_scope = list(zip(atom_starts.tolist(), mol_n_atoms.tolist()))  # list of tuples indicating (start_atom_index, num_atoms) for each molecule
+        self.b_scope = list(zip(bond_starts.tolist(), mol_n_bonds.tolist()))  # list of tuples indicating (start_bond_index, num_bonds) for each molecule
 
         # All start with zero padding so that indexing with zero padding returns zeros
-        f_atoms = [[0] * self.atom_fdim]  # atom features
-        f_bonds = [[0] * self.bond_fdim]  # combined atom/bond features
-        a2b = [[]]  # mapping from atom index to incoming bond indices
-        b2a = [0]  # mapping from bond index to the index of the atom the bond is coming from
-        b2revb = [0]  # mapping from bond index to the index of the reverse bond
-        for mol_graph in mol_graphs:
-            f_atoms.extend(mol_graph.f_atoms)
-            f_bonds.extend(mol_graph.f_bonds)
-
-            for a in range(mol_graph.n_atoms):
-                a2b.append([b + self.n_bonds for b in mol_graph.a2b[a]])
-
-            for b in range(mol_graph.n_bonds):
-                b2a.append(self.n_atoms + mol_graph.b2a[b])
-                b2revb.append(self.n_bonds + mol_graph.b2revb[b])
-
-            self.a_scope.append((self.n_atoms, mol_graph.n_atoms))
-            self.b_scope.append((self.n_bonds, mol_graph.n_bonds))
-            self.n_atoms += mol_graph.n_atoms
-            self.n_bonds += mol_graph.n_bonds
-
-        self.max_num_bonds = max(1, max(len(in_bonds) for in_bonds in a2b))  # max with 1 to fix a crash in rare case of all single-heavy-atom mols
-
-        self.f_atoms = torch.FloatTensor(f_atoms)
-        self.f_bonds = torch.FloatTensor(f_bonds)
-        self.a2b = torch.LongTensor([a2b[a] + [0] * (self.max_num_bonds - len(a2b[a])) for a in range(self.n_atoms)])
-        self.b2a = torch.LongTensor(b2a)
-        self.b2revb = torch.LongTensor(b2revb)
+        f_atoms = np.concatenate([np.zeros((1, self.atom_fdim), dtype=np.float32)] +
+                                 [mol_graph.f_atoms for mol_graph in mol_graphs], axis=0)  # atom features
+        f_bonds = np.concatenate([np.zeros((1, self.bond_fdim), dtype=np.float32)] +
+                                 [mol_graph.f_bonds for mol_graph in mol_graphs], axis=0)  # combined atom/bond features
+
+        # The padding atom points at an extra all-zero one-hot position
+        if self.featurization == 'categorical':
+            atom_categories = np.concatenate([np.full((1, len(ATOM_FEATURES)), ATOM_ONEHOT_FDIM, dtype=np.int16)] +
+                                             [mol_graph.atom_categories for mol_graph in mol_graphs], axis=0)
+            self.atom_categories = torch.from_numpy(atom_categories.astype(np.int64))
+        else:
+            self.atom_categories = None
+
+        # Shift each molecule's local indices by the start of that molecule in the batch
+        b2a = np.concatenate([np.zeros(1, dtype=np.int64)] + [mol_graph.b2a for mol_graph in mol_graphs])
+        b2a[1:] += np.repeat(atom_starts, mol_n_bonds)  # mapping from bond index to the index of the atom the bond is coming from
+        b2revb = np.concatenate([np.zeros(1, dtype=np.int64)] + [mol_graph.b2revb for mol_graph in mol_graphs])
+        b2revb[1:] += np.repeat(bond_starts, mol_n_bonds)  # mapping from bond index to the index of the reverse bond
+
+        # The padding bond is the only bond into the padding atom, so a2b[0] is all zeros
+        a2b = incoming_bonds(b2a, b2revb, self.n_atoms, padding=0)  # mapping from atom index to incoming bond indices
+        self.max_num_bonds = max(1, a2b.shape[1])  # max with 1 to fix a crash in rare case of all single-heavy-atom mols
+
+        self.f_atoms = torch.from_numpy(f_atoms)
+        self.f_bonds = torch.from_numpy(f_bonds)
+        self.a2b = torch.from_numpy(a2b)
+        self.b2a = torch.from_numpy(b2a)
+        self.b2revb = torch.from_numpy(b2revb)
+        self.b2dst = torch.from_numpy(b2a[b2revb])
+        self.a2mol = torch.from_numpy(np.concatenate((np.array([len(mol_graphs)]),
+                                                      np.repeat(np.arange(len(mol_graphs)), mol_n_atoms))))
         self.b2b = None  # try to avoid computing b2b b/c O(n_atoms^3)
         self.a2a = None  # only needed if using atom messages
 
@@ -264,13 +671,30 @@ class BatchMolGraph:
         :return: A tuple containing PyTorch tensors with the atom features, bond features, graph structure,
                  and scope of the atoms and bonds (i.e., the indices of the molecules they belong to).
         """
-        if atom_messages:
+        if atom_messages and self.featurization != 'dense':
+            # Same as the leading columns of the dense features, which start with the features of the source atom
+            f_bonds = self.dense_f_atoms()[self.b2a, :get_bond_fdim(atom_messages=atom_messages)]
+        elif atom_messages:
             f_bonds = self.f_bonds[:, :get_bond_fdim(atom_messages=atom_messages)]
         else:
             f_bonds = self.f_bonds
 
         return self.f_atoms, f_bonds, self.a2b, self.b2a, self.b2revb, self.a_scope, self.b_scope
 
+    def dense_f_atoms(self) -> torch.FloatTensor:
+        """
+        Returns the atom features with the one-hot features expanded as in :func:`atom_features`.
+
+        :return: A PyTorch tensor containing the atom features of the :code:`dense` featurization.
+        """
+        if self.atom_categories is None:
+            return self.f_atoms
+
+        one_hot = self.f_atoms.new_zeros((self.f_atoms.size(0), ATOM_ONEHOT_FDIM + 1))
+        one_hot.scatter_(1, self.atom_categories.to(self.f_atoms.device), 1)
+
+        return torch.cat((one_hot[:, :ATOM_ONEHOT_FDIM], self.f_atoms), dim=1)
+
     def get_b2b(self) -> torch.LongTensor:
         """
         Computes (if necessary) and returns a mapping from each bond index to all the incoming bond indices.
@@ -5,10 +5,13 @@ import numpy as np
 from rdkit import Chem
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
+from torch.utils.checkpoint import checkpoint
 
 from chemprop.args import TrainArgs
 from chemprop.features import BatchMolGraph, get_atom_fdim, get_bond_fdim, mol2graph
-from chemprop.nn_utils import index_select_ND, get_activation_function
+from chemprop.features.featurization import ATOM_ONEHOT_FDIM
+from chemprop.nn_utils import index_select_ND, get_activation_function, scatter_sum
 
 
 class MPNEncoder(nn.Module):
@@ -30,6 +33,12 @@ class MPNEncoder(nn.Module):
         self.dropout = args.dropout
         self.layers_per_message = 1
         self.undirected = args.undirected
+        # Undirected bond messages are stored once per pair of reverse bonds
+        self.pair_messages = self.undirected and not self.atom_messages
+        # Atom messages apply the bond half of W_h to the summed bond features once instead of at every depth
+        self.project_bonds_once = self.atom_messages
+        self.checkpoint_depth = args.checkpoint_depth
+        self.message_aggregation = args.message_aggregation
         self.device = args.device
         self.aggregation = args.aggregation
         self.aggregation_norm = args.aggregation_norm
@@ -40,7 +49,8 @@ class MPNEncoder(nn.Module):
         # Activation
         self.act_func = get_activation_function(args.activation)
 
-        # Cached zeros
+        # Cached zeros, which the readout no longer uses. It is kept only because saved checkpoints
+        # include it in their state dict, so they load without warnings about unknown parameters.
         self.cached_zero_vector = nn.Parameter(torch.zeros(self.hidden_size), requires_grad=False)
 
         # Input
@@ -63,6 +73,33 @@ class MPNEncoder(nn.Module):
             self.atom_descriptors_layer = nn.Linear(self.hidden_size + self.atom_descriptors_size,
                                                     self.hidden_size + self.atom_descriptors_size,)
 
+    def project_atoms(self,
+                      mol_graph: BatchMolGraph,
+                      f_atoms: torch.FloatTensor,
+                      weight: torch.FloatTensor,
+                      bias: torch.FloatTensor = None) -> torch.FloatTensor:
+        """
+        Applies a linear layer to the atom features of a batch of molecular graphs.
+
+        With the :code:`categorical` graph featurization, the one-hot part of the product is computed by
+        summing the weight columns selected by the atom categories, which is the same as multiplying by the one-hot vectors.
+
+        :param mol_graph: A :class:`~chemprop.features.featurization.BatchMolGraph` representing
+                          a batch of molecular graphs.
+        :param f_atoms: The stored atom features of :code:`mol_graph` on the model's device.
+        :param weight: A weight matrix with one column per (dense) atom feature.
+        :param bias: An optional bias.
+        :return: A PyTorch tensor of shape :code:`(num_atoms, weight.size(0))`.
+        """
+        if mol_graph.featurization != 'categorical':
+            return F.linear(f_atoms, weight, bias)
+
+        W_onehot, W_scalar = weight.split([ATOM_ONEHOT_FDIM, weight.size(1) - ATOM_ONEHOT_FDIM], dim=1)
+        embedding = torch.cat((W_onehot.t(), W_onehot.new_zeros((1, W_onehot.size(0)))), dim=0)  # last row for padding
+        atom_categories = mol_graph.atom_categories.to(self.device)
+
+        return F.embedding_bag(atom_categories, embedding, mode='sum') + F.linear(f_atoms, W_scalar, bias)
+
     def forward(self,
                 mol_graph: BatchMolGraph,
                 atom_descriptors_batch: List[np.ndarray] = None) -> torch.FloatTensor:
@@ -81,22 +118,87 @@ class MPNEncoder(nn.Module):
         f_atoms, f_bonds, a2b, b2a, b2revb, a_scope, b_scope = mol_graph.get_components(atom_messages=self.atom_messages)
         f_atoms, f_bonds, a2b, b2a, b2revb = f_atoms.to(self.device), f_bonds.to(self.device), a2b.to(self.device), b2a.to(self.device), b2revb.to(self.device)
 
-        if self.atom_messages:
+        if self.message_aggregation == 'scatter':
+            b2dst = mol_graph.b2dst.to(self.device)
+            # With a bias, the padding bond (or atom) in row 0 has a nonzero message, which the padded a2b and a2a maps
+            # add to each atom once per empty neighbour slot. Scatter adds the same so both aggregations agree.
+            num_padding = None
+            if self.bias:
+                in_degrees = torch.bincount(b2dst, minlength=f_atoms.size(0))  # counts the padding bond into atom 0
+                num_padding = (mol_graph.max_num_bonds - in_degrees).unsqueeze(1)  # num_atoms x 1
+
+            def scatter_neighbours(source: torch.FloatTensor, index: torch.LongTensor) -> torch.FloatTensor:
+                # Row 0 of every source is the padding bond's (or atom's) row, which padded aggregation repeats
+                a_source = scatter_sum(source, index, f_atoms.size(0))
+                if num_padding is not None:
+                    a_source = a_source + num_padding * source[:1]
+                return a_source
+        elif self.atom_messages:
             a2a = mol_graph.get_a2a().to(self.device)
 
         # Input
         if self.atom_messages:
-            input = self.W_i(f_atoms)  # num_atoms x hidden_size
+            input = self.project_atoms(mol_graph, f_atoms, self.W_i.weight, self.W_i.bias)  # num_atoms x hidden_size
+        elif mol_graph.featurization != 'dense':
+            # W_i(concat(f_atoms[b2a], f_bonds)) split into an atom projection gathered onto bonds plus a bond projection
+            W_i_atom, W_i_bond = self.W_i.weight.split([self.atom_fdim, self.bond_fdim - self.atom_fdim], dim=1)
+            input = self.project_atoms(mol_graph, f_atoms, W_i_atom)[b2a] + F.linear(f_bonds, W_i_bond, self.W_i.bias)  # num_bonds x hidden_size
         else:
             input = self.W_i(f_bonds)  # num_bonds x hidden_size
         message = self.act_func(input)  # num_bonds x hidden_size
 
+        # Undirected bond messages are the average of a bond's message and its reverse's, so they are stored once
+        # per pair of reverse bonds, which follow each other after the padding bond in a BatchMolGraph
+        if self.pair_messages:
+            b2pair = torch.arange(1, b2a.size(0) + 1, device=self.device) >> 1  # mapping from bond index to pair index
+            if self.message_aggregation != 'scatter':
+                a2pair = (a2b + 1) >> 1  # mapping from atom index to incoming pair indices
+
+        # The bond features summed into each atom are the same at every depth, so they are projected once
+        W_h_message = bond_projection = None
+        if self.project_bonds_once:
+            W_h_message, W_h_bond = self.W_h.weight.split([self.hidden_size, self.bond_fdim], dim=1)
+            if self.message_aggregation == 'scatter':
+                a_bonds = scatter_sum(f_bonds, b2dst, f_atoms.size(0))  # num_atoms x bond_fdim
+            else:
+                a_bonds = index_select_ND(f_bonds, a2b).sum(dim=1)  # num_atoms x bond_fdim
+            bond_projection = F.linear(a_bonds, W_h_bond, self.W_h.bias)  # num_atoms x hidden
+
         # Message passing
-        for depth in range(self.depth - 1):
+        def message_passing_step(message: torch.FloatTensor,
+                                 input: torch.FloatTensor,
+                                 W_h_message: torch.FloatTensor = None,
+                                 bond_projection: torch.FloatTensor = None) -> torch.FloatTensor:
+            # Every tensor which needs a gradient is an argument so that checkpointing can recompute the step
+            if self.pair_messages:
+                # Row 0 is the padding bond, which is its own reverse
+                pair_message = torch.cat((message[:1], message[1:].view(-1, 2, self.hidden_size).mean(dim=1)))  # num_pairs x hidden
+                if self.message_aggregation == 'scatter':
+                    # Each pair sends its message to both of its atoms
+                    a_message = scatter_neighbours(pair_message, b2a[0::2]).index_add_(0, b2a[1::2], pair_message[1:])  # num_atoms x hidden
+                else:
+                    a_message = index_select_ND(pair_message, a2pair).sum(dim=1)  # num_atoms x hidden
+                # W_h(a_message[b2a] - rev_message), with W_h applied before expanding atoms and pairs to bonds
+                message = F.linear(a_message, self.W_h.weight)[b2a] - F.linear(pair_message, self.W_h.weight)[b2pair]  # num_bonds x hidden
+                if self.W_h.bias is not None:
+                    message = message + self.W_h.bias
+                message = self.act_func(input + message)  # num_bonds x hidden_size
+                return self.dropout_layer(message)  # num_bonds x hidden
+
             if self.undirected:
                 message = (message + message[b2revb]) / 2
 
-            if self.atom_messages:
+            if self.project_bonds_once:
+                # W_h(concat(a_message, a_bonds)) with the bond half precomputed
+                if self.message_aggregation == 'scatter':
+                    a_message = scatter_neighbours(message[b2a], b2dst)  # num_atoms x hidden
+                else:
+                    a_message = index_select_ND(message, a2a).sum(dim=1)  # num_atoms x hidden
+                message = torch.addmm(bond_projection, a_message, W_h_message.t())  # num_atoms x hidden
+            elif self.atom_messages and self.message_aggregation == 'scatter':
+                nei_message = torch.cat((message[b2a], f_bonds), dim=1)  # num_bonds x hidden + bond_fdim
+                message = scatter_neighbours(nei_message, b2dst)  # num_atoms x hidden + bond_fdim
+            elif self.atom_messages:
                 nei_a_message = index_select_ND(message, a2a)  # num_atoms x max_num_bonds x hidden
                 nei_f_bonds = index_select_ND(f_bonds, a2b)  # num_atoms x max_num_bonds x bond_fdim
                 nei_message = torch.cat((nei_a_message, nei_f_bonds), dim=2)  # num_atoms x max_num_bonds x hidden + bond_fdim
@@ -104,20 +206,42 @@ class MPNEncoder(nn.Module):
             else:
                 # m(a1 -> a2) = [sum_{a0 \in nei(a1)} m(a0 -> a1)] - m(a2 -> a1)
                 # message      a_message = sum(nei_a_message)      rev_message
-                nei_a_message = index_select_ND(message, a2b)  # num_atoms x max_num_bonds x hidden
-                a_message = nei_a_message.sum(dim=1)  # num_atoms x hidden
+                if self.message_aggregation == 'scatter':
+                    a_message = scatter_neighbours(message, b2dst)  # num_atoms x hidden
+                else:
+                    nei_a_message = index_select_ND(message, a2b)  # num_atoms x max_num_bonds x hidden
+                    a_message = nei_a_message.sum(dim=1)  # num_atoms x hidden
                 rev_message = message[b2revb]  # num_bonds x hidden
                 message = a_message[b2a] - rev_message  # num_bonds x hidden
 
-            message = self.W_h(message)
+            if not self.project_bonds_once:
+                message = self.W_h(message)
             message = self.act_func(input + message)  # num_bonds x hidden_size
-            message = self.dropout_layer(message)  # num_bonds x hidden
+            return self.dropout_layer(message)  # num_bonds x hidden
+
+        # Checkpointing keeps only the input of each step for backward and runs the step again to recompute the rest
+        checkpoint_steps = self.checkpoint_depth and self.training and torch.is_grad_enabled()
+        for depth in range(self.depth - 1):
+            if checkpoint_steps:
+                message = checkpoint(message_passing_step, message, input, W_h_message, bond_projection)
+            else:
+                message = message_passing_step(message, input, W_h_message, bond_projection)
 
-        a2x = a2a if self.atom_messages else a2b
-        nei_a_message = index_select_ND(message, a2x)  # num_atoms x max_num_bonds x hidden
-        a_message = nei_a_message.sum(dim=1)  # num_atoms x hidden
-        a_input = torch.cat([f_atoms, a_message], dim=1)  # num_atoms x (atom_fdim + hidden)
-        atom_hiddens = self.act_func(self.W_o(a_input))  # num_atoms x hidden
+        if self.message_aggregation == 'scatter':
+            b_message = message[b2a] if self.atom_messages else message  # num_bonds x hidden
+            a_message = scatter_neighbours(b_message, b2dst)  # num_atoms x hidden
+        else:
+            a2x = a2a if self.atom_messages else a2b
+            nei_a_message = index_select_ND(message, a2x)  # num_atoms x max_num_bonds x hidden
+            a_message = nei_a_message.sum(dim=1)  # num_atoms x hidden
+        if mol_graph.featurization == 'categorical':
+            # W_o(concat(f_atoms, a_message)) with the atom half computed from the atom categories
+            W_o_atom, W_o_message = self.W_o.weight.split([self.atom_fdim, self.hidden_size], dim=1)
+            atom_hiddens = self.project_atoms(mol_graph, f_atoms, W_o_atom, self.W_o.bias) + F.linear(a_message, W_o_message)
+            atom_hiddens = self.act_func(atom_hiddens)  # num_atoms x hidden
+        else:
+            a_input = torch.cat([f_atoms, a_message], dim=1)  # num_atoms x (atom_fdim + hidden)
+            atom_hiddens = self.act_func(self.W_o(a_input))  # num_atoms x hidden
         atom_hiddens = self.dropout_layer(atom_hiddens)  # num_atoms x hidden
 
         # concatenate the atom descriptors
@@ -127,22 +251,17 @@ class MPNEncoder(nn.Module):
             atom_hiddens = self.dropout_layer(atom_hiddens)                             # num_atoms x (hidden + descriptor size)
 
         # Readout
-        mol_vecs = []
-        for i, (a_start, a_size) in enumerate(a_scope):
-            if a_size == 0:
-                mol_vecs.append(self.cached_zero_vector)
-            else:
-                cur_hiddens = atom_hiddens.narrow(0, a_start, a_size)
-                mol_vec = cur_hiddens  # (num_atoms, hidden_size)
-                if self.aggregation=='mean':
-                    mol_vec = mol_vec.sum(dim=0) / a_size
-                elif self.aggregation=='sum':
-                    mol_vec = mol_vec.sum(dim=0)
-                elif self.aggregation=='norm':
-                    mol_vec = mol_vec.sum(dim=0) / self.aggregation_norm
-                mol_vecs.append(mol_vec)
-
-        mol_vecs = torch.stack(mol_vecs, dim=0)  # (num_molecules, hidden_size)
+        # Sum atom vectors per molecule in one segment reduction; the padding atom's segment is dropped.
+        # Molecules without atoms receive no contributions, so their rows stay zero.
+        # The sums are accumulated in float32 even when the layers above ran in bfloat16.
+        num_mols = len(a_scope)
+        a2mol = mol_graph.a2mol.to(self.device)
+        mol_vecs = scatter_sum(atom_hiddens.float(), a2mol, num_mols + 1)[:num_mols]  # (num_molecules, hidden_size)
+        if self.aggregation == 'mean':
+            a_sizes = torch.bincount(a2mol, minlength=num_mols + 1)[:num_mols]  # (num_molecules,)
+            mol_vecs = mol_vecs / a_sizes.clamp(min=1).unsqueeze(1)
+        elif self.aggregation == 'norm':
+            mol_vecs = mol_vecs / self.aggregation_norm
 
         return mol_vecs  # num_molecules x hidden
 
@@ -186,7 +305,7 @@ class MPN(nn.Module):
 
         :param batch: A list of list of SMILES, a list of list of RDKit molecules, or a
                       :class:`~chemprop.features.featurization.BatchMolGraph`.
-        :param features_batch: A list of numpy arrays containing additional features.
+        :param features_batch: A list of numpy arrays (or a tensor) containing additional features.
         :param atom_descriptors_batch: A list of numpy arrays containing additional atom descriptors.
         :return: A PyTorch tensor of shape :code:`(num_molecules, hidden_size)` containing the encoding of each molecule.
         """
@@ -202,7 +321,10 @@ class MPN(nn.Module):
                 batch = [mol2graph(b) for b in batch]
 
         if self.use_input_features:
-            features_batch = torch.from_numpy(np.stack(features_batch)).float().to(self.device)
+            # Batches from data loader workers already contain a tensor of features
+            if not isinstance(features_batch, torch.Tensor):
+                features_batch = torch.from_numpy(np.stack(features_batch))
+            features_batch = features_batch.float().to(self.device)
 
             if self.features_only:
                 return features_batch
@@ -1,4 +1,6 @@
+from contextlib import nullcontext
 import math
+import sys
 from typing import List, Union
 
 import numpy as np
@@ -41,6 +43,47 @@ def param_count(model: nn.Module) -> int:
     return sum(param.numel() for param in model.parameters() if param.requires_grad)
 
 
+def bfloat16_autocast(enabled: bool = True):
+    """
+    Gets a context manager which runs the model on CPUs in mixed precision with bfloat16.
+
+    Under :code:`torch.autocast`, linear layers and matrix products run in bfloat16 while operations which need
+    the precision, such as reductions, stay in float32. Outputs should be converted back to float32 with
+    :code:`.float()` before computing losses or converting them to numpy, which has no bfloat16 type.
+
+    :param enabled: Whether to use bfloat16. If False, the context manager does nothing.
+    :return: A context manager.
+    """
+    if not enabled:
+        return nullcontext()
+
+    return torch.autocast('cpu', dtype=torch.bfloat16)
+
+
+def peak_memory(device: torch.device) -> int:
+    """
+    Gets the peak memory used for training on a device.
+
+    On GPUs this is the peak memory allocated by PyTorch since :code:`torch.cuda.reset_peak_memory_stats`
+    was last called. On CPUs it is the peak resident memory of the process.
+
+    :param device: The :code:`torch.device` of the model.
+    :return: The peak memory in bytes, or None if it cannot be measured on this platform.
+    """
+    if device.type == 'cuda':
+        return torch.cuda.max_memory_allocated(device)
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
 def index_select_ND(source: torch.Tensor, index: torch.Tensor) -> torch.Tensor:
     """
     Selects the message features from source corresponding to the atom or bond indices in :code:`index`.
@@ -61,6 +104,21 @@ def index_select_ND(source: torch.Tensor, index: torch.Tensor) -> torch.Tensor:
     return target
 
 
+def scatter_sum(source: torch.Tensor, index: torch.Tensor, dim_size: int) -> torch.Tensor:
+    """
+    Sums the rows of :code:`source` into the rows of a new tensor given by :code:`index`.
+
+    :param source: A tensor of shape :code:`(num_bonds, hidden_size)` containing message features.
+    :param index: A tensor of shape :code:`(num_bonds,)` containing the atom index each row is summed into.
+    :param dim_size: The number of rows in the output (e.g., :code:`num_atoms`).
+    :return: A tensor of shape :code:`(dim_size, hidden_size)` where each row is the sum of the rows of
+             :code:`source` whose index points to it.
+    """
+    target = source.new_zeros((dim_size,) + source.size()[1:])  # (num_atoms, hidden_size)
+
+    return target.index_add_(0, index, source)
+
+
 def get_activation_function(activation: str) -> nn.Module:
     """
     Gets an activation function module given the name of the activation.
@@ -109,7 +167,8 @@ def initialize_weights(model: nn.Module) -> None:
 def compute_molecule_vectors(model: nn.Module,
                              data: MoleculeDataset,
                              batch_size: int,
-                             num_workers: int = 8) -> List[np.ndarray]:
+                             num_workers: int = 8,
+                             bfloat16: bool = False) -> List[np.ndarray]:
     """
     Computes the molecule vectors output from the last layer of a :class:`~chemprop.models.MoleculeModel`.
 
@@ -117,6 +176,7 @@ def compute_molecule_vectors(model: nn.Module,
     :param data: A :class:`~chemprop.data.MoleculeDataset`.
     :param batch_size: Batch size.
     :param num_workers: Number of parallel data loading workers.
+    :param bfloat16: Whether to run the model on CPUs in mixed precision with bfloat16.
     :return: A list of 1D numpy arrays of length hidden_size containing
              the molecule vectors generated by the model for each molecule provided.
     """
@@ -131,11 +191,11 @@ def compute_molecule_vectors(model: nn.Module,
     vecs = []
     for batch in tqdm(data_loader, total=len(data_loader)):
         # Apply model to batch
-        with torch.no_grad():
+        with torch.no_grad(), bfloat16_autocast(bfloat16):
             batch_vecs = model.featurize(batch.batch_graph(), batch.features())
 
         # Collect vectors
-        vecs.extend(batch_vecs.data.cpu().numpy())
+        vecs.extend(batch_vecs.data.float().cpu().numpy())
 
     if training:
         model.train()
@@ -0,0 +1,50 @@
+import os
+
+from chemprop.args import PreprocessArgs
+from chemprop.data import featurize_graphs, get_data, get_header, get_task_names
+from chemprop.data.compiled import save_compiled_data
+from chemprop.utils import makedirs, timeit
+
+
+@timeit()
+def preprocess(args: PreprocessArgs) -> None:
+    """
+    Compiles a data CSV file into a single binary file which :func:`~chemprop.data.get_data` memory-maps.
+
+    The SMILES are parsed and validated, the features are computed, and the molecules are featurized once here,
+    so training and prediction on the compiled file do not need to read the CSV or use RDKit.
+
+    :param args: A :class:`~chemprop.args.PreprocessArgs` object containing arguments for compiling the data.
+    """
+    print('Loading data')
+    data = get_data(path=args.data_path, args=args)
+
+    smiles_columns = args.smiles_columns
+    if None in smiles_columns:
+        smiles_columns = get_header(args.data_path)[:len(smiles_columns)]
+
+    task_names = get_task_names(path=args.data_path, smiles_columns=args.smiles_columns,
+                                target_columns=args.target_columns, ignore_columns=args.ignore_columns)
+
+    print(f'Featurizing {len(data):,} datapoints')
+    graphs = featurize_graphs(datasets=[data], num_processes=args.featurization_processes)
+
+    print(f'Saving compiled data to {args.save_path}')
+    makedirs(args.save_path, isfile=True)
+    save_compiled_data(
+        path=args.save_path,
+        data=data,
+        graphs=graphs,
+        smiles_columns=smiles_columns,
+        task_names=task_names,
+        features_generator=args.features_generator
+    )
+    print(f'Compiled data file size = {os.path.getsize(args.save_path) / 2 ** 20:,.1f} MB')
+
+
+def chemprop_preprocess() -> None:
+    """Compiles a data CSV file into a binary file for fast loading.
+
+    This is the entry point for the command line command :code:`chemprop_preprocess`.
+    """
+    preprocess(args=PreprocessArgs().parse_args())
@@ -11,7 +11,7 @@ import pandas as pd
 from .run_training import run_training
 from chemprop.args import TrainArgs
 from chemprop.constants import TEST_SCORES_FILE_NAME, TRAIN_LOGGER_NAME
-from chemprop.data import get_data, get_task_names, MoleculeDataset, validate_dataset_type
+from chemprop.data import get_data, get_task_names, MoleculeDataset, set_packed_graphs, validate_dataset_type
 from chemprop.utils import create_logger, makedirs, timeit
 from chemprop.features import set_extra_atom_fdim
 
@@ -88,6 +88,9 @@ def cross_validate(args: TrainArgs,
             all_scores[metric].append(scores)
     all_scores = dict(all_scores)
 
+    # Release the graphs featurized for this data, which are shared by all folds
+    set_packed_graphs(None)
+
     # Convert scores to numpy arrays
     for metric, scores in all_scores.items():
         all_scores[metric] = np.array(scores)
@@ -81,7 +81,8 @@ def evaluate(model: MoleculeModel,
              metrics: List[str],
              dataset_type: str,
              scaler: StandardScaler = None,
-             logger: logging.Logger = None) -> Dict[str, List[float]]:
+             logger: logging.Logger = None,
+             bfloat16: bool = False) -> Dict[str, List[float]]:
     """
     Evaluates an ensemble of models on a dataset by making predictions and then evaluating the predictions.
 
@@ -92,13 +93,15 @@ def evaluate(model: MoleculeModel,
     :param dataset_type: Dataset type.
     :param scaler: A :class:`~chemprop.features.scaler.StandardScaler` object fit on the training targets.
     :param logger: A logger to record output.
+    :param bfloat16: Whether to run the model on CPUs in mixed precision with bfloat16.
     :return: A dictionary mapping each metric in :code:`metrics` to a list of values for each task.
 
     """
     preds = predict(
         model=model,
         data_loader=data_loader,
-        scaler=scaler
+        scaler=scaler,
+        bfloat16=bfloat16
     )
 
     results = evaluate_predictions(
@@ -6,8 +6,8 @@ from tqdm import tqdm
 
 from .predict import predict
 from chemprop.args import PredictArgs, TrainArgs
-from chemprop.data import get_data, get_data_from_smiles, MoleculeDataLoader, MoleculeDataset
-from chemprop.utils import load_args, load_checkpoint, load_scalers, makedirs, timeit
+from chemprop.data import disk_graph_cache, get_data, get_data_from_smiles, make_mol, MoleculeDataLoader
+from chemprop.utils import load_args, load_checkpoint, load_scalers, makedirs, quantize_model, timeit
 
 
 @timeit()
@@ -53,14 +53,19 @@ def make_predictions(args: PredictArgs, smiles: List[List[str]] = None) -> List[
                              args=args, store_row=True)
 
     print('Validating SMILES')
+    # Molecules in compiled data files or in the graph cache were validated when they were featurized
+    cached_smiles = disk_graph_cache().valid_smiles(full_data.smiles(flatten=True)) \
+        if disk_graph_cache() is not None else set()
+
     full_to_valid_indices = {}
     valid_index = 0
-    for full_index in range(len(full_data)):
-        if all(mol is not None for mol in full_data[full_index].mol):
+    for full_index, (smiles, _, packed_graphs, _) in enumerate(full_data.graph_rows()):
+        if packed_graphs is not None or all(s in cached_smiles for s in smiles) \
+                or all(make_mol(s) is not None for s in smiles):
             full_to_valid_indices[full_index] = valid_index
             valid_index += 1
 
-    test_data = MoleculeDataset([full_data[i] for i in sorted(full_to_valid_indices.keys())])
+    test_data = full_data.subset(sorted(full_to_valid_indices.keys()))
 
     # Edge case if empty list of smiles is provided
     if len(test_data) == 0:
@@ -74,17 +79,24 @@ def make_predictions(args: PredictArgs, smiles: List[List[str]] = None) -> List[
     else:
         sum_preds = np.zeros((len(test_data), num_tasks))
 
+    # The float models predict on the same batches as the quantized ones to report the cost of quantization
+    sum_float_preds = np.zeros_like(sum_preds) if args.quantization_report else None
+
     # Create data loader
     test_data_loader = MoleculeDataLoader(
         dataset=test_data,
         batch_size=args.batch_size,
-        num_workers=args.num_workers
+        num_workers=args.num_workers,
+        max_batch_atoms=args.max_batch_atoms,
+        prefetch_batches=args.prefetch_batches
     )
 
     print(f'Predicting with an ensemble of {len(args.checkpoint_paths)} models')
     for checkpoint_path in tqdm(args.checkpoint_paths, total=len(args.checkpoint_paths)):
         # Load model and scalers
-        model = load_checkpoint(checkpoint_path, device=args.device)
+        float_model = model = load_checkpoint(checkpoint_path, device=args.device)
+        if args.quantize == 'dynamic':
+            model = quantize_model(model)
         scaler, features_scaler = load_scalers(checkpoint_path)
 
         # Normalize features
@@ -96,12 +108,29 @@ def make_predictions(args: PredictArgs, smiles: List[List[str]] = None) -> List[
         model_preds = predict(
             model=model,
             data_loader=test_data_loader,
-            scaler=scaler
+            scaler=scaler,
+            bfloat16=args.bfloat16
         )
         sum_preds += np.array(model_preds)
 
+        if sum_float_preds is not None:
+            sum_float_preds += np.array(predict(
+                model=float_model,
+                data_loader=test_data_loader,
+                scaler=scaler,
+                bfloat16=args.bfloat16
+            ))
+
     # Ensemble predictions
     avg_preds = sum_preds / len(args.checkpoint_paths)
+
+    if sum_float_preds is not None:
+        differences = np.abs(avg_preds - sum_float_preds / len(args.checkpoint_paths))
+        differences = differences.reshape(len(test_data), num_tasks, -1)  # multiclass tasks have several columns
+        print('Absolute difference between the quantized and float predictions')
+        for task_name, task_differences in zip(task_names, differences.transpose(1, 0, 2)):
+            print(f'{task_name}: max = {task_differences.max():.6f}, mean = {task_differences.mean():.6f}')
+
     avg_preds = avg_preds.tolist()
 
     # Save predictions
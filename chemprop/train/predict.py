@@ -5,12 +5,14 @@ from tqdm import tqdm
 
 from chemprop.data import MoleculeDataLoader, MoleculeDataset, StandardScaler
 from chemprop.models import MoleculeModel
+from chemprop.nn_utils import bfloat16_autocast
 
 
 def predict(model: MoleculeModel,
             data_loader: MoleculeDataLoader,
             disable_progress_bar: bool = False,
-            scaler: StandardScaler = None) -> List[List[float]]:
+            scaler: StandardScaler = None,
+            bfloat16: bool = False) -> List[List[float]]:
     """
     Makes predictions on a dataset using an ensemble of models.
 
@@ -18,6 +20,7 @@ def predict(model: MoleculeModel,
     :param data_loader: A :class:`~chemprop.data.data.MoleculeDataLoader`.
     :param disable_progress_bar: Whether to disable the progress bar.
     :param scaler: A :class:`~chemprop.features.scaler.StandardScaler` object fit on the training targets.
+    :param bfloat16: Whether to run the model on CPUs in mixed precision with bfloat16.
     :return: A list of lists of predictions. The outer list is molecules while the inner list is tasks.
     """
     model.eval()
@@ -30,10 +33,10 @@ def predict(model: MoleculeModel,
         mol_batch, features_batch, atom_descriptors_batch = batch.batch_graph(), batch.features(), batch.atom_descriptors()
 
         # Make predictions
-        with torch.no_grad():
+        with torch.no_grad(), bfloat16_autocast(bfloat16):
             batch_preds = model(mol_batch, features_batch, atom_descriptors_batch)
 
-        batch_preds = batch_preds.data.cpu().numpy()
+        batch_preds = batch_preds.data.float().cpu().numpy()
 
         # Inverse scale if regression
         if scaler is not None:
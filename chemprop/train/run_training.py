@@ -14,7 +14,8 @@ from .predict import predict
 from .train import train
 from chemprop.args import TrainArgs
 from chemprop.constants import MODEL_FILE_NAME
-from chemprop.data import get_class_sizes, get_data, MoleculeDataLoader, MoleculeDataset, set_cache_graph, split_data
+from chemprop.data import cache_info, disk_graph_cache, featurize_graphs, get_class_sizes, get_data, \
+    MoleculeDataLoader, MoleculeDataset, packed_graphs, set_cache_graph, set_packed_graphs, split_data
 from chemprop.models import MoleculeModel
 from chemprop.nn_utils import param_count
 from chemprop.utils import build_optimizer, build_lr_scheduler, get_loss_func, load_checkpoint,makedirs, \
@@ -114,6 +115,24 @@ def run_training(args: TrainArgs,
         set_cache_graph(False)
         num_workers = args.num_workers
 
+        # Featurize once up front so data loader workers only collate graphs
+        if args.featurization_processes != 0:
+            debug('Featurizing molecular graphs')
+            set_packed_graphs(featurize_graphs(
+                datasets=[data, val_data, test_data],
+                num_processes=args.featurization_processes,
+                graphs=packed_graphs(),
+                progress_bar=not args.quiet
+            ))
+            debug(f'Featurized graphs of {len(packed_graphs()):,} molecules use '
+                  f'{packed_graphs().nbytes / 2 ** 20:,.1f} MB')
+
+            if disk_graph_cache() is not None:
+                disk_stats = disk_graph_cache().info()
+                debug(f'Graph cache: {disk_stats["hits"]:,} hits, {disk_stats["misses"]:,} misses, '
+                      f'{disk_stats["evictions"]:,} evictions, {disk_stats["graphs"]:,} graphs stored in '
+                      f'{disk_stats["size"] / 2 ** 20:,.1f} MB')
+
     # Create data loaders
     train_data_loader = MoleculeDataLoader(
         dataset=train_data,
@@ -121,17 +140,29 @@ def run_training(args: TrainArgs,
         num_workers=num_workers,
         class_balance=args.class_balance,
         shuffle=True,
-        seed=args.seed
+        seed=args.seed,
+        num_buckets=args.num_buckets,
+        max_batch_atoms=args.max_batch_atoms,
+        prefetch_batches=args.prefetch_batches,
+        shared_workers=args.shared_workers
     )
     val_data_loader = MoleculeDataLoader(
         dataset=val_data,
         batch_size=args.batch_size,
-        num_workers=num_workers
+        num_workers=num_workers,
+        max_batch_atoms=args.max_batch_atoms,
+        prefetch_batches=args.prefetch_batches,
+        shared_workers=args.shared_workers,
+        cache_batches=args.cache_eval_batches
     )
     test_data_loader = MoleculeDataLoader(
         dataset=test_data,
         batch_size=args.batch_size,
-        num_workers=num_workers
+        num_workers=num_workers,
+        max_batch_atoms=args.max_batch_atoms,
+        prefetch_batches=args.prefetch_batches,
+        shared_workers=args.shared_workers,
+        cache_batches=args.cache_eval_batches
     )
 
     if args.class_balance:
@@ -168,7 +199,12 @@ def run_training(args: TrainArgs,
         optimizer = build_optimizer(model, args)
 
         # Learning rate schedulers
-        scheduler = build_lr_scheduler(optimizer, args)
+        # With an atom budget or buckets, the number of steps varies between epochs, so the schedule is
+        # stretched over the exact total number of steps of the run, planned ahead by the batch sampler
+        steps_per_epoch = None
+        if args.max_batch_atoms is not None or args.num_buckets > 0:
+            steps_per_epoch = train_data_loader.num_batches(args.epochs) / args.epochs
+        scheduler = build_lr_scheduler(optimizer, args, steps_per_epoch=steps_per_epoch)
 
         # Run training
         best_score = float('inf') if args.minimize_score else -float('inf')
@@ -196,7 +232,8 @@ def run_training(args: TrainArgs,
                 metrics=args.metrics,
                 dataset_type=args.dataset_type,
                 scaler=scaler,
-                logger=logger
+                logger=logger,
+                bfloat16=args.bfloat16
             )
 
             for metric, scores in val_scores.items():
@@ -225,7 +262,8 @@ def run_training(args: TrainArgs,
         test_preds = predict(
             model=model,
             data_loader=test_data_loader,
-            scaler=scaler
+            scaler=scaler,
+            bfloat16=args.bfloat16
         )
         test_scores = evaluate_predictions(
             preds=test_preds,
@@ -252,6 +290,11 @@ def run_training(args: TrainArgs,
                     writer.add_scalar(f'test_{task_name}_{metric}', test_score, n_iter)
         writer.close()
 
+    # Report the in-memory caches of this process
+    for name, stats in cache_info().items():
+        debug(f'{name.capitalize()} cache: {stats["hits"]:,} hits, {stats["misses"]:,} misses, '
+              f'{stats["evictions"]:,} evictions, {stats["items"]:,} items in {stats["size"] / 2 ** 20:,.1f} MB')
+
     # Evaluate ensemble on test set
     avg_test_preds = (sum_test_preds / args.ensemble_size).tolist()
 
@@ -1,4 +1,5 @@
 import logging
+from time import time
 from typing import Callable
 
 from tensorboardX import SummaryWriter
@@ -11,7 +12,7 @@ from tqdm import tqdm
 from chemprop.args import TrainArgs
 from chemprop.data import MoleculeDataLoader, MoleculeDataset
 from chemprop.models import MoleculeModel
-from chemprop.nn_utils import compute_gnorm, compute_pnorm, NoamLR
+from chemprop.nn_utils import bfloat16_autocast, compute_gnorm, compute_pnorm, NoamLR, peak_memory
 
 
 def train(model: MoleculeModel,
@@ -41,33 +42,37 @@ def train(model: MoleculeModel,
     
     model.train()
     loss_sum = iter_count = 0
+    num_steps, start_time = 0, time()
+    if args.device.type == 'cuda':
+        torch.cuda.reset_peak_memory_stats(args.device)
 
     for batch in tqdm(data_loader, total=len(data_loader), leave=False):
         # Prepare batch
         batch: MoleculeDataset
-        mol_batch, features_batch, target_batch, atom_descriptors_batch = \
-            batch.batch_graph(), batch.features(), batch.targets(), batch.atom_descriptors()
-        mask = torch.Tensor([[x is not None for x in tb] for tb in target_batch])
-        targets = torch.Tensor([[0 if x is None else x for x in tb] for tb in target_batch])
+        mol_batch, features_batch, atom_descriptors_batch = \
+            batch.batch_graph(), batch.features(), batch.atom_descriptors()
+        targets, mask = batch.target_tensors()  # Precomputed when the batch is collated
 
         # Run model
         model.zero_grad()
-        preds = model(mol_batch, features_batch, atom_descriptors_batch)
+        with bfloat16_autocast(args.bfloat16):
+            preds = model(mol_batch, features_batch, atom_descriptors_batch)
+        preds = preds.float()  # The loss is computed in float32
 
         # Move tensors to correct device
         mask = mask.to(preds.device)
         targets = targets.to(preds.device)
-        class_weights = torch.ones(targets.shape, device=preds.device)
 
         if args.dataset_type == 'multiclass':
             targets = targets.long()
-            loss = torch.cat([loss_func(preds[:, target_index, :], targets[:, target_index]).unsqueeze(1) for target_index in range(preds.size(1))], dim=1) * class_weights * mask
+            loss = torch.cat([loss_func(preds[:, target_index, :], targets[:, target_index]).unsqueeze(1) for target_index in range(preds.size(1))], dim=1) * mask
         else:
-            loss = loss_func(preds, targets) * class_weights * mask
+            loss = loss_func(preds, targets) * mask
         loss = loss.sum() / mask.sum()
 
         loss_sum += loss.item()
         iter_count += 1
+        num_steps += 1
 
         loss.backward()
         if args.grad_clip:
@@ -79,8 +84,10 @@ def train(model: MoleculeModel,
 
         n_iter += len(batch)
 
-        # Log and/or add to tensorboard
-        if (n_iter // args.batch_size) % args.log_frequency == 0:
+        # Log and/or add to tensorboard every time another log_frequency batches' worth of examples is reached,
+        # which also works when batches have different sizes
+        log_size = args.batch_size * args.log_frequency
+        if n_iter // log_size > (n_iter - len(batch)) // log_size:
             lrs = scheduler.get_lr()
             pnorm = compute_pnorm(model)
             gnorm = compute_gnorm(model)
@@ -97,4 +104,11 @@ def train(model: MoleculeModel,
                 for i, lr in enumerate(lrs):
                     writer.add_scalar(f'learning_rate_{i}', lr, n_iter)
 
+    # Recomputing messages with checkpoint_depth trades time per step for memory, so both are logged
+    epoch_time = time() - start_time
+    memory = peak_memory(args.device)
+    memory_str = f'{memory / 2 ** 20:,.0f} MiB' if memory is not None else 'unknown'
+    debug(f'Epoch time = {epoch_time:.2f}s, time per step = {1000 * epoch_time / max(num_steps, 1):.1f}ms, '
+          f'peak memory = {memory_str}' + (' (checkpointed message passing)' if args.checkpoint_depth else ''))
+
     return n_iter
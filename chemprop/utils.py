@@ -18,6 +18,7 @@ from torch.optim.lr_scheduler import _LRScheduler
 
 from chemprop.args import TrainArgs
 from chemprop.data import StandardScaler, MoleculeDataset
+from chemprop.features import graph_featurization
 from chemprop.models import MoleculeModel
 from chemprop.nn_utils import NoamLR
 
@@ -125,6 +126,39 @@ def load_checkpoint(path: str,
     return model
 
 
+def quantize_model(model: MoleculeModel) -> MoleculeModel:
+    """
+    Applies dynamic int8 quantization to the linear layers of a model for inference on CPUs.
+
+    The weights of :code:`W_i`, :code:`W_h`, :code:`W_o` and the FFN layers are stored in int8 and the
+    activations are quantized on the fly, which lowers the memory of the model and speeds up prediction.
+    Layers whose weights are used directly by :class:`~chemprop.models.mpn.MPNEncoder`, such as :code:`W_i`
+    with atom messages or :code:`W_o` with the :code:`categorical` graph featurization, are kept in float32.
+
+    :param model: A :class:`~chemprop.models.model.MoleculeModel` on CPU.
+    :return: A quantized copy of the model, in evaluation mode.
+    """
+    layers = {f'ffn.{name}' for name, module in model.ffn.named_children() if isinstance(module, nn.Linear)}
+
+    if not model.encoder.features_only:
+        featurization = graph_featurization()
+        for i, encoder in enumerate(model.encoder.encoder):
+            layers.add(f'encoder.encoder.{i}.W_h')
+            if not encoder.atom_messages and featurization == 'dense':
+                layers.add(f'encoder.encoder.{i}.W_i')
+            if featurization != 'categorical':
+                layers.add(f'encoder.encoder.{i}.W_o')
+
+    model = torch.quantization.quantize_dynamic(model, qconfig_spec=layers, dtype=torch.qint8)
+
+    if not model.encoder.features_only:
+        for encoder in model.encoder.encoder:
+            # Undirected pair messages and the precomputed bond projection use W_h.weight directly
+            encoder.pair_messages = encoder.project_bonds_once = False
+
+    return model
+
+
 def load_scalers(path: str) -> Tuple[StandardScaler, StandardScaler]:
     """
     Loads the scalers a model was trained with.
@@ -316,13 +350,18 @@ def build_optimizer(model: nn.Module, args: TrainArgs) -> Optimizer:
     return Adam(params)
 
 
-def build_lr_scheduler(optimizer: Optimizer, args: TrainArgs, total_epochs: List[int] = None) -> _LRScheduler:
+def build_lr_scheduler(optimizer: Optimizer,
+                       args: TrainArgs,
+                       total_epochs: List[int] = None,
+                       steps_per_epoch: float = None) -> _LRScheduler:
     """
     Builds a PyTorch learning rate scheduler.
 
     :param optimizer: The Optimizer whose learning rate will be scheduled.
     :param args: A :class:`~chemprop.args.TrainArgs` object containing learning rate arguments.
     :param total_epochs: The total number of epochs for which the model will be run.
+    :param steps_per_epoch: The (average) number of training steps in each epoch. By default, the number of
+                            training datapoints divided by the batch size.
     :return: An initialized learning rate scheduler.
     """
     # Learning rate scheduler
@@ -330,7 +369,7 @@ def build_lr_scheduler(optimizer: Optimizer, args: TrainArgs, total_epochs: List
         optimizer=optimizer,
         warmup_epochs=[args.warmup_epochs],
         total_epochs=total_epochs or [args.epochs] * args.num_lrs,
-        steps_per_epoch=args.train_data_size // args.batch_size,
+        steps_per_epoch=steps_per_epoch or args.train_data_size // args.batch_size,
         init_lr=[args.init_lr],
         max_lr=[args.max_lr],
         final_lr=[args.final_lr]
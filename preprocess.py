@@ -0,0 +1,7 @@
+"""Compiles a data CSV file into a binary file for fast loading."""
+
+from chemprop.preprocess import chemprop_preprocess
+
+
+if __name__ == '__main__':
+    chemprop_preprocess()
@@ -0,0 +1,84 @@
+"""Times featurization and BatchMolGraph collation against the original per-atom Python loop and reports featurized graph sizes."""
+
+import os
+import sys
+from time import perf_counter
+from typing import List
+from typing_extensions import Literal
+
+import numpy as np
+from tap import Tap  # pip install typed-argument-parser (https://github.com/swansonk14/typed-argument-parser)
+import torch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from chemprop.data import get_smiles
+from chemprop.features import BatchMolGraph, feature_cache_info, get_atom_fdim, get_bond_fdim, MolGraph, \
+    set_graph_featurization
+
+
+class Args(Tap):
+    data_path: str  # Path to data CSV file
+    smiles_column: str = None  # Name of the column containing SMILES strings. By default, uses the first column.
+    batch_size: int = 50  # Number of molecules per batch
+    num_repeats: int = 5  # Number of passes over the data to time
+    graph_featurization: Literal['dense', 'factorized', 'categorical'] = 'dense'  # Layout of the atom and bond features
+
+
+def loop_collate(mol_graphs: List[MolGraph]) -> List[torch.Tensor]:
+    """Collates molecules by appending and re-offsetting indices one atom and one bond at a time."""
+    n_atoms = n_bonds = 1
+    f_atoms = [np.zeros((1, get_atom_fdim()), dtype=np.float32)]
+    f_bonds = [np.zeros((1, get_bond_fdim()), dtype=np.float32)]
+    a2b, b2a, b2revb = [[]], [0], [0]
+    for mol_graph in mol_graphs:
+        f_atoms.append(mol_graph.f_atoms)
+        f_bonds.append(mol_graph.f_bonds)
+
+        for a in range(mol_graph.n_atoms):
+            a2b.append([int(b) + n_bonds for b in mol_graph.a2b[a] if b >= 0])
+
+        for b in range(mol_graph.n_bonds):
+            b2a.append(n_atoms + int(mol_graph.b2a[b]))
+            b2revb.append(n_bonds + int(mol_graph.b2revb[b]))
+
+        n_atoms += mol_graph.n_atoms
+        n_bonds += mol_graph.n_bonds
+
+    max_num_bonds = max(1, max(len(in_bonds) for in_bonds in a2b))
+
+    return [
+        torch.from_numpy(np.concatenate(f_atoms, axis=0)),
+        torch.from_numpy(np.concatenate(f_bonds, axis=0)),
+        torch.LongTensor([in_bonds + [0] * (max_num_bonds - len(in_bonds)) for in_bonds in a2b]),
+        torch.LongTensor(b2a),
+        torch.LongTensor(b2revb)
+    ]
+
+
+def benchmark_collation(args: Args) -> None:
+    set_graph_featurization(args.graph_featurization)
+    smiles = get_smiles(path=args.data_path, smiles_columns=args.smiles_column, flatten=True)
+    start = perf_counter()
+    mol_graphs = [MolGraph(s) for s in smiles]
+    print(f'Featurized graphs: {sum(mol_graph.nbytes for mol_graph in mol_graphs) / 2 ** 20:.2f} MB '
+          f'in {perf_counter() - start:.2f} s')
+    print(f'Feature cache: {feature_cache_info()}')
+    batches = [mol_graphs[i:i + args.batch_size] for i in range(0, len(mol_graphs), args.batch_size)]
+
+    collaters = [('vectorized', BatchMolGraph)]
+    if args.graph_featurization == 'dense':
+        collaters.insert(0, ('loop', loop_collate))
+
+    for name, collate in collaters:
+        start = perf_counter()
+        for _ in range(args.num_repeats):
+            for batch in batches:
+                collate(batch)
+        elapsed = perf_counter() - start
+
+        print(f'{name:>10}: {1000 * elapsed / (args.num_repeats * len(batches)):.3f} ms per batch')
+
+
+if __name__ == '__main__':
+    benchmark_collation(Args().parse_args())
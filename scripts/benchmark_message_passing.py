@@ -0,0 +1,135 @@
+"""Times --atom_messages training steps with and without projecting the bond features once and reports their peak memory."""
+
+import os
+import sys
+from time import perf_counter
+from typing import Any, Callable, List, Tuple
+from typing_extensions import Literal
+import weakref
+
+from tap import Tap  # pip install typed-argument-parser (https://github.com/swansonk14/typed-argument-parser)
+import torch
+from torch.utils._python_dispatch import TorchDispatchMode
+from torch.utils._pytree import tree_flatten
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from chemprop.args import TrainArgs
+from chemprop.data import get_smiles
+from chemprop.features import BatchMolGraph, mol2graph
+from chemprop.models import MoleculeModel
+
+
+class Args(Tap):
+    data_path: str  # Path to data CSV file
+    smiles_column: str = None  # Name of the column containing SMILES strings. By default, uses the first column.
+    batch_size: int = 50  # Number of molecules per batch
+    num_repeats: int = 5  # Number of passes over the data to time, of which the fastest is reported
+    hidden_size: int = 300  # Dimensionality of the hidden messages
+    depth: int = 3  # Number of message passing steps
+    message_aggregation: Literal['padded', 'scatter'] = 'padded'  # How incoming messages are summed
+    no_cuda: bool = False  # Turn off cuda even if it is available
+
+
+class PeakTensorMemory(TorchDispatchMode):
+    """Tracks the peak total size of the tensors created by operations while the mode is active (e.g., on CPU)."""
+
+    def __init__(self):
+        super(PeakTensorMemory, self).__init__()
+        self.num_tensors = {}  # maps the address of a storage to the number of live tensors using it
+        self.live = self.peak = 0
+
+    def release(self, address: int, nbytes: int) -> None:
+        self.num_tensors[address] -= 1
+        if self.num_tensors[address] == 0:
+            del self.num_tensors[address]
+            self.live -= nbytes
+
+    def __torch_dispatch__(self, func: Callable, types: Any, args: Tuple = (), kwargs: dict = None) -> Any:
+        output = func(*args, **(kwargs or {}))
+
+        for tensor in tree_flatten(output)[0]:
+            if isinstance(tensor, torch.Tensor):
+                storage = tensor.untyped_storage()
+                address, nbytes = storage.data_ptr(), storage.nbytes()
+                if address not in self.num_tensors:
+                    self.num_tensors[address] = 0
+                    self.live += nbytes
+                    self.peak = max(self.peak, self.live)
+                self.num_tensors[address] += 1
+                weakref.finalize(tensor, self.release, address, nbytes)
+
+        return output
+
+
+def time_passes(run: Callable[[BatchMolGraph], None], batches: List[BatchMolGraph], args: Args) -> float:
+    """Returns the ms per batch of the fastest of :code:`args.num_repeats` passes over the batches."""
+    times = []
+    for _ in range(args.num_repeats):
+        start = perf_counter()
+        for batch in batches:
+            run(batch)
+        if torch.cuda.is_available() and not args.no_cuda:
+            torch.cuda.synchronize()
+        times.append((perf_counter() - start) / len(batches))
+
+    return 1000 * min(times)
+
+
+def benchmark_setting(args: Args,
+                      batches: List[BatchMolGraph],
+                      project_bonds_once: bool) -> Tuple[float, float, float]:
+    """Returns the ms per forward pass, the ms per training step and the largest peak memory of a step in MB."""
+    train_args = TrainArgs().parse_args([
+        '--data_path', args.data_path,
+        '--dataset_type', 'regression',
+        '--atom_messages',
+        '--hidden_size', str(args.hidden_size),
+        '--depth', str(args.depth),
+        '--message_aggregation', args.message_aggregation
+    ] + (['--no_cuda'] if args.no_cuda else []))
+    train_args.task_names = ['target']
+    torch.manual_seed(0)
+    model = MoleculeModel(train_args).to(train_args.device)
+    for encoder in model.encoder.encoder:
+        encoder.project_bonds_once = project_bonds_once
+
+    def step(batch: BatchMolGraph) -> None:
+        model.zero_grad()
+        model([batch]).sum().backward()
+
+    step(batches[0])  # warm up
+
+    with torch.no_grad():
+        forward_time = time_passes(lambda batch: model([batch]), batches, args)
+    step_time = time_passes(step, batches, args)
+
+    # The peak is measured from the start of each step, so parameters and gradients of earlier steps are not counted
+    peak_memory = 0
+    for batch in batches:
+        model.zero_grad(set_to_none=True)
+        if train_args.cuda:
+            torch.cuda.reset_peak_memory_stats()
+            base_memory = torch.cuda.memory_allocated()
+            model([batch]).sum().backward()
+            peak_memory = max(peak_memory, torch.cuda.max_memory_allocated() - base_memory)
+        else:
+            with PeakTensorMemory() as memory:
+                model([batch]).sum().backward()
+            peak_memory = max(peak_memory, memory.peak)
+
+    return forward_time, step_time, peak_memory / 2 ** 20
+
+
+def benchmark_message_passing(args: Args) -> None:
+    smiles = get_smiles(path=args.data_path, smiles_columns=args.smiles_column, flatten=True)
+    batches = [mol2graph(smiles[i:i + args.batch_size]) for i in range(0, len(smiles), args.batch_size)]
+
+    for name, project_bonds_once in [('concatenate', False), ('project', True)]:
+        forward_time, step_time, peak_memory = benchmark_setting(args, batches, project_bonds_once)
+        print(f'{name:>11}: {forward_time:.3f} ms per forward pass, {step_time:.3f} ms per training step, '
+              f'{peak_memory:.2f} MB peak memory per training step')
+
+
+if __name__ == '__main__':
+    benchmark_message_passing(Args().parse_args())
@@ -40,6 +40,7 @@ setup(
             'chemprop_predict=chemprop.train:chemprop_predict',
             'chemprop_hyperopt=chemprop.hyperparameter_optimization:chemprop_hyperopt',
             'chemprop_interpret=chemprop.interpret:chemprop_interpret',
+            'chemprop_preprocess=chemprop.preprocess:chemprop_preprocess',
             'chemprop_web=chemprop.web.run:chemprop_web',
             'sklearn_train=chemprop.sklearn_train:sklearn_train',
             'sklearn_predict=chemprop.sklearn_predict:sklearn_predict',
@@ -0,0 +1,512 @@
+"""Chemprop data tests."""
+import os
+from tempfile import TemporaryDirectory
+import threading
+import unittest
+from unittest import TestCase
+
+import numpy as np
+from rdkit import Chem
+import torch
+
+from chemprop.data import BucketBatchSampler, close_worker_pool, ColumnarMoleculeDataset, DiskGraphCache, \
+    featurize_graphs, get_data, get_data_from_smiles, get_task_names, LRUCache, MoleculeBatch, MoleculeDataLoader, MoleculeDatapoint, \
+    MoleculeDataset, MoleculeSampler, set_cache_graph, set_cache_mol_binary, set_disk_graph_cache, set_packed_graphs, \
+    shared_worker_pool, split_data
+from chemprop.data.data import iterate_in_background, mol_nbytes, SMILES_TO_GRAPH, SMILES_TO_MOL
+from chemprop.data.compiled import is_compiled_data, load_arrays, save_compiled_data
+from chemprop.features import MolGraph, set_graph_featurization
+
+
+TEST_DATA_DIR = 'tests/data'
+
+
+class FeaturizeGraphsTests(TestCase):
+    def setUp(self):
+        self.data = get_data(os.path.join(TEST_DATA_DIR, 'regression.csv'))
+        set_cache_graph(False)
+
+    def tearDown(self):
+        set_cache_graph(True)
+        set_packed_graphs(None)
+        set_graph_featurization('dense')
+
+    def test_prepass_matches_featurization(self):
+        expected = MoleculeDataset(self.data[:100]).batch_graph()[0]
+        graphs = featurize_graphs([self.data], num_processes=2, chunk_size=64, progress_bar=False)
+        self.assertEqual(len(graphs), len(set(self.data.smiles(flatten=True))))
+
+        set_packed_graphs(graphs)
+        batch = MoleculeDataset(self.data[:100]).batch_graph()[0]
+
+        self.assertTrue(torch.equal(batch.f_atoms, expected.f_atoms))
+        self.assertTrue(torch.equal(batch.f_bonds, expected.f_bonds))
+        self.assertTrue(torch.equal(batch.a2b, expected.a2b))
+        self.assertTrue(torch.equal(batch.b2revb, expected.b2revb))
+
+    def test_prepass_reuses_graphs(self):
+        graphs = featurize_graphs([MoleculeDataset(self.data[:100])], num_processes=1, progress_bar=False)
+        extended = featurize_graphs([self.data], num_processes=1, graphs=graphs, progress_bar=False)
+
+        self.assertEqual(extended.smiles[:len(graphs)], graphs.smiles)
+        self.assertIs(featurize_graphs([self.data], num_processes=1, graphs=extended, progress_bar=False), extended)
+
+    def test_prepass_redone_for_other_featurization(self):
+        graphs = featurize_graphs([self.data], num_processes=1, progress_bar=False)
+        set_graph_featurization('categorical')
+
+        self.assertEqual(featurize_graphs([self.data], num_processes=1, graphs=graphs,
+                                          progress_bar=False).featurization, 'categorical')
+
+
+class CompiledDataTests(TestCase):
+    def setUp(self):
+        self.path = os.path.join(TEST_DATA_DIR, 'classification.csv')
+        self.data = get_data(self.path, features_generator=['morgan'])
+        self.task_names = get_task_names(self.path)
+        self.temp_dir = TemporaryDirectory()
+        self.compiled_path = os.path.join(self.temp_dir.name, 'classification.chemprop')
+
+        save_compiled_data(
+            path=self.compiled_path,
+            data=self.data,
+            graphs=featurize_graphs([self.data], num_processes=1, progress_bar=False),
+            smiles_columns=['smiles'],
+            task_names=self.task_names
+        )
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_arrays_are_memory_mapped(self):
+        self.assertTrue(is_compiled_data(self.compiled_path))
+        self.assertFalse(is_compiled_data(self.path))
+
+        header, arrays = load_arrays(self.compiled_path)
+        self.assertEqual(header['task_names'], self.task_names)
+        self.assertTrue(all(array.ctypes.data % 64 == 0 for array in arrays.values()))
+        self.assertIsInstance(arrays['graphs.f_bonds'], np.memmap)
+
+    def test_get_data_matches_csv(self):
+        data = get_data(self.compiled_path, features_generator=['morgan'])
+
+        self.assertEqual(data.smiles(), self.data.smiles())
+        self.assertEqual(data.targets(), self.data.targets())
+        np.testing.assert_array_equal(np.array(data.features()), np.array(self.data.features(), dtype=np.float32))
+        # Not copied into memory when all rows are kept
+        self.assertIsInstance(data._raw_features, np.memmap)
+        self.assertIsInstance(data._raw_targets, np.memmap)
+
+        batch, expected = data.batch_graph()[0], self.data.batch_graph()[0]
+        self.assertTrue(torch.equal(batch.f_bonds, expected.f_bonds))
+        self.assertTrue(torch.equal(batch.a2b, expected.a2b))
+
+    def test_get_data_selects_targets(self):
+        task_names = self.task_names[:2]
+        data = get_data(self.compiled_path, target_columns=task_names, skip_none_targets=True, max_data_size=100)
+        expected = get_data(self.path, target_columns=task_names, skip_none_targets=True, max_data_size=100)
+
+        self.assertEqual(data.smiles(), expected.smiles())
+        self.assertEqual(data.targets(), expected.targets())
+        self.assertIsNone(data.features())
+
+
+class DiskGraphCacheTests(TestCase):
+    def setUp(self):
+        self.data = MoleculeDataset(get_data(os.path.join(TEST_DATA_DIR, 'regression.csv'))[:50])
+        self.temp_dir = TemporaryDirectory()
+        self.cache = DiskGraphCache(self.temp_dir.name)
+        set_cache_graph(False)
+        SMILES_TO_GRAPH.clear()  # graphs cached in memory by earlier tests would skip the disk cache
+
+    def tearDown(self):
+        set_cache_graph(True)
+        set_disk_graph_cache(None)
+        set_graph_featurization('dense')
+        self.temp_dir.cleanup()
+
+    def test_batch_graph_reads_and_writes_cache(self):
+        expected = MoleculeDataset(self.data[:]).batch_graph()[0]
+
+        set_disk_graph_cache(self.cache)
+        MoleculeDataset(self.data[:]).batch_graph()
+        num_smiles = len(set(self.data.smiles(flatten=True)))
+        self.assertEqual(self.cache.info()['misses'], num_smiles)
+        self.assertEqual(len(self.cache), num_smiles)
+
+        # A new cache object on the same directory finds the graphs of the previous run
+        set_disk_graph_cache(DiskGraphCache(self.temp_dir.name))
+        batch = MoleculeDataset(self.data[:]).batch_graph()[0]
+        self.assertTrue(torch.equal(batch.f_bonds, expected.f_bonds))
+        self.assertTrue(torch.equal(batch.a2b, expected.a2b))
+        self.assertTrue(torch.equal(batch.b2revb, expected.b2revb))
+
+    def test_featurization_change_misses(self):
+        set_disk_graph_cache(self.cache)
+        featurize_graphs([self.data], num_processes=1, progress_bar=False)
+
+        set_graph_featurization('categorical')
+        graphs = featurize_graphs([self.data], num_processes=1, progress_bar=False)
+        self.assertEqual(graphs.featurization, 'categorical')
+        self.assertEqual(self.cache.info()['hits'], 0)
+
+        graphs = featurize_graphs([self.data], num_processes=1, progress_bar=False)
+        self.assertEqual(self.cache.info()['hits'], len(graphs))
+
+    def test_eviction_keeps_size_cap(self):
+        graphs = featurize_graphs([self.data], num_processes=1, progress_bar=False)
+        self.cache.put_many({graphs.smiles[0]: graphs.graph(0)})
+        self.cache.put_many({graphs.smiles[1]: graphs.graph(1)})
+        self.cache.max_size = self.cache.size() - 1
+        self.cache.evict()
+
+        self.assertEqual(self.cache.info()['evictions'], 1)
+        self.assertLessEqual(self.cache.size(), self.cache.max_size)
+        self.assertEqual(list(self.cache.get_many(graphs.smiles[:2])), [graphs.smiles[1]])
+
+    def test_size_tracks_stored_graphs(self):
+        def stored_size():
+            return self.cache.connection.execute('SELECT COALESCE(SUM(size), 0) FROM graphs').fetchone()[0]
+
+        graphs = featurize_graphs([self.data], num_processes=1, progress_bar=False)
+        self.cache.put_many({s: graphs[s] for s in graphs.smiles[:10]})
+        self.cache.put_many({graphs.smiles[0]: graphs[graphs.smiles[1]]})  # replaces a graph with a different size
+        self.assertEqual(self.cache.size(), stored_size())
+
+        self.cache.max_size = self.cache.size() // 2
+        self.cache.evict()
+        self.assertEqual(self.cache.size(), stored_size())
+
+        # A cache opened again on the same directory continues from the stored total
+        self.assertEqual(DiskGraphCache(self.temp_dir.name).size(), stored_size())
+
+        self.cache.clear()
+        self.assertEqual(self.cache.size(), 0)
+
+    def test_valid_smiles_skip_hydrogen_only_molecules(self):
+        graphs = featurize_graphs([self.data], num_processes=1, progress_bar=False)
+        self.cache.put_many({s: graphs[s] for s in graphs.smiles})
+        self.cache.put_many({'[H][H]': MolGraph('[H][H]')})
+
+        self.assertEqual(self.cache.valid_smiles(graphs.smiles + ['[H][H]', 'CC']), set(graphs.smiles))
+
+
+class LRUCacheTests(TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_size=3 / 2 ** 20, sizeof=len)
+        cache['a'], cache['b'] = 'x', 'yy'
+        self.assertEqual(cache.get('a'), 'x')
+
+        cache['c'] = 'z'
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.info(), {'hits': 1, 'misses': 0, 'evictions': 1, 'items': 2, 'size': 2})
+
+        self.assertIsNone(cache.get('b'))
+        with self.assertRaises(KeyError):
+            cache['b']
+        self.assertEqual(cache.info()['misses'], 2)
+
+    def test_concurrent_access(self):
+        cache = LRUCache(max_size=100 / 2 ** 20, sizeof=len)
+
+        def use_cache(offset: int):
+            for i in range(2000):
+                key = (offset + i) % 50
+                if cache.get(key) is None:
+                    cache[key] = 'x' * (key % 7 + 1)
+
+        threads = [threading.Thread(target=use_cache, args=(offset,)) for offset in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        info = cache.info()
+        self.assertEqual(info['hits'] + info['misses'], 4 * 2000)
+        self.assertEqual(info['size'], sum(len(cache.get(key)) for key in range(50) if key in cache))
+        self.assertLessEqual(info['size'], cache.max_size)
+
+    def test_mol_parsed_only_on_miss(self):
+        SMILES_TO_MOL.clear()
+        datapoint = MoleculeDatapoint(smiles=['CCO'])
+        mol = datapoint.mol[0]
+
+        self.assertIs(datapoint.mol[0], mol)
+        self.assertEqual(SMILES_TO_MOL.info()['misses'], 1)
+        self.assertEqual(SMILES_TO_MOL.info()['hits'], 1)
+
+    def test_mol_cached_as_binary(self):
+        SMILES_TO_MOL.clear()
+        set_cache_mol_binary(True)
+        try:
+            datapoint = MoleculeDatapoint(smiles=['c1ccccc1O'])
+            mol = datapoint.mol[0]
+            self.assertIsInstance(SMILES_TO_MOL.get('c1ccccc1O'), bytes)
+            self.assertEqual(Chem.MolToSmiles(datapoint.mol[0]), Chem.MolToSmiles(mol))
+            self.assertLess(SMILES_TO_MOL.info()['size'], mol_nbytes(mol))
+        finally:
+            set_cache_mol_binary(False)
+
+
+class ColumnarMoleculeDatasetTests(TestCase):
+    def setUp(self):
+        self.path = os.path.join(TEST_DATA_DIR, 'classification.csv')
+        self.data = get_data(self.path, features_generator=['morgan'])
+        self.columnar = get_data(self.path, features_generator=['morgan'], columnar=True)
+
+    def test_matches_datapoints(self):
+        self.assertIsInstance(self.columnar, ColumnarMoleculeDataset)
+        self.assertEqual(self.columnar.smiles(), self.data.smiles())
+        self.assertEqual(self.columnar.targets(), self.data.targets())
+        mask = [[t is not None for t in row] for row in self.data.targets()]
+        np.testing.assert_array_equal(self.columnar.mask(), mask)
+        np.testing.assert_allclose(self.columnar.features(), np.array(self.data.features()))
+
+        batch, expected = self.columnar.batch_graph()[0], self.data.batch_graph()[0]
+        self.assertTrue(torch.equal(batch.f_bonds, expected.f_bonds))
+        self.assertTrue(torch.equal(batch.a2b, expected.a2b))
+
+    def test_csv_rows_skipped_as_with_datapoints(self):
+        with TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'data.csv')
+            with open(os.path.join(TEST_DATA_DIR, 'regression.csv')) as f:
+                lines = f.read().splitlines()[:41]
+            lines[3] = 'invalid,1.0'  # an invalid SMILES
+            lines[5] = lines[5].split(',')[0] + ','  # an unknown target
+            with open(path, 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+
+            kwargs = {'features_path': [os.path.join(TEST_DATA_DIR, 'regression.npz')], 'store_row': True,
+                      'skip_none_targets': True, 'max_data_size': 30}
+            data = get_data(path, **kwargs)
+            columnar = get_data(path, columnar=True, **kwargs)
+
+        self.assertIsInstance(columnar, ColumnarMoleculeDataset)
+        self.assertEqual(len(columnar), 29)
+        self.assertEqual(columnar.smiles(), data.smiles())
+        np.testing.assert_allclose(np.array(columnar.targets(), dtype=float), np.array(data.targets(), dtype=float),
+                                   rtol=1e-6)
+        np.testing.assert_allclose(columnar.features(), np.array(data.features()), rtol=1e-6)
+        self.assertEqual(columnar[5].row, data[5].row)
+
+    def test_split_and_scaling(self):
+        train, val, test = split_data(self.columnar, sizes=(0.8, 0.1, 0.1), seed=0)
+        expected_train, _, expected_test = split_data(self.data, sizes=(0.8, 0.1, 0.1), seed=0)
+        self.assertIsInstance(train, ColumnarMoleculeDataset)
+        self.assertEqual(train.smiles(), expected_train.smiles())
+
+        scaler = train.normalize_features()
+        expected_scaler = expected_train.normalize_features()
+        np.testing.assert_allclose(scaler.means, expected_scaler.means)
+
+        test.normalize_features(scaler)
+        expected_test.normalize_features(scaler)
+        np.testing.assert_allclose(test.features(), np.array(expected_test.features()), rtol=1e-5, atol=1e-6)
+        np.testing.assert_allclose(test[0].features, test.features()[0])
+
+    def test_target_tensors(self):
+        targets, mask = self.columnar.target_tensors()
+        expected_targets, expected_mask = self.data.target_tensors()
+
+        self.assertEqual(targets.dtype, torch.float32)
+        self.assertTrue(torch.equal(targets, expected_targets))
+        self.assertTrue(torch.equal(mask, expected_mask))
+        self.assertEqual(mask.sum().item(), sum(t is not None for row in self.data.targets() for t in row))
+
+        self.columnar.set_targets([[1] * self.columnar.num_tasks()] * len(self.columnar))
+        self.assertTrue(torch.equal(self.columnar.target_tensors()[1], torch.ones_like(mask)))
+
+    def test_normalize_targets(self):
+        # Classification targets with unknown values are enough to compare the scaling
+        raw_targets = self.columnar.targets()
+        scaler, expected_scaler = self.columnar.normalize_targets(), self.data.normalize_targets()
+        np.testing.assert_allclose(scaler.means, expected_scaler.means)
+        np.testing.assert_allclose(scaler.stds, expected_scaler.stds)
+
+        targets, mask = self.columnar.target_tensors()
+        self.assertEqual(targets.dtype, torch.float32)
+        np.testing.assert_allclose(targets, self.data.target_tensors()[0], rtol=1e-5, atol=1e-6)
+
+        self.columnar.reset_features_and_targets()
+        self.assertEqual(self.columnar.targets(), raw_targets)
+
+    def test_data_loader_slices_batches(self):
+        loader = MoleculeDataLoader(self.columnar, batch_size=16, num_workers=0)
+        batches = list(loader)
+
+        self.assertTrue(all(isinstance(batch, ColumnarMoleculeDataset) for batch in batches))
+        self.assertEqual(sum((batch.smiles() for batch in batches), []), self.columnar.smiles())
+        self.assertEqual(loader.targets, self.columnar.targets())
+
+
+class BucketBatchSamplerTests(TestCase):
+    def setUp(self):
+        self.data = get_data(os.path.join(TEST_DATA_DIR, 'classification.csv'), target_columns=['NR-AR'],
+                             skip_none_targets=True)
+
+    def test_batches_have_similar_sizes(self):
+        sampler = BucketBatchSampler(MoleculeSampler(self.data, shuffle=True), batch_size=16, num_buckets=4)
+        batches = list(sampler)
+
+        self.assertEqual(sorted(index for batch in batches for index in batch), list(range(len(self.data))))
+        self.assertTrue(all(len(batch) <= 16 for batch in batches))
+        self.assertTrue(all(len(set(sampler.buckets[batch])) == 1 for batch in batches))
+
+        num_atoms = self.data.num_atoms()
+        self.assertEqual(num_atoms[0], Chem.MolFromSmiles(self.data.smiles()[0][0]).GetNumAtoms())
+
+    def test_class_balance(self):
+        sampler = BucketBatchSampler(MoleculeSampler(self.data, class_balance=True, shuffle=True), batch_size=16)
+        targets = self.data.targets()
+        indices = [index for batch in sampler for index in batch]
+
+        self.assertEqual(len(indices), sampler.sampler.length)
+        self.assertEqual(sum(targets[index][0] == 1 for index in indices), len(indices) // 2)
+
+    def test_atom_budget(self):
+        sampler = BucketBatchSampler(MoleculeSampler(self.data), num_buckets=1, max_atoms=200)
+        batches = list(sampler)
+
+        self.assertEqual([index for batch in batches for index in batch], list(range(len(self.data))))
+        self.assertTrue(all(sampler.num_atoms[batch].sum() <= 200 or len(batch) == 1 for batch in batches))
+        self.assertTrue(all(sampler.num_atoms[batch + [next_batch[0]]].sum() > 200
+                            for batch, next_batch in zip(batches, batches[1:])))
+
+    def test_data_loader_length(self):
+        loader = MoleculeDataLoader(self.data, batch_size=16, num_workers=0, shuffle=True, num_buckets=4)
+
+        self.assertEqual(len(loader), len(list(loader)))
+
+    def test_num_batches_of_epochs(self):
+        loader = MoleculeDataLoader(self.data, num_workers=0, shuffle=True, max_batch_atoms=200)
+        num_batches = loader.num_batches(5)
+
+        self.assertEqual(num_batches, sum(len(list(loader)) for _ in range(5)))
+        self.assertGreater(len({len(list(loader)) for _ in range(5)}), 1)  # the count varies between epochs
+
+
+class DataLoaderTestCase(TestCase):
+    """Base class for tests which load batches of a small dataset."""
+    dataset_type = 'regression'
+    features_generator = None
+
+    def setUp(self):
+        self.data = get_data(os.path.join(TEST_DATA_DIR, f'{self.dataset_type}.csv'),
+                             features_generator=self.features_generator, max_data_size=64)
+
+    def data_loader(self, **kwargs) -> MoleculeDataLoader:
+        """Builds a data loader with batches of 16 datapoints, loaded sequentially unless specified."""
+        return MoleculeDataLoader(self.data, **{'batch_size': 16, 'num_workers': 0, **kwargs})
+
+
+class PrefetchTests(DataLoaderTestCase):
+    def test_prefetched_batches_match(self):
+        expected = list(self.data_loader())
+        batches = list(self.data_loader(prefetch_batches=2))
+
+        self.assertEqual([batch.smiles() for batch in batches], [batch.smiles() for batch in expected])
+        self.assertIsNotNone(batches[-1]._batch_graph)
+
+    def test_errors_are_raised(self):
+        def items():
+            yield 1
+            raise ValueError('collation failed')
+
+        iterator = iterate_in_background(items(), queue_size=1)
+        self.assertEqual(next(iterator), 1)
+        with self.assertRaises(ValueError):
+            next(iterator)
+
+    def test_close_stops_thread(self):
+        num_threads = threading.active_count()
+        iterator = iterate_in_background(iter(range(1000)), queue_size=2)
+        self.assertEqual(next(iterator), 0)
+        iterator.close()
+
+        self.assertEqual(threading.active_count(), num_threads)
+
+
+class MoleculeBatchTests(DataLoaderTestCase):
+    dataset_type = 'classification'
+    features_generator = ['morgan']
+
+    def test_workers_return_tensors(self):
+        expected = list(self.data_loader())
+        batches = list(self.data_loader(num_workers=2))
+
+        self.assertTrue(all(isinstance(batch, MoleculeBatch) for batch in batches))
+        self.assertEqual([len(batch) for batch in batches], [len(batch) for batch in expected])
+
+        for batch, expected_batch in zip(batches, expected):
+            self.assertTrue(torch.equal(batch.batch_graph()[0].f_bonds, expected_batch.batch_graph()[0].f_bonds))
+            self.assertTrue(torch.equal(batch.features(), torch.from_numpy(np.array(expected_batch.features(),
+                                                                                    dtype=np.float32))))
+            self.assertTrue(all(torch.equal(tensor, expected_tensor) for tensor, expected_tensor
+                                in zip(batch.target_tensors(), expected_batch.target_tensors())))
+
+    def test_batches_without_targets(self):
+        data = get_data_from_smiles([['CCO'], ['c1ccccc1'], ['CC(=O)O']])
+        batches = list(MoleculeDataLoader(data, batch_size=2, num_workers=2))
+
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+        self.assertEqual(batches[0].target_tensors(), (None, None))
+
+
+class CachedBatchesTests(DataLoaderTestCase):
+    def test_batches_collated_once(self):
+        loader = self.data_loader(cache_batches=True)
+
+        batches = list(loader)
+        self.assertTrue(all(isinstance(batch, MoleculeBatch) for batch in batches))
+        self.assertEqual([id(batch) for batch in loader], [id(batch) for batch in batches])
+        self.assertEqual(len(loader.targets), len(self.data))
+
+    def test_partial_iteration_not_cached(self):
+        loader = self.data_loader(cache_batches=True)
+
+        next(iter(loader))
+        self.assertEqual(len(list(loader)), 4)
+
+        with self.assertRaises(ValueError):
+            self.data_loader(shuffle=True, cache_batches=True)
+
+
+class SharedWorkerPoolTests(DataLoaderTestCase):
+    def tearDown(self):
+        close_worker_pool()
+
+    def test_pool_reused_across_loaders_and_epochs(self):
+        expected = list(self.data_loader())
+        loader = self.data_loader(num_workers=2, shared_workers=True)
+
+        for _ in range(2):
+            batches = list(loader)
+            self.assertTrue(all(isinstance(batch, MoleculeBatch) for batch in batches))
+            self.assertEqual([len(batch) for batch in batches], [len(batch) for batch in expected])
+        pool = shared_worker_pool(2)
+
+        columnar = ColumnarMoleculeDataset.from_datapoints(self.data[:])
+        list(MoleculeDataLoader(columnar, batch_size=16, num_workers=2, shared_workers=True))
+        self.assertIs(shared_worker_pool(2), pool)
+
+    def test_pending_batches_finished_when_loading_stops(self):
+        batches = iter(self.data_loader(num_workers=2, shared_workers=True))
+        next(batches)
+        batches.close()
+
+        # No batch of the stopped epoch is still being collated or waiting to be collected
+        self.assertEqual(len(shared_worker_pool(2)._pool._cache), 0)
+
+    def test_pool_restarted_when_settings_change(self):
+        pool = shared_worker_pool(2)
+        set_graph_featurization('categorical')
+        try:
+            batches = list(self.data_loader(num_workers=2, shared_workers=True))
+            self.assertIsNot(shared_worker_pool(2), pool)
+            self.assertEqual(batches[0].batch_graph()[0].featurization, 'categorical')
+        finally:
+            set_graph_featurization('dense')
+
+
+if __name__ == '__main__':
+    unittest.main()
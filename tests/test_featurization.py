@@ -0,0 +1,169 @@
+"""Chemprop featurization tests."""
+import os
+from typing import List, Tuple
+import unittest
+from unittest import TestCase
+
+import numpy as np
+from rdkit import Chem
+import torch
+
+from chemprop.data import get_smiles
+from chemprop.features import atom_features, bond_features, BatchMolGraph, clear_feature_cache, feature_cache_info, \
+    MolGraph, PackedMolGraphs, set_feature_cache_size, set_graph_featurization
+from chemprop.features.featurization import FEATURE_CACHE_SIZE
+
+
+TEST_DATA_DIR = 'tests/data'
+DATASETS = ['regression', 'classification']
+
+
+def reference_mol_graph(smiles: str) -> Tuple[List[List[float]], List[List[float]],
+                                              List[List[int]], List[int], List[int]]:
+    """Featurizes a molecule with the original pairwise-bond-lookup algorithm."""
+    mol = Chem.MolFromSmiles(smiles)
+    f_atoms = [atom_features(atom) for atom in mol.GetAtoms()]
+    n_atoms = len(f_atoms)
+    f_bonds, a2b, b2a, b2revb = [], [[] for _ in range(n_atoms)], [], []
+
+    for a1 in range(n_atoms):
+        for a2 in range(a1 + 1, n_atoms):
+            bond = mol.GetBondBetweenAtoms(a1, a2)
+
+            if bond is None:
+                continue
+
+            f_bond = bond_features(bond)
+            f_bonds.append(f_atoms[a1] + f_bond)
+            f_bonds.append(f_atoms[a2] + f_bond)
+
+            b1 = len(b2a)
+            b2 = b1 + 1
+            a2b[a2].append(b1)
+            b2a.append(a1)
+            a2b[a1].append(b2)
+            b2a.append(a2)
+            b2revb.append(b2)
+            b2revb.append(b1)
+
+    return f_atoms, f_bonds, a2b, b2a, b2revb
+
+
+def load_test_smiles() -> List[str]:
+    """Loads all SMILES from the bundled test datasets."""
+    return [smiles for dataset in DATASETS
+            for smiles in get_smiles(os.path.join(TEST_DATA_DIR, f'{dataset}.csv'), flatten=True)]
+
+
+class FeaturizationTests(TestCase):
+    def test_mol_graph_matches_reference(self):
+        for smiles in load_test_smiles():
+            f_atoms, f_bonds, a2b, b2a, b2revb = reference_mol_graph(smiles)
+            mol_graph = MolGraph(smiles)
+
+            self.assertEqual(mol_graph.n_atoms, len(f_atoms))
+            self.assertEqual(mol_graph.n_bonds, len(f_bonds))
+            self.assertEqual(mol_graph.f_atoms.dtype, np.float32)
+            self.assertEqual(mol_graph.f_bonds.dtype, np.float32)
+            self.assertEqual(mol_graph.b2a.dtype, np.int32)
+            np.testing.assert_array_equal(mol_graph.f_atoms, np.array(f_atoms, dtype=np.float32))
+            np.testing.assert_array_equal(mol_graph.f_bonds,
+                                          np.array(f_bonds, dtype=np.float32).reshape(mol_graph.f_bonds.shape))
+            self.assertEqual([[b for b in in_bonds if b >= 0] for in_bonds in mol_graph.a2b.tolist()], a2b)
+            self.assertEqual(mol_graph.b2a.tolist(), b2a)
+            self.assertEqual(mol_graph.b2revb.tolist(), b2revb)
+
+    def test_batch_mol_graph_matches_reference(self):
+        smiles = load_test_smiles()[:50]
+        batch = BatchMolGraph([MolGraph(s) for s in smiles])
+
+        f_atoms, f_bonds, a2b, b2a, b2revb = [], [], [[]], [0], [0]
+        n_atoms = n_bonds = 1
+        for s in smiles:
+            mol_f_atoms, mol_f_bonds, mol_a2b, mol_b2a, mol_b2revb = reference_mol_graph(s)
+            f_atoms.extend(mol_f_atoms)
+            f_bonds.extend(mol_f_bonds)
+            a2b.extend([[b + n_bonds for b in in_bonds] for in_bonds in mol_a2b])
+            b2a.extend([a + n_atoms for a in mol_b2a])
+            b2revb.extend([b + n_bonds for b in mol_b2revb])
+            n_atoms += len(mol_f_atoms)
+            n_bonds += len(mol_f_bonds)
+
+        max_num_bonds = max(1, max(len(in_bonds) for in_bonds in a2b))
+
+        self.assertTrue(torch.equal(batch.f_atoms[1:], torch.FloatTensor(f_atoms)))
+        self.assertTrue(torch.equal(batch.f_bonds[1:], torch.FloatTensor(f_bonds)))
+        self.assertTrue(torch.equal(batch.a2b, torch.LongTensor([in_bonds + [0] * (max_num_bonds - len(in_bonds))
+                                                                 for in_bonds in a2b])))
+        self.assertTrue(torch.equal(batch.b2a, torch.LongTensor(b2a)))
+        self.assertTrue(torch.equal(batch.b2revb, torch.LongTensor(b2revb)))
+
+    def test_categorical_atoms_match_dense(self):
+        smiles = load_test_smiles()[:50]
+        dense_batch = BatchMolGraph([MolGraph(s) for s in smiles])
+
+        set_graph_featurization('categorical')
+        try:
+            mol_graphs = [MolGraph(s) for s in smiles]
+            batch = BatchMolGraph(mol_graphs)
+        finally:
+            set_graph_featurization('dense')
+
+        self.assertEqual(mol_graphs[0].atom_categories.dtype, np.int16)
+        self.assertTrue(torch.equal(batch.dense_f_atoms(), dense_batch.f_atoms))
+        self.assertTrue(torch.equal(batch.get_components(atom_messages=True)[1],
+                                    dense_batch.get_components(atom_messages=True)[1]))
+
+    def test_packed_graphs_match_mol_graphs(self):
+        smiles = load_test_smiles()[:50]
+        mol_graphs = [MolGraph(s) for s in smiles]
+        graphs = PackedMolGraphs.concatenate([PackedMolGraphs.pack(smiles[:20], mol_graphs[:20]),
+                                              PackedMolGraphs.pack(smiles[20:], mol_graphs[20:])])
+
+        self.assertEqual(len(graphs), len(smiles))
+        for s, mol_graph in zip(smiles, mol_graphs):
+            packed_graph = graphs[s]
+            self.assertEqual(packed_graph.n_atoms, mol_graph.n_atoms)
+            self.assertEqual(packed_graph.n_bonds, mol_graph.n_bonds)
+            for name in ['f_atoms', 'f_bonds', 'a2b', 'b2a', 'b2revb']:
+                np.testing.assert_array_equal(getattr(packed_graph, name), getattr(mol_graph, name))
+
+        packed_batch, batch = BatchMolGraph([graphs[s] for s in smiles]), BatchMolGraph(mol_graphs)
+        for packed_component, component in zip(packed_batch.get_components(), batch.get_components()):
+            if isinstance(component, torch.Tensor):
+                self.assertTrue(torch.equal(packed_component, component))
+            else:
+                self.assertEqual(packed_component, component)
+
+    def test_feature_cache_statistics(self):
+        clear_feature_cache()
+        mol_graph = MolGraph('CCO')
+
+        self.assertEqual(feature_cache_info(), {'atom_hits': 0, 'atom_misses': 3, 'bond_hits': 1, 'bond_misses': 1,
+                                                'atom_size': 3, 'bond_size': 1})
+        np.testing.assert_array_equal(mol_graph.f_atoms, np.array([atom_features(atom) for atom in
+                                                                    Chem.MolFromSmiles('CCO').GetAtoms()],
+                                                                   dtype=np.float32))
+
+        MolGraph('OCC')
+        self.assertEqual(feature_cache_info()['atom_hits'], 3)
+        self.assertEqual(feature_cache_info()['bond_hits'], 3)
+
+    def test_feature_cache_is_bounded(self):
+        clear_feature_cache()
+        set_feature_cache_size(2)
+        try:
+            MolGraph('CCO')
+            MolGraph('CCO')
+            info = feature_cache_info()
+        finally:
+            set_feature_cache_size(FEATURE_CACHE_SIZE)
+            clear_feature_cache()
+
+        self.assertEqual(info['atom_size'], 2)
+        self.assertEqual(info['atom_hits'], 2)
+        self.assertEqual(info['atom_misses'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,10 @@
 """Chemprop integration tests."""
+from contextlib import redirect_stdout
 from flask import url_for
-from io import BytesIO
+from io import BytesIO, StringIO
 import json
 import os
+import re
 from tempfile import TemporaryDirectory
 from typing import List
 import unittest
@@ -16,6 +18,7 @@ from parameterized import parameterized
 from chemprop.constants import TEST_SCORES_FILE_NAME
 from chemprop.hyperparameter_optimization import chemprop_hyperopt
 from chemprop.interpret import chemprop_interpret
+from chemprop.preprocess import chemprop_preprocess
 from chemprop.sklearn_predict import sklearn_predict
 from chemprop.sklearn_train import sklearn_train
 from chemprop.train import chemprop_train, chemprop_predict
@@ -91,6 +94,14 @@ class ChempropTests(TestCase):
             '--checkpoint_dir', checkpoint_dir
         ] + (flags if flags is not None else [])
 
+    @staticmethod
+    def preprocess(data_path: str, save_path: str):
+        raw_args = ['preprocess', '--data_path', data_path, '--save_path', save_path, '--featurization_processes', '1']
+
+        with patch('sys.argv', raw_args):
+            print(f'python preprocess.py {" ".join(raw_args[1:])}')
+            chemprop_preprocess()
+
     def train(self,
               dataset_type: str,
               metric: str,
@@ -211,6 +222,31 @@ class ChempropTests(TestCase):
                 'chemprop',
                 0.807828,
                 ['--features_path', os.path.join(TEST_DATA_DIR, 'regression.npz'), '--no_features_scaling']
+        ),
+        (
+                'chemprop_factorized_graph_featurization',
+                'chemprop',
+                1.237620,
+                ['--graph_featurization', 'factorized']
+        ),
+        (
+                'chemprop_categorical_graph_featurization',
+                'chemprop',
+                1.237620,
+                ['--graph_featurization', 'categorical']
+        ),
+        (
+                'chemprop_featurization_prepass',
+                'chemprop',
+                1.237620,
+                ['--cache_cutoff', '0', '--num_workers', '0', '--featurization_processes', '2']
+        ),
+        (
+                # Measured with bfloat16 autocast. It is 0.020 below the float32 score, which is within DELTA.
+                'chemprop_bfloat16',
+                'chemprop',
+                1.217372,
+                ['--bfloat16']
         )
     ])
     def test_train_single_task_regression(self,
@@ -296,6 +332,13 @@ class ChempropTests(TestCase):
                 'chemprop',
                 0.561477
         ),
+        (
+                'chemprop_quantize_dynamic',
+                'chemprop',
+                0.561477,
+                None,
+                ['--quantize', 'dynamic', '--no_cuda']
+        ),
         (
                 'chemprop_morgan_features_generator',
                 'chemprop',
@@ -408,6 +451,82 @@ class ChempropTests(TestCase):
             mse = float(np.nanmean((pred - true) ** 2))
             self.assertAlmostEqual(mse, expected_score, delta=DELTA)
 
+    def test_train_and_predict_compiled_data(self):
+        with TemporaryDirectory() as save_dir:
+            # Compile
+            dataset_type = 'regression'
+            data_path = os.path.join(save_dir, f'{dataset_type}.chemprop')
+            test_path = os.path.join(save_dir, f'{dataset_type}_test_smiles.chemprop')
+            self.preprocess(os.path.join(TEST_DATA_DIR, f'{dataset_type}.csv'), data_path)
+            self.preprocess(os.path.join(TEST_DATA_DIR, f'{dataset_type}_test_smiles.csv'), test_path)
+
+            # Train
+            metric = 'rmse'
+            self.train(
+                dataset_type=dataset_type,
+                metric=metric,
+                save_dir=save_dir,
+                flags=['--data_path', data_path]
+            )
+
+            test_scores = pd.read_csv(os.path.join(save_dir, TEST_SCORES_FILE_NAME))[f'Mean {metric}']
+            self.assertAlmostEqual(test_scores.mean(), 1.237620, delta=DELTA)
+
+            # Predict
+            preds_path = os.path.join(save_dir, 'preds.csv')
+            self.predict(
+                dataset_type=dataset_type,
+                preds_path=preds_path,
+                save_dir=save_dir,
+                flags=['--test_path', test_path]
+            )
+
+            pred = pd.read_csv(preds_path)
+            true = pd.read_csv(os.path.join(TEST_DATA_DIR, f'{dataset_type}_test_true.csv'))
+            self.assertEqual(list(pred.keys()), list(true.keys()))
+            self.assertEqual(list(pred['smiles']), list(true['smiles']))
+
+            pred, true = pred.drop(columns=['smiles']).to_numpy(), true.drop(columns=['smiles']).to_numpy()
+            self.assertAlmostEqual(float(np.nanmean((pred - true) ** 2)), 0.561477, delta=DELTA)
+
+    def test_train_with_graph_cache_dir(self):
+        with TemporaryDirectory() as save_dir:
+            # The second run reads the graphs which the first run stored on disk
+            metric = 'rmse'
+            cache_dir = os.path.join(save_dir, 'graph_cache')
+            for _ in range(2):
+                self.train(
+                    dataset_type='regression',
+                    metric=metric,
+                    save_dir=save_dir,
+                    flags=['--graph_cache_dir', cache_dir, '--cache_cutoff', '0', '--num_workers', '0',
+                           '--featurization_processes', '1']
+                )
+
+                test_scores = pd.read_csv(os.path.join(save_dir, TEST_SCORES_FILE_NAME))[f'Mean {metric}']
+                self.assertAlmostEqual(test_scores.mean(), 1.237620, delta=DELTA)
+
+    def test_predict_quantization_report(self):
+        with TemporaryDirectory() as save_dir:
+            self.train(dataset_type='regression', metric='rmse', save_dir=save_dir)
+
+            output = StringIO()
+            with redirect_stdout(output):
+                self.predict(
+                    dataset_type='regression',
+                    preds_path=os.path.join(save_dir, 'preds.csv'),
+                    save_dir=save_dir,
+                    flags=['--quantize', 'dynamic', '--no_cuda', '--quantization_report']
+                )
+
+            report = re.search(r'logSolubility: max = ([\d.]+), mean = ([\d.]+)', output.getvalue())
+            self.assertIsNotNone(report)
+            max_difference, mean_difference = float(report.group(1)), float(report.group(2))
+            self.assertLessEqual(mean_difference, max_difference)
+            # Measured max = 0.028 and mean = 0.012 on targets with a standard deviation of about 2
+            self.assertGreater(max_difference, 0)
+            self.assertLess(max_difference, 0.1)
+
     def test_chemprop_hyperopt(self):
         with TemporaryDirectory() as save_dir:
             # Train
@@ -0,0 +1,206 @@
+"""Chemprop message passing tests."""
+import os
+from typing import List
+import unittest
+from unittest import TestCase
+
+from parameterized import parameterized
+import torch
+
+from chemprop.args import TrainArgs
+from chemprop.data import get_smiles
+from chemprop.features import mol2graph, set_graph_featurization
+from chemprop.models import MoleculeModel
+from chemprop.nn_utils import bfloat16_autocast
+from chemprop.utils import quantize_model
+
+
+TEST_DATA_DIR = 'tests/data'
+SEED = 0
+
+
+def build_args(flags: List[str] = None) -> TrainArgs:
+    """Builds the training arguments for a small regression model."""
+    return TrainArgs().parse_args([
+        '--data_path', os.path.join(TEST_DATA_DIR, 'regression.csv'),
+        '--dataset_type', 'regression',
+        '--no_cuda'
+    ] + (flags if flags is not None else []))
+
+
+def build_model(flags: List[str] = None) -> MoleculeModel:
+    """Builds a model with fixed initial weights."""
+    args = build_args(flags)
+    args.task_names = ['logSolubility']
+    torch.manual_seed(SEED)
+
+    return MoleculeModel(args).eval()
+
+
+class MPNTests(TestCase):
+    def setUp(self):
+        self.smiles = get_smiles(os.path.join(TEST_DATA_DIR, 'regression.csv'), flatten=True)[:100]
+
+    def tearDown(self):
+        set_graph_featurization('dense')
+
+    def assert_same_predictions(self, flags: List[str], reference_flags: List[str] = None):
+        # Building a model parses its arguments, which sets the graph featurization used by mol2graph
+        reference_model = build_model(reference_flags)
+        # Biases are initialized to zero, which would hide differences in how the padding bond is handled
+        for name, param in reference_model.named_parameters():
+            if name.endswith('bias'):
+                param.data.normal_()
+        reference_batch = mol2graph(self.smiles)
+        model = build_model(flags)
+        model.load_state_dict(reference_model.state_dict())
+        batch = mol2graph(self.smiles)
+
+        with torch.no_grad():
+            expected = reference_model([reference_batch])
+            preds = model([batch])
+
+        self.assertTrue(torch.allclose(preds, expected, atol=1e-5))
+
+    @parameterized.expand([
+        ('bond_messages', []),
+        ('atom_messages', ['--atom_messages']),
+        ('undirected', ['--undirected']),
+        ('bias', ['--bias']),
+        ('atom_messages_bias', ['--atom_messages', '--bias']),
+        ('undirected_bias', ['--undirected', '--bias']),
+    ])
+    def test_scatter_aggregation(self, name: str, flags: List[str]):
+        self.assert_same_predictions(flags + ['--message_aggregation', 'scatter'], flags)
+
+    @parameterized.expand([
+        ('bond_messages', []),
+        ('atom_messages', ['--atom_messages']),
+        ('scatter_aggregation', ['--message_aggregation', 'scatter']),
+    ])
+    def test_factorized_featurization(self, name: str, flags: List[str]):
+        self.assert_same_predictions(flags + ['--graph_featurization', 'factorized'], flags)
+
+    @parameterized.expand([
+        ('bond_messages', []),
+        ('atom_messages', ['--atom_messages']),
+        ('scatter_aggregation', ['--message_aggregation', 'scatter']),
+    ])
+    def test_categorical_featurization(self, name: str, flags: List[str]):
+        self.assert_same_predictions(flags + ['--graph_featurization', 'categorical'], flags)
+
+    @parameterized.expand([
+        ('index_aggregation', []),
+        ('scatter_aggregation', ['--message_aggregation', 'scatter']),
+        ('bias', ['--bias']),
+        ('categorical_featurization', ['--graph_featurization', 'categorical']),
+    ])
+    def test_undirected_pair_messages(self, name: str, flags: List[str]):
+        flags = flags + ['--undirected']
+        reference_model = build_model(flags)
+        for encoder in reference_model.encoder.encoder:
+            encoder.pair_messages = False
+        model = build_model(flags)
+        batch = mol2graph(self.smiles)
+
+        with torch.no_grad():
+            self.assertTrue(torch.allclose(model([batch]), reference_model([batch]), atol=1e-5))
+
+    @parameterized.expand([
+        ('index_aggregation', []),
+        ('scatter_aggregation', ['--message_aggregation', 'scatter']),
+        ('bias', ['--bias']),
+        ('categorical_featurization', ['--graph_featurization', 'categorical']),
+    ])
+    def test_precomputed_bond_projection(self, name: str, flags: List[str]):
+        flags = flags + ['--atom_messages']
+        reference_model = build_model(flags)
+        for encoder in reference_model.encoder.encoder:
+            encoder.project_bonds_once = False
+        model = build_model(flags)
+        batch = mol2graph(self.smiles)
+
+        with torch.no_grad():
+            self.assertTrue(torch.allclose(model([batch]), reference_model([batch]), atol=1e-5))
+
+    @parameterized.expand([
+        ('bond_messages', []),
+        ('atom_messages', ['--atom_messages']),
+        ('undirected', ['--undirected']),
+        ('scatter_aggregation', ['--message_aggregation', 'scatter']),
+    ])
+    def test_checkpoint_depth(self, name: str, flags: List[str]):
+        reference_model = build_model(flags).train()
+        model = build_model(flags + ['--checkpoint_depth']).train()
+        batch = mol2graph(self.smiles)
+
+        reference_preds = reference_model([batch])
+        reference_preds.sum().backward()
+        preds = model([batch])
+        preds.sum().backward()
+
+        self.assertTrue(torch.allclose(preds, reference_preds, atol=1e-5))
+        for (param_name, param), reference_param in zip(model.named_parameters(), reference_model.parameters()):
+            if reference_param.grad is None:
+                self.assertIsNone(param.grad, param_name)
+            else:
+                self.assertTrue(torch.allclose(param.grad, reference_param.grad, atol=1e-5), param_name)
+
+    @parameterized.expand([
+        ('bond_messages', []),
+        ('atom_messages', ['--atom_messages']),
+        ('undirected', ['--undirected']),
+        ('scatter_aggregation', ['--message_aggregation', 'scatter']),
+    ])
+    @unittest.skipUnless(hasattr(torch, 'autocast'), 'torch.autocast requires PyTorch 1.10 or later')
+    def test_bfloat16_autocast(self, name: str, flags: List[str]):
+        model = build_model(flags)
+        batch = mol2graph(self.smiles)
+
+        with torch.no_grad():
+            expected = model([batch])
+            with bfloat16_autocast():
+                mol_vecs = model.encoder([batch])
+                preds = model([batch])
+
+        self.assertEqual(mol_vecs.dtype, torch.float32)
+        self.assertTrue(torch.allclose(preds.float(), expected, rtol=0.05, atol=0.05))
+
+    @parameterized.expand([
+        ('bond_messages', []),
+        ('atom_messages', ['--atom_messages']),
+        ('undirected', ['--undirected']),
+        ('categorical_featurization', ['--graph_featurization', 'categorical']),
+    ])
+    def test_dynamic_quantization(self, name: str, flags: List[str]):
+        model = build_model(flags)
+        quantized_model = quantize_model(model)
+        batch = mol2graph(self.smiles)
+
+        with torch.no_grad():
+            expected = model([batch])
+            preds = quantized_model([batch])
+
+        self.assertIsInstance(quantized_model.ffn[-1], torch.nn.quantized.dynamic.Linear)
+        self.assertIsInstance(quantized_model.encoder.encoder[0].W_h, torch.nn.quantized.dynamic.Linear)
+        self.assertTrue(torch.allclose(preds, expected, rtol=0.05, atol=0.05))
+
+    @parameterized.expand([
+        ('mean', ['--aggregation', 'mean']),
+        ('sum', ['--aggregation', 'sum']),
+        ('norm', ['--aggregation', 'norm']),
+    ])
+    def test_readout_matches_single_molecules(self, name: str, flags: List[str]):
+        encoder = build_model(flags).encoder
+        smiles = self.smiles[:10] + ['']
+
+        with torch.no_grad():
+            batch_vecs = encoder([mol2graph(smiles)])
+            single_vecs = torch.cat([encoder([mol2graph([s])]) for s in smiles], dim=0)
+
+        self.assertTrue(torch.allclose(batch_vecs, single_vecs, atol=1e-5))
+        self.assertTrue(torch.equal(batch_vecs[-1], torch.zeros_like(batch_vecs[-1])))
+
+
+if __name__ == '__main__':
+    unittest.main()